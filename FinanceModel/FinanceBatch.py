@@ -0,0 +1,815 @@
+import gc
+import math
+from itertools import repeat
+
+import numpy as np
+
+from FinanceModule import (
+    _simulate_repayment,
+    analyze_debt_feasibility,
+    simulate_debt_repayment,
+    summarize_repayment,
+    DEFAULT_MAX_MONTHS,
+    RECOMMENDED_SAVINGS_RATE,
+    CONSOLIDATION_RATE,
+    CONSOLIDATION_TERM,
+    ANNUAL_SAVINGS_RATE,
+    PROJECTION_YEARS,
+    SCENARIO_RATES,
+    SCENARIO_YEARS,
+)
+
+# Number of profiles vectorized together; bounds the size of the padded debt matrices.
+DEFAULT_CHUNK_SIZE = 65536
+
+# Float bisection steps locating the turning point of the gap between two balances,
+# as in FinanceModule._first_overtake.
+TURN_BISECTION_STEPS = 64
+
+###############################
+# Columnar Packing of Profiles #
+###############################
+
+def _pack_column(values, offsets):
+    """Turn a flat list of amounts into float values, int flags and offsets."""
+    return {
+        "values": np.array(values, dtype=np.float64),
+        "is_int": np.fromiter(map(isinstance, values, repeat(int)), dtype=bool, count=len(values)),
+        "offsets": np.array(offsets, dtype=np.int64),
+    }
+
+def pack_profiles(profiles):
+    """
+    Pack user_data dictionaries into columnar NumPy arrays.
+    Ragged lists are stored flat with an offsets array, so the items of profile i
+    live in values[offsets[i]:offsets[i + 1]].
+    :param profiles: Sequence of user_data dictionaries (see compute_financial_analysis).
+    :return: Dictionary of packed columns.
+    """
+    income_items, needs_items, wants_items, debts = [], [], [], []
+    income_offsets, needs_offsets, wants_offsets, debt_offsets = [0], [0], [0], [0]
+    savings = []
+
+    for user_data in profiles:
+        income_items += user_data.get("income", [])
+        income_offsets.append(len(income_items))
+        expenses = user_data.get("expenses", {})
+        needs_items += expenses.get("needs", [])
+        needs_offsets.append(len(needs_items))
+        wants_items += expenses.get("wants", [])
+        wants_offsets.append(len(wants_items))
+        debts += user_data.get("debt", [])
+        debt_offsets.append(len(debts))
+        savings.append(user_data.get("savings", 0))
+
+    income = [item.get("amount", 0) for item in income_items]
+    needs = [item.get("amount", 0) for item in needs_items]
+    wants = [item.get("amount", 0) for item in wants_items]
+    debt_names = [d.get("name", "") for d in debts]
+    debt_amounts = [d.get("total_amount", 0) for d in debts]
+    debt_payments = [d.get("monthly_payment", 0) for d in debts]
+    debt_aprs = [d.get("apr", 0) for d in debts]
+    debt_tenures = [d.get("tenure", 0) for d in debts]
+
+    return {
+        "size": len(savings),
+        "income": _pack_column(income, income_offsets),
+        "needs": _pack_column(needs, needs_offsets),
+        "wants": _pack_column(wants, wants_offsets),
+        "debt_amount": _pack_column(debt_amounts, debt_offsets),
+        "debt_payment": _pack_column(debt_payments, debt_offsets),
+        "debt_apr": np.array(debt_aprs, dtype=np.float64),
+        "debt_raw": {
+            "name": debt_names,
+            "total_amount": debt_amounts,
+            "monthly_payment": debt_payments,
+            "apr": debt_aprs,
+            "tenure": debt_tenures,
+        },
+        "savings_raw": savings,
+        "savings": np.array(savings, dtype=np.float64),
+    }
+
+##############################
+# Segmented (Ragged) Helpers #
+##############################
+
+def _segment_sum(column):
+    """
+    Sum each profile's items left to right, exactly like the built-in sum().
+    NumPy reductions use pairwise summation, which rounds differently, so the
+    items are added one position at a time across all profiles instead.
+    """
+    offsets = column["offsets"]
+    counts = np.diff(offsets)
+    totals = np.zeros(counts.size)
+    rows = np.arange(counts.size)
+    position = 0
+    while rows.size:
+        rows = rows[counts[rows] > position]
+        totals[rows] += column["values"][offsets[rows] + position]
+        position += 1
+    return totals
+
+def _segment_all_int(column):
+    """True for profiles whose items are all ints (so the scalar sum stays an int)."""
+    counts = np.diff(column["offsets"])
+    owner = np.repeat(np.arange(counts.size), counts)
+    not_int = np.bincount(owner, weights=(~column["is_int"]).astype(np.float64), minlength=counts.size)
+    return not_int == 0
+
+def _pad_debt_major(values, offsets):
+    """
+    Scatter ragged per-profile debts into a zero-padded (max debts x profiles) matrix.
+    Debt-major layout keeps "the k-th debt of every profile" contiguous, which is
+    what the in-order repayment loops walk over.
+    """
+    counts = np.diff(offsets)
+    width = int(counts.max()) if counts.size else 0
+    padded = np.zeros((width, counts.size))
+    owner = np.repeat(np.arange(counts.size), counts)
+    padded[np.arange(values.size) - offsets[owner], owner] = values
+    return padded
+
+###############################
+# Vectorized Debt Simulations #
+###############################
+
+def _step_month(balance, rate, payment, extra, total_interest, scratch):
+    """
+    Advance a debt-major block of profiles by one month.
+    Row k holds every profile's k-th debt in strategy order. Interest accrues and the
+    minimum payment is made on each open debt, then the extra funds are applied to
+    open debts in order, following FinanceModule._simulate_month operation for operation.
+    Interest is added to total_interest debt by debt so the float sums match.
+    Closed debts hold exactly 0.0 (see _simulate_strategy_batch), so they accrue no
+    interest and, with non-negative payments, take no payment or extra funds
+    without any masking.
+    """
+    interest = np.multiply(balance, rate, out=scratch)
+    for k in range(balance.shape[0]):
+        total_interest += interest[k]
+    balance += interest
+    balance -= np.minimum(payment, balance, out=scratch)
+
+    # Only profiles with extra left take part; once a debt absorbs the rest of a
+    # profile's extra funds it drops out, so later debts touch few profiles.
+    funded = np.flatnonzero(extra > 0)
+    available = extra[funded]
+    for debt in balance:
+        if not funded.size:
+            break
+        owed = debt[funded]
+        amount = np.minimum(available, owed)
+        debt[funded] = owed - amount
+        available = available - amount
+        left = available > 0
+        funded, available = funded[left], available[left]
+
+def _math(function, values):
+    """
+    A math module function applied elementwise. NumPy's log1p, expm1 and exp use SIMD
+    approximations that can differ from the C library's in the last bit, and the batch
+    simulation has to round exactly like FinanceModule's, so these few calls per event
+    go through math.
+    """
+    flat = np.fromiter(map(function, values.ravel().tolist()), dtype=np.float64, count=values.size)
+    return flat.reshape(values.shape)
+
+def _payoff_months_batch(balance, rate, log_growth, payment, open_debts):
+    """FinanceModule._payoff_months elementwise, inf for closed debts; log_growth is math.log1p(rate)."""
+    months = np.full(balance.shape, np.inf)
+    payable = open_debts & (payment > balance * rate)
+    free = payable & (rate == 0)
+    months[free] = np.ceil(balance[free] / payment[free])
+    charged = payable & (rate != 0)
+    months[charged] = np.ceil(
+        -_math(math.log1p, -balance[charged] * rate[charged] / payment[charged]) / log_growth[charged]
+    )
+    return months
+
+def _amortize_batch(balance, rate, log_growth, payment, months):
+    """
+    FinanceModule._amortize elementwise: new balances and interest accrued over months.
+    Closed debts (balance 0) keep the zero-rate formula; callers discard their results,
+    and compounding them over a long jump could overflow.
+    """
+    new_balance = balance - payment * months
+    charged = (rate != 0) & (balance > 0)
+    if charged.any():
+        growth = _math(math.expm1, (months * log_growth)[charged])
+        b, r, p = balance[charged], rate[charged], payment[charged]
+        new_balance[charged] = b + (b * r - p) * growth / r
+    return new_balance, payment * months - (balance - new_balance)
+
+def _balance_slope_batch(balance, rate, log_growth, payment, months):
+    """FinanceModule._balance_slope elementwise."""
+    slope = -payment.copy()
+    charged = rate != 0
+    if charged.any():
+        b, r, g, p = balance[charged], rate[charged], log_growth[charged], payment[charged]
+        slope[charged] = (b * r - p) * g * _math(math.exp, months[charged] * g) / r
+    return slope
+
+def _first_overtake_batch(target, other, jump):
+    """
+    FinanceModule._first_overtake for many (target, other) pairs, one per profile, step
+    for step: target and other are (balance, rate, log_growth, payment) arrays, the
+    target's payment including the extra funds.
+    :return: Month of the overtake per pair, NaN where the target keeps the lead.
+    """
+    def pick(debt, index):
+        return tuple(column[index] for column in debt)
+
+    def overtaken(index, month):
+        gap = _amortize_batch(*pick(other, index), month)[0] - _amortize_batch(*pick(target, index), month)[0]
+        return gap < 0
+
+    def slope(index, month):
+        return (_balance_slope_batch(*pick(other, index), month)
+                - _balance_slope_batch(*pick(target, index), month))
+
+    every = np.arange(jump.size)
+    result = np.full(jump.size, np.nan)
+    falling = slope(every, np.zeros(jump.size)) < 0
+    turning = np.flatnonzero(falling != (slope(every, jump) < 0))
+    turn = np.zeros(jump.size)
+    if turning.size:
+        low, high = np.zeros(turning.size), jump[turning].copy()
+        for _ in range(TURN_BISECTION_STEPS):
+            middle = (low + high) / 2
+            same = (slope(turning, middle) < 0) == falling[turning]
+            low = np.where(same, middle, low)
+            high = np.where(same, high, middle)
+        turn[turning] = np.minimum(np.maximum(np.floor(low), 0), jump[turning])
+
+    # Segments in order: [0, turn] then [turn, jump] where the gap turns, else [0, jump].
+    split = np.zeros(jump.size, dtype=bool)
+    split[turning] = True
+    segments = [(every, np.zeros(jump.size), np.where(split, turn, jump)), (turning, turn[turning], jump[turning])]
+    unresolved = np.ones(jump.size, dtype=bool)
+    for index, low, high in segments:
+        keep = unresolved[index] & (high > low)
+        index, low, high = index[keep], low[keep], high[keep]
+        keep = overtaken(index, high)
+        index, low, high = index[keep], low[keep], high[keep]
+        unresolved[index] = False
+        at_start = overtaken(index, low)
+        result[index[at_start]] = np.maximum(low[at_start], 1)
+        index, low, high = index[~at_start], low[~at_start], high[~at_start]
+        searching = high - low > 1
+        while searching.any():
+            middle = np.floor((low[searching] + high[searching]) / 2)
+            hit = overtaken(index[searching], middle)
+            rows = np.flatnonzero(searching)
+            high[rows[hit]] = middle[hit]
+            low[rows[~hit]] = middle[~hit]
+            searching = high - low > 1
+        result[index] = high
+    return result
+
+def _next_jump_batch(balance, rate, log_growth, payment, extra, resort, remaining):
+    """
+    FinanceModule._next_jump for a debt-major block of profiles.
+    :return: Months to skip per profile (0 to step the next month directly) and the
+             payments including the extra funds on each profile's target debt.
+    """
+    open_debts = balance > 0
+    funded = np.flatnonzero(extra > 0)
+    target = open_debts.argmax(axis=0)
+    paying = payment.copy()
+    paying[target[funded], funded] = payment[target[funded], funded] + extra[funded]
+    months_left = _payoff_months_batch(balance, rate, log_growth, paying, open_debts).min(axis=0)
+    if funded.size:
+        # A debt the extra funds have not reached stopping amortizing is an event too
+        # (FinanceModule._stuck_months).
+        b, r, p = balance[:, funded], rate[:, funded], payment[:, funded]
+        growth = b * r - p
+        behind = np.arange(balance.shape[0])[:, None] > target[funded]
+        growing = open_debts[:, funded] & behind & (growth > 0) & (r != 0)
+        if growing.any():
+            stuck = np.full(b.shape, np.inf)
+            funds = np.broadcast_to(extra[funded], b.shape)[growing]
+            stuck[growing] = np.ceil(_math(math.log, funds / growth[growing]) / log_growth[:, funded][growing])
+            months_left[funded] = np.minimum(months_left[funded], stuck.min(axis=0))
+    jump = np.minimum(months_left - 2, remaining)
+    jump[~(jump >= 1)] = 0
+    if resort:
+        # Stop before any month in which another debt overtakes the target, checking the
+        # other debts in list order as the scalar loop does.
+        for k in range(1, balance.shape[0]):
+            pairs = funded[(jump[funded] >= 1) & open_debts[k, funded] & (target[funded] < k)]
+            if not pairs.size:
+                continue
+            rows = target[pairs]
+            overtake = _first_overtake_batch(
+                (balance[rows, pairs], rate[rows, pairs], log_growth[rows, pairs], paying[rows, pairs]),
+                (balance[k, pairs], rate[k, pairs], log_growth[k, pairs], payment[k, pairs]),
+                jump[pairs],
+            )
+            found = ~np.isnan(overtake)
+            jump[pairs[found]] = np.minimum(jump[pairs[found]], overtake[found] - 1)
+    return jump, paying
+
+def _never_paid_off(balance, rate, payment, extra):
+    """
+    Vectorized never_paid_off verdict of analyze_debt_feasibility.
+    These profiles would run the lockstep loop to the horizon for nothing.
+    """
+    never = np.zeros(balance.shape[1], dtype=bool)
+    for amount, monthly_rate, monthly_payment in zip(balance, rate, payment):
+        interest = amount * monthly_rate
+        stuck = (amount > 0) & ~(monthly_payment > interest)
+        never |= stuck & ((extra <= 0) | (monthly_payment + extra <= interest))
+    return never
+
+def _sort_by_balance(balance, *aligned):
+    """Stable sort of each profile's debts by balance (snowball), skipping sorted profiles."""
+    unsorted = np.zeros(balance.shape[1], dtype=bool)
+    for k in range(1, balance.shape[0]):
+        unsorted |= balance[k] < balance[k - 1]
+    if unsorted.any():
+        order = np.argsort(balance[:, unsorted], axis=0, kind="stable")
+        for column in (balance, *aligned):
+            column[:, unsorted] = np.take_along_axis(column[:, unsorted], order, axis=0)
+
+def _open_total(balance):
+    """Each profile's open balance, summed in list order like the scalar trajectory (closed debts hold 0.0)."""
+    total = np.zeros(balance.shape[1])
+    for debt in balance:
+        total += debt
+    return total
+
+def _unpaid_results(records, unpaid, months_simulated, total_interest):
+    """
+    simulate_debt_repayment results of the profiles not paid off, from the (profiles,
+    month, open balance) records of every loop iteration.
+    """
+    profiles = np.concatenate([r[0] for r in records])
+    wanted = np.flatnonzero(np.isin(profiles, unpaid))
+    wanted = wanted[np.argsort(profiles[wanted], kind="stable")]
+    month = np.concatenate([r[1] for r in records])[wanted].astype(np.int64).tolist()
+    balance = np.concatenate([r[2] for r in records])[wanted].tolist()
+    owners = profiles[wanted].tolist()
+    trajectories = {}
+    for owner, m, b in zip(owners, month, balance):
+        trajectories.setdefault(owner, []).append({"month": m, "balance": b})
+    return {
+        profile: {
+            "paid_off": False,
+            "months": None,
+            "months_simulated": months_simulated[profile],
+            "total_interest": total_interest[profile],
+            "remaining_balance": trajectories[profile][-1]["balance"],
+            "balance_trajectory": trajectories[profile]
+        }
+        for profile in unpaid
+    }
+
+def _simulate_strategy_batch(balance, rate, payment, extra, resort, max_months, skip):
+    """
+    FinanceModule._simulate_repayment for many profiles in lockstep: every iteration
+    finds each profile's next event, jumps to just before it in closed form and steps
+    the event month, so the loop runs once per event rather than once per month, and
+    each profile's months and interest round exactly as in the scalar simulation.
+    :param balance: Debt-major padded balances, already in strategy order.
+    :param rate: Monthly rates aligned with balance.
+    :param payment: Minimum monthly payments aligned with balance.
+    :param extra: Extra funds per profile.
+    :param resort: Keep each profile's debts sorted by balance (snowball).
+    :param max_months: Horizon for debts that are never paid off (see simulate_debt_repayment).
+    :param skip: Profiles known to never be paid off; they are not simulated.
+    :return: Months (-1 if never paid off) and total interest per profile,
+             and the simulate_debt_repayment results of the simulated profiles not paid
+             off, keyed by profile (balances as floats; see compute_batch_columns).
+    """
+    size = balance.shape[1]
+    months = np.zeros(size, dtype=np.int64)
+    interest_paid = np.zeros(size)
+    unpaid = {}
+
+    # The scalar loops never touch a debt whose balance starts at or below zero, and
+    # a paid-off balance is always exactly 0.0. Zeroing the former lets the monthly
+    # step treat "closed" as "balance == 0" without masks; profiles with negative
+    # minimum payments (which would re-open a zero balance) run the scalar simulation.
+    live = (balance > 0).any(axis=0)
+    months[live & skip] = -1
+    live &= ~skip
+    vectorizable = live & ~(payment < 0).any(axis=0)
+    for profile in np.flatnonzero(live & ~vectorizable).tolist():
+        debts = [[b, r, p] for b, r, p in zip(balance[:, profile].tolist(), rate[:, profile].tolist(),
+                                              payment[:, profile].tolist())]
+        result = _simulate_repayment(debts, extra[profile].item(), resort, max_months)
+        months[profile] = result["months"] if result["paid_off"] else -1
+        interest_paid[profile] = result["total_interest"]
+        if not result["paid_off"]:
+            unpaid[profile] = result
+
+    profiles = np.flatnonzero(vectorizable)
+    balance = np.maximum(balance[:, vectorizable], 0.0)
+    rate, payment, extra = rate[:, vectorizable], payment[:, vectorizable], extra[vectorizable]
+    log_growth = _math(math.log1p, rate)
+    total_interest = np.zeros(profiles.size)
+    month = np.zeros(profiles.size)
+    records = [(profiles, month.copy(), _open_total(balance))]
+    months_simulated = {}
+
+    def finish(done):
+        nonlocal profiles, month, total_interest, extra, balance, rate, log_growth, payment
+        interest_paid[profiles[done]] = total_interest[done]
+        live = ~done
+        profiles, month, total_interest, extra = profiles[live], month[live], total_interest[live], extra[live]
+        balance, rate, log_growth, payment = balance[:, live], rate[:, live], log_growth[:, live], payment[:, live]
+
+    while profiles.size:
+        # Profiles stop, before any jump, once a debt has stopped amortizing.
+        funds = np.maximum(extra, 0)
+        stuck = ((balance > 0) & (payment + funds <= balance * rate)).any(axis=0)
+        if stuck.any():
+            done = profiles[stuck]
+            months[done] = -1
+            months_simulated.update(zip(done.tolist(), month[stuck].astype(np.int64).tolist()))
+            finish(stuck)
+            if not profiles.size:
+                break
+        remaining = np.where(month < max_months, max_months - month, np.inf)
+        jump, paying = _next_jump_batch(balance, rate, log_growth, payment, extra, resort, remaining)
+        jumping = np.flatnonzero(jump > 0)
+        if jumping.size:
+            open_debts = balance[:, jumping] > 0
+            new_balance, interest = _amortize_batch(
+                balance[:, jumping], rate[:, jumping], log_growth[:, jumping], paying[:, jumping], jump[jumping]
+            )
+            balance[:, jumping] = np.where(open_debts, new_balance, balance[:, jumping])
+            for k in range(balance.shape[0]):
+                accrued = open_debts[k]
+                total_interest[jumping[accrued]] += interest[k, accrued]
+            month[jumping] += jump[jumping]
+            if resort:
+                _sort_by_balance(balance, rate, log_growth, payment)
+        stepping = jump < remaining
+        if stepping.all():
+            _step_month(balance, rate, payment, extra, total_interest, np.empty_like(balance))
+        elif stepping.any():
+            b, t = balance[:, stepping], total_interest[stepping]
+            _step_month(b, rate[:, stepping], payment[:, stepping], extra[stepping], t, np.empty_like(b))
+            balance[:, stepping], total_interest[stepping] = b, t
+        month[stepping] += 1
+        if resort:
+            _sort_by_balance(balance, rate, log_growth, payment)
+        records.append((profiles, month.copy(), _open_total(balance)))
+
+        paid_off = ~(balance > 0).any(axis=0)
+        if paid_off.any():
+            months[profiles[paid_off]] = month[paid_off]
+            finish(paid_off)
+
+    if months_simulated:
+        unpaid.update(_unpaid_results(records, list(months_simulated), months_simulated,
+                                      dict(zip(months_simulated, interest_paid[list(months_simulated)].tolist()))))
+    return months, interest_paid, unpaid
+
+def _simulate_avalanche_batch(balance, rate, payment, extra, max_months, skip):
+    """Avalanche: debts ordered by descending APR (stable, like sorted(reverse=True))."""
+    order = np.argsort(-rate, axis=0, kind="stable")
+    return _simulate_strategy_batch(
+        np.take_along_axis(balance, order, axis=0),
+        np.take_along_axis(rate, order, axis=0),
+        np.take_along_axis(payment, order, axis=0),
+        extra.copy(),
+        resort=False,
+        max_months=max_months,
+        skip=skip,
+    )
+
+def _simulate_snowball_batch(balance, rate, payment, extra, max_months, skip):
+    """Snowball: debts ordered by ascending balance, re-sorted every month."""
+    order = np.argsort(balance, axis=0, kind="stable")
+    return _simulate_strategy_batch(
+        np.take_along_axis(balance, order, axis=0),
+        np.take_along_axis(rate, order, axis=0),
+        np.take_along_axis(payment, order, axis=0),
+        extra.copy(),
+        resort=True,
+        max_months=max_months,
+        skip=skip,
+    )
+
+def _simulate_consolidation_batch(total_balance, consolidation_rate, consolidation_term):
+    """Vectorized simulate_debt_consolidation over many total balances."""
+    monthly_rate = consolidation_rate / 12
+    payment = total_balance * (monthly_rate * (1 + monthly_rate) ** consolidation_term) / ((1 + monthly_rate) ** consolidation_term - 1)
+    total_interest = np.zeros(total_balance.size)
+    remaining = total_balance.copy()
+    live = np.ones(total_balance.size, dtype=bool)
+    for _ in range(consolidation_term):
+        interest = remaining * monthly_rate
+        total_interest = np.where(live, total_interest + interest, total_interest)
+        remaining = np.where(live, remaining + (interest - payment), remaining)
+        live &= ~(remaining < 0)
+        if not live.any():
+            break
+    return payment, total_interest
+
+def project_savings_grid(initial_savings, monthly_contribution, annual_rates, years):
+    """
+    Vectorized project_savings_growth over a grid of rates and horizons.
+    :param initial_savings: Scalar or array of starting balances.
+    :param monthly_contribution: Scalar or array of contributions, broadcast against initial_savings.
+    :param annual_rates: Sequence of annual growth rates.
+    :param years: Sequence of horizons in years.
+    :return: Array of shape (*contributions, len(annual_rates), len(years)).
+    """
+    initial = np.asarray(initial_savings, dtype=np.float64)[..., None, None]
+    contribution = np.asarray(monthly_contribution, dtype=np.float64)[..., None, None]
+    monthly_rate = np.asarray(annual_rates, dtype=np.float64)[:, None] / 12
+    months = np.asarray(years, dtype=np.float64)[None, :] * 12
+    growth = np.expm1(months * np.log1p(monthly_rate))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annuity = np.where(monthly_rate == 0, months, growth / monthly_rate)
+    return initial * (1 + growth) + contribution * annuity
+
+def _savings_scenarios(grid):
+    """Turn one profile's project_savings_grid rows into project_savings_scenarios output."""
+    return [
+        {"annual_rate": rate, "years": horizon, "projected_savings": value}
+        for rate, row in zip(SCENARIO_RATES, grid)
+        for horizon, value in zip(SCENARIO_YEARS, row)
+    ]
+
+###############################
+# Batch Financial Analysis    #
+###############################
+
+def _row_debts(packed, row):
+    """Rebuild the debt dictionaries of one packed profile."""
+    raw = packed["debt_raw"]
+    start, end = packed["debt_amount"]["offsets"][row:row + 2].tolist()
+    return [
+        {
+            "name": raw["name"][i],
+            "total_amount": raw["total_amount"][i],
+            "monthly_payment": raw["monthly_payment"][i],
+            "apr": raw["apr"][i],
+            "tenure": raw["tenure"][i]
+        }
+        for i in range(start, end)
+    ]
+
+def _row_extra(extra_funds, extra_is_int, row):
+    """Extra funds of one profile as the Python number the scalar path would use."""
+    extra = extra_funds[row].item()
+    return int(extra) if extra_is_int[row] else extra
+
+def _resolve_unpaid(packed, unpaid, interest, extra_funds, extra_is_int, strategy, max_months):
+    """
+    Give the batch results of profiles not paid off the Python types of the scalar path:
+    the opening balance is an int when every open debt's amount is, so is the interest
+    of a simulation stopped before its first event, and profiles with an open zero-APR
+    debt (whose balances can stay ints) rerun simulate_debt_repayment.
+    :return: Dictionary of simulate_debt_repayment results keyed by row.
+    """
+    raw = packed["debt_raw"]
+    offsets = packed["debt_amount"]["offsets"].tolist()
+    for row, result in unpaid.items():
+        amounts = raw["total_amount"][offsets[row]:offsets[row + 1]]
+        aprs = raw["apr"][offsets[row]:offsets[row + 1]]
+        if any(a > 0 and apr == 0 for a, apr in zip(amounts, aprs)):
+            result = unpaid[row] = simulate_debt_repayment(
+                _row_debts(packed, row), _row_extra(extra_funds, extra_is_int, row), strategy, max_months
+            )
+            interest[row] = result["total_interest"]
+            continue
+        trajectory = result["balance_trajectory"]
+        if all(type(a) is int for a in amounts if a > 0):
+            trajectory[0]["balance"] = int(trajectory[0]["balance"])
+        if len(trajectory) == 1:
+            # Stopped before the first event (max_months <= 0): nothing accrued.
+            result["total_interest"] = 0
+            result["remaining_balance"] = trajectory[0]["balance"]
+    return unpaid
+
+def compute_batch_columns(packed, max_months=DEFAULT_MAX_MONTHS):
+    """
+    Compute every numeric field of compute_financial_analysis for a packed batch.
+    Values are float64 arrays; the matching "*_is_int" arrays record where the
+    scalar function would have produced a Python int instead of a float. Months
+    are -1 for profiles never paid off, whose full results are kept under
+    "*_unpaid".
+    :param packed: Output of pack_profiles.
+    :param max_months: Horizon of the debt repayment simulations.
+    :return: Dictionary of result columns.
+    """
+    total_income = _segment_sum(packed["income"])
+    total_needs = _segment_sum(packed["needs"])
+    total_wants = _segment_sum(packed["wants"])
+    total_expenses = total_needs + total_wants
+    total_debt = _segment_sum(packed["debt_amount"])
+    total_min_debt_payments = _segment_sum(packed["debt_payment"])
+    net_cash_flow = total_income - (total_expenses + total_min_debt_payments)
+
+    income_is_int = _segment_all_int(packed["income"])
+    needs_is_int = _segment_all_int(packed["needs"])
+    wants_is_int = _segment_all_int(packed["wants"])
+    expenses_is_int = needs_is_int & wants_is_int
+    debt_is_int = _segment_all_int(packed["debt_amount"])
+    net_cash_flow_is_int = income_is_int & expenses_is_int & _segment_all_int(packed["debt_payment"])
+
+    # max(x, 0) returns the int 0 only when x is negative.
+    scaled = net_cash_flow * RECOMMENDED_SAVINGS_RATE
+    recommended_is_int = scaled < 0
+    recommended_monthly_savings = np.where(recommended_is_int, 0.0, scaled)
+    leftover = net_cash_flow - recommended_monthly_savings
+    extra_is_int = (leftover < 0) | (net_cash_flow_is_int & recommended_is_int)
+    extra_funds = np.where(leftover < 0, 0.0, leftover)
+
+    offsets = packed["debt_amount"]["offsets"]
+    balance = _pad_debt_major(packed["debt_amount"]["values"], offsets)
+    rate = _pad_debt_major(packed["debt_apr"], offsets) / 12
+    payment = _pad_debt_major(packed["debt_payment"]["values"], offsets)
+    simulate_all = np.zeros(balance.shape[1], dtype=bool)
+    avalanche_months, avalanche_interest, avalanche_unpaid = _simulate_avalanche_batch(
+        balance, rate, payment, extra_funds, max_months, simulate_all
+    )
+    snowball_months, snowball_interest, snowball_unpaid = _simulate_snowball_batch(
+        balance, rate, payment, extra_funds, max_months, simulate_all
+    )
+    avalanche_unpaid = _resolve_unpaid(
+        packed, avalanche_unpaid, avalanche_interest, extra_funds, extra_is_int, "avalanche", max_months
+    )
+    snowball_unpaid = _resolve_unpaid(
+        packed, snowball_unpaid, snowball_interest, extra_funds, extra_is_int, "snowball", max_months
+    )
+
+    consolidation_payment, consolidation_interest = _simulate_consolidation_batch(
+        total_debt, CONSOLIDATION_RATE, CONSOLIDATION_TERM
+    )
+    initial_savings = packed["savings"] + recommended_monthly_savings
+    projected_savings = project_savings_grid(
+        initial_savings, recommended_monthly_savings, [ANNUAL_SAVINGS_RATE], [PROJECTION_YEARS]
+    )[:, 0, 0]
+    savings_scenarios = project_savings_grid(
+        initial_savings, recommended_monthly_savings, SCENARIO_RATES, SCENARIO_YEARS
+    )
+
+    return {
+        "total_income": total_income,
+        "total_income_is_int": income_is_int,
+        "total_expenses": total_expenses,
+        "total_expenses_is_int": expenses_is_int,
+        "total_needs": total_needs,
+        "total_needs_is_int": needs_is_int,
+        "total_wants": total_wants,
+        "total_wants_is_int": wants_is_int,
+        "total_debt": total_debt,
+        "total_debt_is_int": debt_is_int,
+        "net_cash_flow": net_cash_flow,
+        "net_cash_flow_is_int": net_cash_flow_is_int,
+        "recommended_monthly_savings": recommended_monthly_savings,
+        "recommended_monthly_savings_is_int": recommended_is_int,
+        "extra_funds": extra_funds,
+        "extra_funds_is_int": extra_is_int,
+        "avalanche_months": avalanche_months,
+        "avalanche_interest": avalanche_interest,
+        "avalanche_interest_is_int": avalanche_months == 0,
+        "avalanche_unpaid": avalanche_unpaid,
+        "snowball_months": snowball_months,
+        "snowball_interest": snowball_interest,
+        "snowball_interest_is_int": snowball_months == 0,
+        "snowball_unpaid": snowball_unpaid,
+        "consolidation_payment": consolidation_payment,
+        "consolidation_interest": consolidation_interest,
+        "projected_savings": projected_savings,
+        "savings_scenarios": savings_scenarios,
+    }
+
+def _as_python(values, is_int=None):
+    """Convert a result column back to Python numbers, restoring ints where needed."""
+    values = values.tolist()
+    if is_int is None:
+        return values
+    return [int(v) if i else v for v, i in zip(values, is_int.tolist())]
+
+def _debt_details(packed):
+    """Build the per-profile "Debt Details" lists from the packed debt columns."""
+    raw = packed["debt_raw"]
+    monthly_interest = (packed["debt_amount"]["values"] * (packed["debt_apr"] / 12)).tolist()
+    details = [
+        {
+            "name": name,
+            "total_amount": amount,
+            "monthly_payment": monthly_payment,
+            "apr": apr,
+            "tenure": tenure,
+            "monthly_interest": interest
+        }
+        for name, amount, monthly_payment, apr, tenure, interest in zip(
+            raw["name"], raw["total_amount"], raw["monthly_payment"], raw["apr"], raw["tenure"], monthly_interest
+        )
+    ]
+    offsets = packed["debt_amount"]["offsets"].tolist()
+    return [details[offsets[i]:offsets[i + 1]] for i in range(packed["size"])]
+
+def _build_analyses(packed, columns):
+    """Assemble compute_financial_analysis-shaped dictionaries from result columns."""
+    c = columns
+    rows = zip(
+        _as_python(c["total_income"], c["total_income_is_int"]),
+        _as_python(c["total_expenses"], c["total_expenses_is_int"]),
+        _as_python(c["total_needs"], c["total_needs_is_int"]),
+        _as_python(c["total_wants"], c["total_wants_is_int"]),
+        _as_python(c["total_debt"], c["total_debt_is_int"]),
+        packed["savings_raw"],
+        _as_python(c["net_cash_flow"], c["net_cash_flow_is_int"]),
+        _as_python(c["recommended_monthly_savings"], c["recommended_monthly_savings_is_int"]),
+        _debt_details(packed),
+        _as_python(c["avalanche_months"]),
+        _as_python(c["avalanche_interest"], c["avalanche_interest_is_int"]),
+        _as_python(c["extra_funds"], c["extra_funds_is_int"]),
+        _as_python(c["snowball_months"]),
+        _as_python(c["snowball_interest"], c["snowball_interest_is_int"]),
+        _as_python(c["consolidation_payment"]),
+        _as_python(c["consolidation_interest"]),
+        _as_python(c["projected_savings"]),
+        c["savings_scenarios"].tolist(),
+    )
+    analyses = []
+    for row, (income, expenses, needs, wants, debt, savings, net_cash_flow, recommended, details,
+              avalanche_months, avalanche_interest, extra_funds, snowball_months, snowball_interest,
+              consolidation_payment, consolidation_interest, projected, scenarios) in enumerate(rows):
+        if row in c["avalanche_unpaid"]:
+            avalanche = summarize_repayment(c["avalanche_unpaid"][row], extra_funds)
+        else:
+            avalanche = {
+                "Estimated Months to Debt-Free": avalanche_months,
+                "Total Interest Paid": avalanche_interest,
+                "Extra Funds Used Monthly": extra_funds
+            }
+        if row in c["snowball_unpaid"]:
+            snowball = summarize_repayment(c["snowball_unpaid"][row], extra_funds)
+        else:
+            snowball = {
+                "Estimated Months to Debt-Free": snowball_months,
+                "Total Interest Paid": snowball_interest,
+                "Extra Funds Used Monthly": extra_funds
+            }
+        analysis = {
+            "Financial Summary": {
+                "Total Income": income,
+                "Total Expenses": expenses,
+                "  Needs": needs,
+                "  Wants": wants,
+                "Total Debt": debt,
+                "Current Savings": savings,
+                "Net Cash Flow": net_cash_flow,
+                "Recommended Monthly Savings": recommended
+            },
+            "Debt Details": details,
+            "Debt Repayment Simulations": {
+                "Avalanche Strategy": avalanche,
+                "Snowball Strategy": snowball,
+                "Consolidation Strategy": {
+                    "Monthly Consolidated Payment": consolidation_payment,
+                    "Total Interest Over Term": consolidation_interest,
+                    "Term (months)": CONSOLIDATION_TERM,
+                    "Assumed Consolidation APR": CONSOLIDATION_RATE
+                }
+            },
+            "Savings Projection": {
+                "Projected Savings in 5 Years": projected,
+                "Assumed Annual Savings Growth Rate": ANNUAL_SAVINGS_RATE,
+                "Growth Scenarios": _savings_scenarios(scenarios)
+            }
+        }
+        if row in c["avalanche_unpaid"] or row in c["snowball_unpaid"]:
+            analysis["Debt Feasibility"] = analyze_debt_feasibility(_row_debts(packed, row), extra_funds)
+        analyses.append(analysis)
+    return analyses
+
+def compute_financial_analysis_batch(profiles, chunk_size=DEFAULT_CHUNK_SIZE, max_months=DEFAULT_MAX_MONTHS):
+    """
+    Run compute_financial_analysis over many profiles with vectorized passes.
+    The output matches [compute_financial_analysis(p) for p in profiles] exactly,
+    including int/float types: the debt simulations take the scalar path's event-driven
+    closed-form jumps, only for every profile of the chunk at once. As the scalar path
+    already skips the months between events, the gain is bounded by packing the
+    profiles and assembling the result dictionaries, which cost about as much as the
+    simulations: roughly 3-5x over the scalar loop at 100k profiles.
+    :param profiles: Sequence of user_data dictionaries.
+    :param chunk_size: Profiles vectorized together; bounds peak memory.
+    :param max_months: Horizon of the debt repayment simulations.
+    :return: List of analysis dictionaries in input order.
+    """
+    # Packing and assembly allocate millions of small containers; pausing the
+    # cyclic collector avoids repeated full-heap scans that would dominate the run.
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        analyses = []
+        for start in range(0, len(profiles), chunk_size):
+            packed = pack_profiles(profiles[start:start + chunk_size])
+            analyses.extend(_build_analyses(packed, compute_batch_columns(packed, max_months)))
+        return analyses
+    finally:
+        if gc_enabled:
+            gc.enable()
@@ -0,0 +1,339 @@
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from FinanceModule import (
+    compute_financial_analysis,
+    compute_total_income,
+    compute_total_expenses,
+    project_savings_growth,
+    round_floats,
+    simulate_debt_consolidation,
+    simulate_debt_repayment_avalanche,
+    simulate_debt_repayment_snowball,
+    ANNUAL_SAVINGS_RATE,
+    CONSOLIDATION_RATE,
+    CONSOLIDATION_TERM,
+    PROJECTION_YEARS,
+    RECOMMENDED_SAVINGS_RATE,
+)
+from FinanceProfile import parse_profile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Default baseline file for --save and --compare.
+BASELINE_FILE = os.path.join(HERE, "bench_baseline.json")
+
+# Bump when cases or measurements change meaning, so old baselines are not compared.
+BENCH_VERSION = 2
+
+# A case regresses when its median latency grows by more than this fraction.
+REGRESSION_THRESHOLD = 0.10
+
+# Timed passes over each case's calls. The gate compares the best pass's median, so a
+# pass slowed down by a noisy neighbour on a shared runner does not fail it.
+REPEATS = 5
+
+# Profiles generated (and inputs prepared) at a time, so million-user cases never hold
+# every profile in memory.
+GENERATE_CHUNK = 10000
+
+# Untimed calls before each case, and calls traced for peak memory (tracemalloc slows
+# calls down, so it gets its own pass).
+WARMUP_CALLS = 20
+MEMORY_CALLS = 200
+
+###############################
+# Synthetic Profiles          #
+###############################
+
+def _debt(rng, kind, number):
+    """One debt of the given kind; balances and rates as in the profile kinds of synthetic_profile."""
+    if kind == "long_tenure":
+        balance = round(rng.uniform(100000, 600000), 2)
+        apr = round(rng.uniform(0.03, 0.08), 4)
+        rate = apr / 12
+        # About a 30-year amortizing payment, so repayment runs for hundreds of months.
+        payment = round(balance * rate / (1 - (1 + rate) ** -360) * rng.uniform(1.0, 1.05), 2)
+        tenure = 360
+    elif kind == "near_zero":
+        balance = round(rng.uniform(1000, 50000), 2)
+        apr = round(rng.uniform(0.05, 0.30), 4)
+        interest = balance * apr / 12
+        # Payments at or barely above the interest: interest-only or near-zero amortization.
+        payment = round(interest * rng.choice([1.0, rng.uniform(1.0005, 1.01)]), 2)
+        tenure = rng.randint(120, 480)
+    else:
+        balance = round(rng.uniform(500, 30000), 2)
+        apr = round(rng.uniform(0, 0.30), 4)
+        payment = round(balance * rng.uniform(0.02, 0.06), 2)
+        tenure = rng.randint(12, 72)
+    return {"name": f"Debt {number}", "total_amount": balance, "monthly_payment": payment, "apr": apr, "tenure": tenure}
+
+def synthetic_profile(rng, debts=(0, 5), kind="typical"):
+    """
+    A random user profile in the compute_financial_analysis format.
+    :param rng: random.Random to draw from.
+    :param debts: (fewest, most) debts.
+    :param kind: "typical" (consumer debts paid off in a few years), "long_tenure"
+                 (mortgage-sized 30-year debts) or "near_zero" (payments at or barely above
+                 the interest and no extra funds, so simulations run to the horizon).
+    """
+    debt = [_debt(rng, kind, i) for i in range(rng.randint(*debts))]
+    needs = [{"title": f"Need {i}", "amount": round(rng.uniform(100, 2000), 2)} for i in range(rng.randint(1, 4))]
+    wants = [{"title": f"Want {i}", "amount": round(rng.uniform(20, 600), 2)} for i in range(rng.randint(0, 4))]
+    outgoings = sum(d["monthly_payment"] for d in debt) + sum(item["amount"] for item in needs + wants)
+    # Near-zero profiles have exactly no money left for extra payments.
+    income = outgoings if kind == "near_zero" else round(outgoings * rng.uniform(0.9, 1.6), 2)
+    return {
+        "income": [{"title": "Job", "amount": income}],
+        "debt": debt,
+        "expenses": {"needs": needs, "wants": wants},
+        "savings": round(rng.uniform(0, 50000), 2),
+    }
+
+def synthetic_profiles(count, seed=0, debts=(0, 5), kind="typical"):
+    """count profiles from synthetic_profile, generated lazily; the same seed gives the same profiles."""
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield synthetic_profile(rng, debts, kind)
+
+###############################
+# Cases                       #
+###############################
+
+def _extra_funds(profile):
+    """Extra funds for debt, as compute_financial_analysis derives them."""
+    _, _, expenses = compute_total_expenses(profile["expenses"])
+    net = compute_total_income(profile["income"]) - expenses - sum(d["monthly_payment"] for d in profile["debt"])
+    return max(net - max(net * RECOMMENDED_SAVINGS_RATE, 0), 0)
+
+# Benchmarked functions: (function, prepare(profile) -> positional arguments). Inputs are
+# prepared before timing, so only the function itself is measured.
+FUNCTIONS = {
+    "compute_financial_analysis": (compute_financial_analysis, lambda p: (p,)),
+    "simulate_debt_repayment_avalanche": (simulate_debt_repayment_avalanche, lambda p: (p["debt"], _extra_funds(p))),
+    "simulate_debt_repayment_snowball": (simulate_debt_repayment_snowball, lambda p: (p["debt"], _extra_funds(p))),
+    "simulate_debt_consolidation": (simulate_debt_consolidation,
+                                    lambda p: (p["debt"], CONSOLIDATION_RATE, CONSOLIDATION_TERM)),
+    "project_savings_growth": (project_savings_growth,
+                               lambda p: (p["savings"], _extra_funds(p), ANNUAL_SAVINGS_RATE, PROJECTION_YEARS)),
+    "round_floats": (round_floats, lambda p: (compute_financial_analysis(p),)),
+    "parse_profile": (parse_profile, lambda p: (p,)),
+    "compute_financial_analysis_parsed": (compute_financial_analysis, lambda p: (parse_profile(p),)),
+}
+
+def _cases(functions, kind, users, debts):
+    return [(function, kind, users, debts) for function in functions]
+
+SIMULATORS = ["simulate_debt_repayment_avalanche", "simulate_debt_repayment_snowball"]
+
+# Suites of (function, profile kind, users, (fewest, most) debts) cases.
+SUITES = {
+    "quick": (
+        _cases(FUNCTIONS, "typical", 1000, (1, 5))
+        + _cases(SIMULATORS + ["compute_financial_analysis"], "typical", 50, (100, 500))
+        + _cases(SIMULATORS + ["compute_financial_analysis"], "long_tenure", 200, (1, 3))
+        + _cases(SIMULATORS + ["compute_financial_analysis"], "near_zero", 200, (1, 5))
+    ),
+    "full": (
+        _cases(FUNCTIONS, "typical", 100000, (1, 5))
+        + _cases(["compute_financial_analysis"], "typical", 1000000, (1, 5))
+        + _cases(SIMULATORS + ["compute_financial_analysis", "simulate_debt_consolidation"], "typical", 500, (500, 500))
+        + _cases(SIMULATORS + ["compute_financial_analysis"], "long_tenure", 10000, (1, 5))
+        + _cases(SIMULATORS + ["compute_financial_analysis"], "near_zero", 10000, (1, 20))
+    ),
+}
+
+def case_name(function, kind, users, debts):
+    return f"{function}/{kind}/users={users}/debts={debts[0]}-{debts[1]}"
+
+###############################
+# Measurement                 #
+###############################
+
+def _inputs(function, kind, users, debts, seed, limit=None):
+    """Prepared argument tuples of a case, in chunks of GENERATE_CHUNK."""
+    prepare = FUNCTIONS[function][1]
+    profiles = synthetic_profiles(users if limit is None else min(users, limit), seed, debts, kind)
+    while True:
+        chunk = [prepare(profile) for _, profile in zip(range(GENERATE_CHUNK), profiles)]
+        if not chunk:
+            return
+        yield chunk
+
+def run_case(function, kind, users, debts, seed=0, repeats=REPEATS):
+    """
+    Time every call of one case, repeats times, and trace the peak memory of a sample of calls.
+    :return: Dictionary with "calls" (per pass), "ops_per_second", latency percentiles
+             "p50_us", "p90_us", "p99_us", "max_us" (over all passes), "best_p50_us"
+             (lowest median of a single pass, which compare gates on), "repeats", and
+             "peak_kib" (largest traced allocation peak of a single call).
+    """
+    fn = FUNCTIONS[function][0]
+    for args in next(_inputs(function, kind, min(users, WARMUP_CALLS), debts, seed)):
+        fn(*args)
+
+    latencies = np.empty((repeats, users), dtype=np.int64)
+    clock = time.perf_counter_ns
+    for latency in latencies:
+        calls = 0
+        for chunk in _inputs(function, kind, users, debts, seed):
+            for args in chunk:
+                start = clock()
+                fn(*args)
+                latency[calls] = clock() - start
+                calls += 1
+
+    peak = 0
+    tracemalloc.start()
+    try:
+        for chunk in _inputs(function, kind, users, debts, seed, limit=MEMORY_CALLS):
+            for args in chunk:
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+                fn(*args)
+                peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) / 1000
+    total = latencies.sum() / 1e9
+    return {
+        "calls": calls,
+        "ops_per_second": latencies.size / total if total > 0 else None,
+        "p50_us": float(p50),
+        "p90_us": float(p90),
+        "p99_us": float(p99),
+        "max_us": float(latencies.max() / 1000),
+        "best_p50_us": float(np.median(latencies, axis=1).min() / 1000),
+        "repeats": repeats,
+        "peak_kib": peak / 1024,
+    }
+
+def machine():
+    """Where a baseline was measured; comparisons across machines are only indicative."""
+    return {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count(),
+            "processor": platform.processor() or platform.machine()}
+
+def run_suite(suite="quick", seed=0, match=None, progress=None, repeats=REPEATS):
+    """
+    Run a suite (see SUITES).
+    :param match: Only run cases whose name contains this text.
+    :param repeats: Timed passes per case (see run_case).
+    :param progress: Optional callable(name, result) called after each case.
+    :return: Dictionary with "version", "suite", "seed", "machine", "peak_rss_mib" and "results" by case name.
+    """
+    results = {}
+    for case in SUITES[suite]:
+        name = case_name(*case)
+        if match and match not in name:
+            continue
+        results[name] = run_case(*case, seed=seed, repeats=repeats)
+        if progress is not None:
+            progress(name, results[name])
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "version": BENCH_VERSION,
+        "suite": suite,
+        "seed": seed,
+        "machine": machine(),
+        "peak_rss_mib": peak_rss / (2**20 if sys.platform == "darwin" else 2**10),
+        "results": results,
+    }
+
+def check_comparable(baseline, suite, seed, names):
+    """Raise ValueError unless baseline is of this benchmark version, suite and seed and has every case in names."""
+    for field, value in (("version", BENCH_VERSION), ("suite", suite), ("seed", seed)):
+        if baseline.get(field) != value:
+            raise ValueError(f"baseline has {field} {baseline.get(field)!r}, this run {value!r}")
+    missing = sorted(set(names) - set(baseline["results"]))
+    if missing:
+        raise ValueError(f"baseline has no results for {', '.join(missing)}")
+
+def compare(report, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Cases of report whose best median latency (see run_case) is more than threshold above
+    the baseline's. Reports of another benchmark version, suite or seed, or with cases the
+    baseline does not have, raise ValueError rather than being compared in part.
+    :return: List of (case name, baseline µs, current µs, relative change), worst first.
+    """
+    check_comparable(baseline, report["suite"], report["seed"], report["results"])
+    regressions = []
+    for name, result in report["results"].items():
+        before = baseline["results"][name]["best_p50_us"]
+        change = result["best_p50_us"] / before - 1 if before else 0.0
+        if change > threshold:
+            regressions.append((name, before, result["best_p50_us"], change))
+    return sorted(regressions, key=lambda regression: -regression[3])
+
+###############################
+# Command Line                #
+###############################
+
+def _print_case(name, result):
+    print(f"{name:<82}{result['ops_per_second'] or 0:>12,.0f}{result['best_p50_us']:>11.1f}{result['p50_us']:>11.1f}"
+          f"{result['p90_us']:>11.1f}{result['p99_us']:>11.1f}{result['peak_kib']:>11.1f}", flush=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark FinanceModule on seeded synthetic profiles, and gate on "
+                                                 "regressions against a stored baseline.")
+    parser.add_argument("--suite", choices=sorted(SUITES), default="quick")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--match", help="Only run cases whose name contains this text.")
+    parser.add_argument("--save", nargs="?", const=BASELINE_FILE, metavar="FILE", help="Store the results as the baseline.")
+    parser.add_argument("--compare", nargs="?", const=BASELINE_FILE, metavar="FILE",
+                        help="Fail (exit 1) if a case's best median latency regressed against this baseline "
+                             "(exit 2 if the baseline is of another suite or seed).")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Allowed relative slowdown of the best median latency (default: %(default)s).")
+    parser.add_argument("--repeats", type=int, default=REPEATS,
+                        help="Timed passes per case (default: %(default)s).")
+    parser.add_argument("--json", metavar="FILE", help="Also write the results to this file.")
+    args = parser.parse_args(argv)
+    if args.repeats < 1:
+        parser.error(f"--repeats must be at least 1, got {args.repeats}")
+
+    baseline = None
+    if args.compare:
+        # Read first, so a missing or mismatched baseline fails before the suite runs.
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        names = [case_name(*case) for case in SUITES[args.suite]]
+        try:
+            check_comparable(baseline, args.suite, args.seed, [n for n in names if not args.match or args.match in n])
+        except ValueError as error:
+            print(f"cannot compare: {error}", file=sys.stderr)
+            return 2
+
+    print(f"{'case':<82}{'ops/s':>12}{'best p50':>11}{'p50 µs':>11}{'p90 µs':>11}{'p99 µs':>11}{'peak KiB':>11}")
+    report = run_suite(args.suite, args.seed, args.match, _print_case, args.repeats)
+    print(f"peak RSS {report['peak_rss_mib']:.0f} MiB")
+    for path in filter(None, [args.json, args.save]):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if baseline is not None:
+        if baseline["machine"] != report["machine"]:
+            print(f"warning: baseline measured on {baseline['machine']}", file=sys.stderr)
+        try:
+            regressions = compare(report, baseline, args.threshold)
+        except ValueError as error:
+            print(f"cannot compare: {error}", file=sys.stderr)
+            return 2
+        for name, before, after, change in regressions:
+            print(f"REGRESSION {name}: best p50 {before:.1f} -> {after:.1f} µs ({change:+.0%})", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"no case regressed by more than {args.threshold:.0%}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
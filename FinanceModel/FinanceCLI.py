@@ -0,0 +1,151 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from FinanceModule import compute_financial_analysis, round_floats, DEFAULT_MAX_MONTHS
+from FinanceProfile import parse_profile
+from FinanceReport import render_financial_report
+
+# Profiles sent to a worker at a time; large enough to amortize the inter-process overhead.
+DEFAULT_CHUNK_LINES = 256
+
+# Chunks submitted but not yet written, per worker. Bounds memory: the reader stops
+# until the oldest chunk has been written.
+IN_FLIGHT_PER_WORKER = 2
+
+###############################
+# Batch Analysis              #
+###############################
+
+def _analyze_chunk(task):
+    """
+    Analyze one chunk of JSONL lines; runs in a worker process.
+    Lines are parsed and validated (see FinanceProfile.parse_profile) here rather than
+    in the reader so parsing is parallel too.
+    A line that fails produces an {"error": ..., "line": ...} record in its place.
+    With report set, each record is {"analysis": ..., "report": ...} with the templated
+    report (rule-based recommendations, no model).
+    :return: Output lines, in the order of the input lines, and the number of errors.
+    """
+    numbers, lines, max_months, report = task
+    output = []
+    errors = 0
+    for number, line in zip(numbers, lines):
+        try:
+            analysis = compute_financial_analysis(parse_profile(json.loads(line)), max_months)
+            record = round_floats(analysis)
+            if report:
+                record = {"analysis": record, "report": render_financial_report(analysis)}
+        except Exception as error:
+            record = {"error": f"{type(error).__name__}: {error}", "line": number}
+            errors += 1
+        output.append(json.dumps(record) + "\n")
+    return output, errors
+
+def _chunks(lines, chunk_lines, max_months, report):
+    """Tasks of up to chunk_lines non-blank lines, read lazily, with their input line numbers."""
+    numbered = ((number, line) for number, line in enumerate(lines, 1) if line.strip())
+    while True:
+        chunk = list(islice(numbered, chunk_lines))
+        if not chunk:
+            return
+        yield [number for number, _ in chunk], [line for _, line in chunk], max_months, report
+
+def analyze_stream(lines, out, workers=None, chunk_lines=DEFAULT_CHUNK_LINES,
+                   max_months=DEFAULT_MAX_MONTHS, progress=None, report=False):
+    """
+    Analyze a stream of JSONL profiles and write round_floats-normalized results as JSONL,
+    one line per non-blank input line and in the same order.
+    Chunks are fanned out to a process pool with at most IN_FLIGHT_PER_WORKER chunks per
+    worker outstanding, so memory stays bounded however long the input is.
+    :param lines: Iterable of input lines (e.g. an open file).
+    :param out: Writable text stream.
+    :param workers: Worker processes; None uses every core, 1 runs in this process.
+    :param chunk_lines: Lines per chunk.
+    :param max_months: Horizon of the debt repayment simulations.
+    :param progress: Optional callable(profiles, seconds) called after each written chunk.
+    :param report: Also render the templated report of each profile, without the model.
+    :return: Dictionary with "profiles", "errors", "seconds" and "profiles_per_second".
+    """
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    profiles = errors = 0
+
+    def write(result):
+        nonlocal profiles, errors
+        output, chunk_errors = result
+        out.writelines(output)
+        profiles += len(output)
+        errors += chunk_errors
+        if progress is not None:
+            progress(profiles, time.perf_counter() - start)
+
+    tasks = _chunks(lines, chunk_lines, max_months, report)
+    if workers == 1:
+        for task in tasks:
+            write(_analyze_chunk(task))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for task in tasks:
+                if len(pending) >= workers * IN_FLIGHT_PER_WORKER:
+                    write(pending.popleft().result())
+                pending.append(executor.submit(_analyze_chunk, task))
+            while pending:
+                write(pending.popleft().result())
+
+    seconds = time.perf_counter() - start
+    return {
+        "profiles": profiles,
+        "errors": errors,
+        "seconds": seconds,
+        "profiles_per_second": profiles / seconds if seconds > 0 else 0.0
+    }
+
+###############################
+# Command Line                #
+###############################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Analyze user profiles read as JSONL and write the analyses as JSONL, in input order."
+    )
+    parser.add_argument("input", nargs="?", default="-", help="JSONL file of profiles, or - for stdin (default).")
+    parser.add_argument("-o", "--output", default="-", help="Output JSONL file, or - for stdout (default).")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes (default: all cores).")
+    parser.add_argument("--chunk-lines", type=int, default=DEFAULT_CHUNK_LINES, help="Profiles per chunk.")
+    parser.add_argument("--max-months", type=int, default=DEFAULT_MAX_MONTHS, help="Repayment simulation horizon.")
+    parser.add_argument("--report", action="store_true",
+                        help="Output {\"analysis\", \"report\"} records with the templated report (no LLM).")
+    parser.add_argument("--progress", action="store_true", help="Report throughput on stderr while running.")
+    args = parser.parse_args(argv)
+
+    def show_progress(profiles, seconds):
+        print(f"\r{profiles} profiles, {profiles / max(seconds, 1e-9):.0f}/s", end="", file=sys.stderr)
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    sink = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        stats = analyze_stream(source, sink, args.workers, args.chunk_lines, args.max_months,
+                               show_progress if args.progress else None, args.report)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+    if args.progress:
+        print(file=sys.stderr)
+    print(
+        f"{stats['profiles']} profiles ({stats['errors']} errors) in {stats['seconds']:.2f}s: "
+        f"{stats['profiles_per_second']:.0f} profiles/s",
+        file=sys.stderr
+    )
+    return 1 if stats["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
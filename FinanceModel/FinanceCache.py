@@ -0,0 +1,269 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import FinanceModule
+from FinanceModule import (
+    analysis_inputs,
+    compute_financial_analysis,
+    DEFAULT_MAX_MONTHS,
+)
+
+# Module-level parameters of FinanceModule that the analysis reads. They are looked up
+# when a key is built, so changing a default changes every key computed afterwards.
+MODEL_PARAMETERS = [
+    "RECOMMENDED_SAVINGS_RATE",
+    "CONSOLIDATION_RATE",
+    "CONSOLIDATION_TERM",
+    "ANNUAL_SAVINGS_RATE",
+    "PROJECTION_YEARS",
+    "SCENARIO_RATES",
+    "SCENARIO_YEARS",
+]
+
+# Bump when the analysis code changes its results, so entries written by older code
+# (in particular in a shared SQLite file) are never returned.
+CACHE_VERSION = 3
+
+# Entries kept in memory by default.
+DEFAULT_CACHE_SIZE = 1024
+
+# SQLite-tier hits whose access times are buffered before they are written in one
+# batch, so reads do not take the database's write lock.
+ACCESS_FLUSH_SIZE = 256
+
+###############################
+# Keys                        #
+###############################
+
+def model_parameters(max_months=DEFAULT_MAX_MONTHS):
+    """Current values of every parameter the analysis depends on."""
+    parameters = {name: getattr(FinanceModule, name) for name in MODEL_PARAMETERS}
+    parameters["max_months"] = max_months
+    return parameters
+
+def analysis_key(user_data, max_months=DEFAULT_MAX_MONTHS):
+    """
+    Content hash of the analysis of user_data: the sections the analysis reads
+    (see analysis_inputs) and the model parameters. Dictionary key order and unrelated
+    top-level keys do not matter. List order does, since it shows in the results
+    (the order of "Debt Details", tie-breaks between equal debts).
+    Ints and floats are kept distinct because they are reported as given.
+    A FinanceProfile.UserProfile is keyed by its normalized fields, so it may not share
+    keys with the dictionary it was parsed from.
+    """
+    content = {
+        "version": CACHE_VERSION,
+        "inputs": analysis_inputs(user_data, max_months),
+        "parameters": model_parameters(max_months),
+    }
+    canonical = json.dumps(content, sort_keys=True, separators=(",", ":"), default=_jsonable)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def _jsonable(value):
+    """Profile records as their dictionaries, anything else JSON cannot encode as its repr."""
+    return value.to_dict() if hasattr(value, "to_dict") else repr(value)
+
+###############################
+# Cache                       #
+###############################
+
+class ResultCache:
+    """
+    Two-tier cache of JSON-serializable results keyed by content hash.
+    An in-process LRU holds up to max_entries results; an optional SQLite file is shared
+    by every process that opens it, so a result computed by one worker is a hit in the
+    others, and holds up to max_disk_entries results (least recently used go first).
+    SQLite-tier hits only read the file: their access times are buffered and written
+    with the next put, or every ACCESS_FLUSH_SIZE hits, so the eviction order may miss
+    a process's most recent hits. Entries older than ttl seconds are treated as missing
+    in both tiers, except by get_stale, which still returns them so a caller can serve
+    one while refreshing it.
+    Results from memory are shared with the cache, so treat them as read-only.
+
+    stats counts "hits" (memory), "disk_hits", "stale_hits", "misses", "evictions"
+    (LRU, both tiers) and "expirations" (TTL).
+    """
+
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE, ttl=None, path=None, clock=time.time,
+                 max_disk_entries=None):
+        """
+        :param max_entries: Size of the in-memory LRU; 0 disables it.
+        :param ttl: Seconds an entry stays valid, or None for no expiry.
+        :param path: SQLite file for the shared tier, or None for memory only.
+        :param clock: Time source in seconds (for tests).
+        :param max_disk_entries: Size of the SQLite tier, or None for no limit.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.clock = clock
+        self.max_disk_entries = max_disk_entries
+        self.stats = {"hits": 0, "disk_hits": 0, "stale_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+        self._entries = OrderedDict()
+        # Access times of SQLite-tier hits not yet written, by key.
+        self._accessed = {}
+        self._lock = threading.Lock()
+        self._connection = None
+        self._connection_pid = None
+
+    def _db(self):
+        """SQLite connection of this process (connections are not shared across a fork)."""
+        if self._connection_pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+            connection.commit()
+            self._connection, self._connection_pid = connection, os.getpid()
+        return self._connection
+
+    def _flush_accessed(self, db):
+        """Write the buffered access times (the caller commits)."""
+        if self._accessed:
+            db.executemany("UPDATE results SET accessed = MAX(accessed, ?) WHERE key = ?",
+                           [(accessed, key) for key, accessed in self._accessed.items()])
+            self._accessed.clear()
+
+    def _expired(self, created):
+        return self.ttl is not None and self.clock() - created > self.ttl
+
+    def _remember(self, key, value, created):
+        """Store in the LRU, evicting the least recently used entries past max_entries."""
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (value, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _lookup(self, key, keep_stale):
+        """
+        (value, fresh) for key, or (None, False) on a miss. Expired entries are dropped,
+        or returned with fresh False when keep_stale is set.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[1]):
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return entry[0], True
+                if keep_stale:
+                    self.stats["stale_hits"] += 1
+                    return entry[0], False
+                del self._entries[key]
+                self.stats["expirations"] += 1
+            if self.path is not None:
+                db = self._db()
+                row = db.execute("SELECT value, created FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    fresh = not self._expired(row[1])
+                    if fresh or keep_stale:
+                        value = json.loads(row[0])
+                        self._accessed[key] = self.clock()
+                        if len(self._accessed) >= ACCESS_FLUSH_SIZE:
+                            self._flush_accessed(db)
+                            db.commit()
+                        if fresh:
+                            self._remember(key, value, row[1])
+                            self.stats["disk_hits"] += 1
+                        else:
+                            self.stats["stale_hits"] += 1
+                        return value, fresh
+                    db.execute("DELETE FROM results WHERE key = ? AND created = ?", (key, row[1]))
+                    db.commit()
+                    self.stats["expirations"] += 1
+            self.stats["misses"] += 1
+            return None, False
+
+    def get(self, key):
+        """Cached value of key, or None."""
+        return self._lookup(key, keep_stale=False)[0]
+
+    def get_stale(self, key):
+        """(value, fresh) for key, where an expired value is returned with fresh False; (None, False) on a miss."""
+        return self._lookup(key, keep_stale=True)
+
+    def put(self, key, value):
+        """Store value under key in both tiers."""
+        with self._lock:
+            created = self.clock()
+            self._remember(key, value, created)
+            if self.path is not None:
+                db = self._db()
+                db.execute(
+                    "INSERT OR REPLACE INTO results (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), created, created)
+                )
+                self._accessed.pop(key, None)
+                self._flush_accessed(db)
+                if self.max_disk_entries is not None:
+                    excess = db.execute("SELECT COUNT(*) FROM results").fetchone()[0] - self.max_disk_entries
+                    if excess > 0:
+                        db.execute(
+                            "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY accessed LIMIT ?)",
+                            (excess,)
+                        )
+                        self.stats["evictions"] += excess
+                db.commit()
+
+    def purge_expired(self):
+        """Drop expired entries from both tiers; returns how many were dropped."""
+        if self.ttl is None:
+            return 0
+        with self._lock:
+            expired = [key for key, (_, created) in self._entries.items() if self._expired(created)]
+            for key in expired:
+                del self._entries[key]
+            dropped = len(expired)
+            if self.path is not None:
+                db = self._db()
+                dropped += db.execute("DELETE FROM results WHERE created < ?", (self.clock() - self.ttl,)).rowcount
+                db.commit()
+            self.stats["expirations"] += dropped
+            return dropped
+
+    def clear(self):
+        """Remove every entry from both tiers (the counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._accessed.clear()
+            if self.path is not None:
+                db = self._db()
+                db.execute("DELETE FROM results")
+                db.commit()
+
+    def close(self):
+        """Write the buffered access times and close this process's SQLite connection, if open."""
+        with self._lock:
+            if self._connection is not None and self._connection_pid == os.getpid():
+                self._flush_accessed(self._connection)
+                self._connection.commit()
+                self._connection.close()
+            self._connection, self._connection_pid = None, None
+
+# Cache used by cached_financial_analysis when none is given.
+analysis_cache = ResultCache()
+
+def cached_financial_analysis(user_data, max_months=DEFAULT_MAX_MONTHS, cache=None):
+    """
+    compute_financial_analysis, reusing the result of an earlier call with the same
+    inputs and model parameters (see analysis_key).
+    :param cache: ResultCache to use; defaults to the module's in-memory analysis_cache.
+    """
+    cache = analysis_cache if cache is None else cache
+    key = analysis_key(user_data, max_months)
+    analysis = cache.get(key)
+    if analysis is None:
+        analysis = compute_financial_analysis(user_data, max_months)
+        cache.put(key, analysis)
+    return analysis
@@ -0,0 +1,89 @@
+import copy
+import json
+from collections import OrderedDict
+
+from FinanceModule import (
+    ANALYSIS_STAGES,
+    analysis_inputs,
+    assemble_analysis,
+    DEFAULT_MAX_MONTHS,
+)
+
+# Input combinations remembered per stage, so undoing an edit is also a cache hit.
+STAGE_CACHE_SIZE = 8
+
+def merge_user_data(user_data, diff):
+    """
+    Apply a diff to user_data without modifying either.
+    Nested dictionaries (such as "expenses") are merged key by key; any other value,
+    lists included, replaces the old one. A FinanceProfile.UserProfile is merged as its
+    dictionary (to_dict).
+    :return: New user_data dictionary; unchanged sections are shared with the old one.
+    """
+    merged = _profile_dict(user_data)
+    for key, value in diff.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_user_data(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+def _profile_dict(user_data):
+    """user_data as a dictionary: a copy of its top level, or a profile record's to_dict."""
+    return user_data.to_dict() if hasattr(user_data, "to_dict") else dict(user_data)
+
+def _canonical(value):
+    """Canonical form of an input or stage output (ints and floats stay distinct)."""
+    return json.dumps(value, sort_keys=True, default=repr)
+
+class IncrementalAnalysis:
+    """
+    compute_financial_analysis that keeps the outputs of every stage in ANALYSIS_STAGES,
+    keyed by that stage's own inputs. After an edit only the stages whose inputs changed
+    are rerun; a stage whose output comes out unchanged (say, the extra funds after an
+    expense edit that is absorbed by the savings share) stops the change from spreading.
+    The analysis shares objects with the cache, so treat it as read-only.
+    """
+
+    def __init__(self, user_data, max_months=DEFAULT_MAX_MONTHS):
+        """
+        :param user_data: Profile dictionary (see compute_financial_analysis) or
+                          FinanceProfile.UserProfile; kept as a dictionary copy.
+        :param max_months: Horizon of the debt repayment simulations.
+        """
+        self.user_data = copy.deepcopy(_profile_dict(user_data))
+        self.max_months = max_months
+        self.stage_cache = {name: OrderedDict() for name, _, _ in ANALYSIS_STAGES}
+        self.analysis = None
+        self.recomputed = self._run()
+
+    def update(self, diff):
+        """
+        Apply a diff to the profile (see merge_user_data) and refresh the analysis.
+        :return: The new analysis and the names of the stages that were recomputed, in order.
+        """
+        self.user_data = merge_user_data(self.user_data, diff)
+        self.recomputed = self._run()
+        return self.analysis, self.recomputed
+
+    def _run(self):
+        """Evaluate the stages in order, reusing cached outputs whose inputs are unchanged."""
+        values = analysis_inputs(self.user_data, self.max_months)
+        # Each value is serialized once; a stage's key is the tuple of its inputs' forms,
+        # and its output's form is kept with the output in the cache.
+        forms = {name: _canonical(value) for name, value in values.items()}
+        recomputed = []
+        for name, inputs, stage in ANALYSIS_STAGES:
+            key = tuple(forms[i] for i in inputs)
+            cache = self.stage_cache[name]
+            if key in cache:
+                cache.move_to_end(key)
+            else:
+                output = stage(*(values[i] for i in inputs))
+                cache[key] = (output, _canonical(output))
+                recomputed.append(name)
+                if len(cache) > STAGE_CACHE_SIZE:
+                    cache.popitem(last=False)
+            values[name], forms[name] = cache[key]
+        self.analysis = assemble_analysis(values)
+        return recomputed
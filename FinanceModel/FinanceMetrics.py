@@ -0,0 +1,349 @@
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+# Upper bounds of the latency histogram buckets, in milliseconds.
+LATENCY_BUCKETS_MS = [0.25, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 10000]
+
+# Finer buckets for single stages, many of which take microseconds.
+STAGE_BUCKETS_MS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000, 2500, 10000, 30000]
+
+# Seconds between stack samples of the slow-request profiler, and samples kept.
+PROFILE_INTERVAL = 0.005
+PROFILE_BUFFER = 20000
+
+# Deepest stack recorded per sample.
+PROFILE_DEPTH = 64
+
+###############################
+# Histograms                  #
+###############################
+
+class LatencyHistogram:
+    """Counts of latencies in buckets with the given upper bounds in milliseconds (the last is open-ended)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total_ms = 0.0
+
+    def observe(self, seconds):
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(self.buckets, ms)] += 1
+        self.total_ms += ms
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (None if empty or past the last bound)."""
+        count = sum(self.counts)
+        if count == 0:
+            return None
+        rank, seen = q * count, 0
+        for bound, bucket in zip(self.buckets + [None], self.counts):
+            seen += bucket
+            if seen >= rank:
+                return bound
+        return None
+
+    def snapshot(self):
+        count = sum(self.counts)
+        return {
+            "count": count,
+            "mean_ms": self.total_ms / count if count else None,
+            "p50_ms": self.quantile(0.5),
+            "p90_ms": self.quantile(0.9),
+            "p99_ms": self.quantile(0.99),
+            "buckets_ms": self.buckets,
+            "counts": self.counts
+        }
+
+###############################
+# Traces                      #
+###############################
+
+class Trace:
+    """
+    Wall time of the stages of one request (an analysis, a report) and counters such as
+    months simulated or prompt tokens. Functions that can be traced take trace=None and
+    skip all bookkeeping without one, so tracing costs nothing when it is off.
+    """
+
+    def __init__(self, name, sampler=None, slow_seconds=None, event_loop=False):
+        """
+        :param name: Kind of request, the "trace" label of the exported metrics.
+        :param sampler: StackSampler to take the stacks of a slow trace from, or None.
+        :param slow_seconds: Traces at least this long keep their stack samples.
+        :param event_loop: The request runs on an asyncio event loop, whose thread it
+                           shares with other requests and the idle selector. Its stacks
+                           are then sampled only inside the synchronous stages run through
+                           timed() (the loop runs nothing else meanwhile), not for the
+                           whole trace.
+        """
+        self.name = name
+        self.stages = {}
+        self.counts = {}
+        self.sampler = sampler
+        self.slow_seconds = slow_seconds
+        self.thread = threading.get_ident()
+        self.started = time.time()
+        # (start, end) perf_counter times of the sampled stages of an event-loop trace.
+        self.sampled = [] if event_loop and sampler is not None else None
+        if sampler is not None and self.sampled is None:
+            sampler.watch(self.thread)
+        self.start = time.perf_counter()
+
+    def stage(self, name):
+        """Context manager timing its block as stage name (repeated stages add up)."""
+        return _Stage(self.stages, name)
+
+    def synchronous_stage(self, name):
+        """
+        stage(name) for a block that does not await: in an event-loop trace with a
+        sampler, its stacks are sampled.
+        """
+        if self.sampled is None:
+            return _Stage(self.stages, name)
+        return _SampledStage(self.stages, name, self)
+
+    def observe(self, name, seconds):
+        """Add seconds measured elsewhere to stage name."""
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add(self, name, value=1):
+        """Add value to counter name."""
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def finish(self):
+        """
+        :return: The trace record: "trace", "time" (start, Unix seconds), "seconds",
+                 "stages" (seconds per stage), "counts", and for a slow trace with a
+                 sampler "profile" (see StackSampler.folded; its "scope" is "thread" for
+                 the whole trace, "synchronous stages" for an event-loop trace).
+        """
+        end = time.perf_counter()
+        seconds = end - self.start
+        record = {"trace": self.name, "time": self.started, "seconds": seconds, "stages": self.stages,
+                  "counts": self.counts}
+        if self.sampler is not None:
+            if self.sampled is None:
+                self.sampler.unwatch(self.thread)
+            if self.slow_seconds is not None and seconds >= self.slow_seconds:
+                if self.sampled is None:
+                    record["profile"] = dict(self.sampler.folded(self.thread, [(self.start, end)]), scope="thread")
+                else:
+                    record["profile"] = dict(self.sampler.folded(self.thread, self.sampled),
+                                             scope="synchronous stages")
+        return record
+
+class _Stage:
+    """Trace.stage's context manager (a class: cheaper than a generator-based one)."""
+    __slots__ = ("stages", "name", "start")
+
+    def __init__(self, stages, name):
+        self.stages = stages
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.stages[self.name] = self.stages.get(self.name, 0.0) + time.perf_counter() - self.start
+
+class _SampledStage(_Stage):
+    """A synchronous stage of an event-loop trace: its thread is sampled while it runs."""
+    __slots__ = ("trace",)
+
+    def __init__(self, stages, name, trace):
+        super().__init__(stages, name)
+        self.trace = trace
+
+    def __enter__(self):
+        self.trace.sampler.watch(self.trace.thread)
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter()
+        self.stages[self.name] = self.stages.get(self.name, 0.0) + end - self.start
+        self.trace.sampled.append((self.start, end))
+        self.trace.sampler.unwatch(self.trace.thread)
+
+def timed(trace, name, function, *args):
+    """function(*args), which must not be a coroutine, timed as stage name of trace if there is one."""
+    if trace is None:
+        return function(*args)
+    with trace.synchronous_stage(name):
+        return function(*args)
+
+###############################
+# Sampling Profiler           #
+###############################
+
+class StackSampler:
+    """
+    Background thread sampling the Python stacks of the threads that are running a
+    Trace every interval seconds, keeping the last PROFILE_BUFFER samples, so a trace
+    that turns out slow can keep the stacks taken while it ran. It sleeps while no
+    trace runs; while one does, it costs about one stack walk per interval.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL, buffer=PROFILE_BUFFER):
+        self.interval = interval
+        self.samples = deque(maxlen=buffer)
+        self.watched = {}
+        self.wake = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self.thread.start()
+
+    def watch(self, thread_id):
+        self.watched[thread_id] = self.watched.get(thread_id, 0) + 1
+        self.wake.set()
+
+    def unwatch(self, thread_id):
+        remaining = self.watched.get(thread_id, 1) - 1
+        if remaining > 0:
+            self.watched[thread_id] = remaining
+        else:
+            self.watched.pop(thread_id, None)
+
+    def _run(self):
+        while True:
+            if not self.watched:
+                self.wake.clear()
+                # Checked again after clearing, so a watch() in between is not missed.
+                if not self.watched:
+                    self.wake.wait()
+                continue
+            now = time.perf_counter()
+            frames = sys._current_frames()
+            for thread_id in list(self.watched):
+                frame = frames.get(thread_id)
+                codes = []
+                while frame is not None and len(codes) < PROFILE_DEPTH:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                self.samples.append((now, thread_id, tuple(codes)))
+            frames = frame = None
+            time.sleep(self.interval)
+
+    def folded(self, thread_id, intervals):
+        """
+        Stacks of thread_id sampled within the (start, end) perf_counter intervals, in the
+        folded format of flame graph tools ("file:function;...": samples, root first).
+        """
+        stacks = {}
+        for when, thread, codes in list(self.samples):
+            if thread == thread_id and any(start <= when <= end for start, end in intervals):
+                stack = ";".join(f"{os.path.basename(c.co_filename)}:{c.co_name}" for c in reversed(codes))
+                stacks[stack] = stacks.get(stack, 0) + 1
+        return {"interval_ms": self.interval * 1000, "stacks": stacks}
+
+###############################
+# Aggregation and Export      #
+###############################
+
+def _labels(**labels):
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels.items()) + "}"
+
+class Metrics:
+    """
+    Trace records aggregated into a histogram per trace and stage and counter totals,
+    exported as a Prometheus text-format file (for the node exporter's textfile
+    collector) and optionally logged one JSON line per record.
+    """
+
+    def __init__(self, log_path=None, prometheus_path=None, slow_seconds=None, profile_interval=None):
+        """
+        :param log_path: Append every trace record to this JSON lines file, or None.
+        :param prometheus_path: File write_prometheus writes, or None.
+        :param slow_seconds: Traces at least this long keep stack samples (see StackSampler),
+                             or None for no profiling.
+        :param profile_interval: Seconds between stack samples.
+        """
+        self.traces = {}
+        self.stages = {}
+        self.counts = {}
+        self.slow = {}
+        self.prometheus_path = prometheus_path
+        self.log = open(log_path, "a", encoding="utf-8") if log_path else None
+        self.slow_seconds = slow_seconds
+        self.profile_interval = profile_interval or PROFILE_INTERVAL
+        self.sampler = StackSampler(self.profile_interval) if slow_seconds is not None else None
+
+    def trace(self, name, event_loop=False):
+        """A Trace in this process that profiles like this Metrics (see Trace for event_loop)."""
+        return Trace(name, self.sampler, self.slow_seconds, event_loop)
+
+    def record(self, record):
+        """Aggregate a Trace.finish record (from this or a worker process) and log it."""
+        name = record["trace"]
+        self.traces.setdefault(name, LatencyHistogram(STAGE_BUCKETS_MS)).observe(record["seconds"])
+        for stage, seconds in record["stages"].items():
+            self.stages.setdefault((name, stage), LatencyHistogram(STAGE_BUCKETS_MS)).observe(seconds)
+        for counter, value in record["counts"].items():
+            self.counts[name, counter] = self.counts.get((name, counter), 0) + value
+        if "profile" in record:
+            self.slow[name] = self.slow.get(name, 0) + 1
+        if self.log is not None:
+            self.log.write(json.dumps(record) + "\n")
+
+    def snapshot(self):
+        """Histogram snapshots per trace and per stage and counter totals, for JSON metrics."""
+        return {
+            name: {
+                "latency": histogram.snapshot(),
+                "stages": {stage: h.snapshot() for (trace, stage), h in self.stages.items() if trace == name},
+                "counts": {counter: value for (trace, counter), value in self.counts.items() if trace == name},
+                "profiled": self.slow.get(name, 0)
+            }
+            for name, histogram in self.traces.items()
+        }
+
+    def prometheus(self):
+        """The metrics in Prometheus text format."""
+        lines = []
+
+        def histogram(metric, help_text, series):
+            lines.extend([f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"])
+            for labels, h in series:
+                cumulative = 0
+                for bound, count in zip(h.buckets, h.counts):
+                    cumulative += count
+                    lines.append(f"{metric}_bucket{_labels(**labels, le=bound / 1000)} {cumulative}")
+                cumulative += h.counts[-1]
+                lines.append(f"{metric}_bucket{_labels(**labels, le='+Inf')} {cumulative}")
+                lines.append(f"{metric}_sum{_labels(**labels)} {h.total_ms / 1000}")
+                lines.append(f"{metric}_count{_labels(**labels)} {cumulative}")
+
+        histogram("finance_trace_seconds", "Wall time of traced requests.",
+                  [({"trace": name}, h) for name, h in sorted(self.traces.items())])
+        histogram("finance_stage_seconds", "Wall time of the stages of traced requests.",
+                  [({"trace": name, "stage": stage}, h) for (name, stage), h in sorted(self.stages.items())])
+        lines.extend(["# HELP finance_trace_count_total Counters of traced requests (months simulated, tokens, ...).",
+                      "# TYPE finance_trace_count_total counter"])
+        for (name, counter), value in sorted(self.counts.items()):
+            lines.append(f"finance_trace_count_total{_labels(trace=name, counter=counter)} {value}")
+        lines.extend(["# HELP finance_profiled_traces_total Slow traces whose stacks were sampled.",
+                      "# TYPE finance_profiled_traces_total counter"])
+        for name, value in sorted(self.slow.items()):
+            lines.append(f"finance_profiled_traces_total{_labels(trace=name)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=None):
+        """Atomically replace the Prometheus file (path or prometheus_path) and flush the log."""
+        path = path or self.prometheus_path
+        if self.log is not None:
+            self.log.flush()
+        if path:
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "w", encoding="utf-8") as f:
+                f.write(self.prometheus())
+            os.replace(temporary, path)
+
+    def close(self):
+        self.write_prometheus()
+        if self.log is not None:
+            self.log.close()
+            self.log = None
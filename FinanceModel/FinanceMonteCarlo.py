@@ -0,0 +1,208 @@
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from FinanceBatch import _step_month
+from FinanceModule import (
+    compute_total_income,
+    compute_total_expenses,
+    analyze_debt_feasibility,
+    RECOMMENDED_SAVINGS_RATE,
+    ANNUAL_SAVINGS_RATE,
+    PROJECTION_YEARS,
+    DEFAULT_MAX_MONTHS,
+)
+
+# Paths simulated when the caller does not ask for a specific number.
+DEFAULT_PATHS = 10000
+
+# Paths simulated together; bounds memory regardless of the total number of paths.
+DEFAULT_CHUNK_PATHS = 16384
+
+# Annual volatility of savings returns around the expected annual rate.
+RETURN_VOLATILITY = 0.10
+
+# Chance of an income shock in any month, and the share of monthly income it costs.
+INCOME_SHOCK_PROBABILITY = 0.02
+INCOME_SHOCK_SIZE = 0.5
+
+# Percentile bands reported by default (P10/P50/P90).
+QUANTILES = [0.1, 0.5, 0.9]
+
+# Points kept per chunk to summarize a distribution without keeping every path.
+SKETCH_POINTS = 1001
+
+##############################
+# Profile Inputs              #
+##############################
+
+def _profile_inputs(user_data):
+    """
+    Reduce a user_data dictionary to the totals the simulation needs.
+    Debts are kept in avalanche order (highest APR first) as (debts x 1) columns.
+    "feasible" is False when the debts are never paid off even in months without
+    a shock, in which case the debt simulation stops at the savings horizon.
+    """
+    debts = sorted(user_data.get("debt", []), key=lambda d: d.get("apr", 0), reverse=True)
+    total_income = compute_total_income(user_data.get("income", []))
+    _, _, total_expenses = compute_total_expenses(user_data.get("expenses", {}))
+    total_min_debt_payments = sum(d.get("monthly_payment", 0) for d in debts)
+    net_cash_flow = total_income - (total_expenses + total_min_debt_payments)
+    best_extra = max(net_cash_flow - max(net_cash_flow * RECOMMENDED_SAVINGS_RATE, 0), 0)
+    return {
+        "income": total_income,
+        "net_cash_flow": net_cash_flow,
+        "feasible": not analyze_debt_feasibility(debts, best_extra)["never_paid_off"],
+        "savings": user_data.get("savings", 0),
+        "balance": np.array([max(d.get("total_amount", 0), 0) for d in debts], dtype=np.float64).reshape(-1, 1),
+        "rate": np.array([d.get("apr", 0) / 12 for d in debts], dtype=np.float64).reshape(-1, 1),
+        "payment": np.array([max(d.get("monthly_payment", 0), 0) for d in debts], dtype=np.float64).reshape(-1, 1),
+    }
+
+##############################
+# Quantile Sketches           #
+##############################
+
+def _sketch(values):
+    """Summarize one chunk by evenly spaced quantiles, each standing for an equal share of its paths."""
+    points = np.quantile(values, np.linspace(0, 1, SKETCH_POINTS))
+    return points, values.size / SKETCH_POINTS
+
+def _sketch_quantiles(sketches, quantiles):
+    """
+    Merge chunk sketches and read off quantiles.
+    Accurate to about 1 / SKETCH_POINTS in probability, however many chunks are merged.
+    """
+    points = np.concatenate([p for p, _ in sketches])
+    weights = np.concatenate([np.full(p.size, w) for p, w in sketches])
+    order = np.argsort(points, kind="stable")
+    points, weights = points[order], weights[order]
+    cumulative = (np.cumsum(weights) - weights / 2) / weights.sum()
+    return np.interp(quantiles, cumulative, points).tolist()
+
+def _histogram_quantiles(counts, quantiles):
+    """Quantiles of integer months from their histogram; None past the last simulated month."""
+    cumulative = np.cumsum(counts)
+    values = []
+    for q in quantiles:
+        month = int(np.searchsorted(cumulative, q * cumulative[-1]))
+        values.append(month if month < counts.size - 1 else None)
+    return values
+
+##############################
+# Path Simulation             #
+##############################
+
+def _remaining_debt(balance, open_paths, paths):
+    """Total debt left on every path, given the balances of the open ones."""
+    remaining = np.zeros(paths)
+    remaining[open_paths] = balance.sum(axis=0)
+    return remaining
+
+def _simulate_chunk(task):
+    """
+    Simulate one chunk of paths month by month.
+    Each month an income shock may cut the cash flow; the recommended share of what is
+    left goes to savings, which earn a normally distributed return, and the rest is
+    paid towards the debts (avalanche). Debts keep being simulated past the savings
+    horizon, up to max_months, to find the debt-free month.
+    :param task: (inputs, paths, months, max_months, annual_return, volatility,
+                  shock_probability, shock_size, seed_sequence)
+    :return: Savings and net-worth sketches and a histogram of debt-free months.
+    """
+    (inputs, paths, months, max_months, annual_return, volatility,
+     shock_probability, shock_size, seed_sequence) = task
+    rng = np.random.default_rng(seed_sequence)
+    rate, payment = inputs["rate"], inputs["payment"]
+    savings = np.full(paths, float(inputs["savings"]))
+    monthly_return = annual_return / 12
+    monthly_volatility = volatility / math.sqrt(12)
+    shock_cost = shock_size * inputs["income"]
+
+    # Only paths still in debt are kept in the debt matrices; debt_free holds the month
+    # each path paid everything off, with max_months + 1 standing for "never".
+    open_paths = np.arange(paths) if (inputs["balance"] > 0).any() else np.arange(0)
+    balance = np.repeat(inputs["balance"], open_paths.size, axis=1)
+    scratch = np.empty_like(balance)
+    total_interest = np.zeros(open_paths.size)
+    debt_free = np.zeros(paths, dtype=np.int64)
+    debt_free[open_paths] = max_months + 1
+    net_worth = savings - _remaining_debt(balance, open_paths, paths)
+
+    month = 0
+    while month < months or (open_paths.size and inputs["feasible"] and month < max_months):
+        month += 1
+        shocked = rng.random(paths) < shock_probability
+        surplus = inputs["net_cash_flow"] - shocked * shock_cost
+        contribution = np.maximum(surplus * RECOMMENDED_SAVINGS_RATE, 0)
+        if month <= months:
+            savings = savings * (1 + rng.normal(monthly_return, monthly_volatility, paths)) + contribution
+        if open_paths.size:
+            extra = np.maximum(surplus - contribution, 0)[open_paths]
+            _step_month(balance, rate, payment, extra, total_interest, scratch)
+            still_open = (balance > 0).any(axis=0)
+            if not still_open.all():
+                debt_free[open_paths[~still_open]] = month
+                open_paths, total_interest = open_paths[still_open], total_interest[still_open]
+                balance = balance[:, still_open]
+                scratch = np.empty_like(balance)
+        if month == months:
+            net_worth = savings - _remaining_debt(balance, open_paths, paths)
+
+    counts = np.bincount(debt_free, minlength=max_months + 2)
+    return _sketch(savings), _sketch(net_worth), counts
+
+def monte_carlo_projection(user_data, paths=DEFAULT_PATHS, years=PROJECTION_YEARS, seed=None,
+                           annual_return=ANNUAL_SAVINGS_RATE, volatility=RETURN_VOLATILITY,
+                           shock_probability=INCOME_SHOCK_PROBABILITY, shock_size=INCOME_SHOCK_SIZE,
+                           quantiles=QUANTILES, max_months=DEFAULT_MAX_MONTHS,
+                           chunk_size=DEFAULT_CHUNK_PATHS, workers=1):
+    """
+    Project savings, net worth and the debt-free date under stochastic returns and income shocks.
+    Paths are simulated in chunks of chunk_size, each with its own random stream derived
+    from seed, so results are reproducible and do not depend on the number of workers.
+    Only quantile summaries are kept per chunk, so memory stays bounded at millions of paths.
+    :param user_data: Profile dictionary (see compute_financial_analysis).
+    :param paths: Number of simulated paths.
+    :param years: Savings projection horizon in years.
+    :param seed: Seed for reproducible results (None for fresh randomness).
+    :param annual_return: Expected annual return on savings.
+    :param volatility: Annual volatility of savings returns.
+    :param shock_probability: Chance of an income shock in any month.
+    :param shock_size: Share of monthly income lost in a shock month.
+    :param quantiles: Probabilities to report, e.g. [0.1, 0.5, 0.9].
+    :param max_months: Horizon of the debt simulation.
+    :param chunk_size: Paths simulated together.
+    :param workers: Number of processes; 1 runs in the calling process.
+    :return: Dictionary of quantiles for savings, net worth and debt-free months,
+             plus the probability of being debt-free within max_months.
+    """
+    if paths < 1:
+        raise ValueError(f"paths must be at least 1, got {paths}")
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+    inputs = _profile_inputs(user_data)
+    months = int(years * 12)
+    sizes = [min(chunk_size, paths - start) for start in range(0, paths, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [
+        (inputs, size, months, max_months, annual_return, volatility, shock_probability, shock_size, chunk_seed)
+        for size, chunk_seed in zip(sizes, seeds)
+    ]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_simulate_chunk, tasks))
+    else:
+        results = [_simulate_chunk(task) for task in tasks]
+
+    counts = sum(r[2] for r in results)
+    labels = [f"p{round(q * 100)}" for q in quantiles]
+    return {
+        "paths": paths,
+        "years": years,
+        "savings": dict(zip(labels, _sketch_quantiles([r[0] for r in results], quantiles))),
+        "net_worth": dict(zip(labels, _sketch_quantiles([r[1] for r in results], quantiles))),
+        "debt_free_months": dict(zip(labels, _histogram_quantiles(counts, quantiles))),
+        "debt_free_probability": float(counts[:max_months + 1].sum() / paths),
+    }
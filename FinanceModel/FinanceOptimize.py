@@ -0,0 +1,360 @@
+import math
+import time
+
+from FinanceModule import (
+    _amortize,
+    _payoff_months,
+    _simulate_repayment,
+    _stuck_months,
+    analyze_debt_feasibility,
+    DEFAULT_MAX_MONTHS,
+)
+
+# Quantities the search can minimize; the other one breaks ties.
+OBJECTIVES = ("interest", "months")
+
+# Partial states remembered per memo key for dominance checks; the oldest are dropped first.
+MEMO_STATES = 8
+
+# Seconds the branch-and-bound search may run before settling for the best order found.
+# A state cap would have to be tuned to the number of debts (a few hundred states prove
+# most 10-debt optima, some 15-debt ones take a million); this proves the optimum for
+# typical profiles of up to about 12 debts and for most with 15.
+DEFAULT_TIME_BUDGET = 5.0
+
+##############################
+# Order Constraints           #
+##############################
+
+def _predecessors(debts, first, before):
+    """
+    Turn constraints on debt names into predecessor sets.
+    :param first: Names of debts that must lead the order, in that order.
+    :param before: (earlier, later) name pairs.
+    :return: List of sets; entry i holds the debts that must come before debt i.
+    """
+    index = {}
+    for i, d in enumerate(debts):
+        index.setdefault(d.get("name", ""), []).append(i)
+
+    def lookup(name):
+        matches = index.get(name, [])
+        if len(matches) != 1:
+            raise ValueError(f"Order constraint must name exactly one debt: {name!r}")
+        return matches[0]
+
+    leading = [lookup(name) for name in first]
+    pairs = [(lookup(earlier), lookup(later)) for earlier, later in before]
+    pairs += list(zip(leading, leading[1:]))
+    if leading:
+        pairs += [(leading[-1], i) for i in range(len(debts)) if i not in leading]
+    predecessors = [set() for _ in debts]
+    for earlier, later in pairs:
+        if earlier == later:
+            raise ValueError(f"Debt cannot come before itself: {debts[earlier].get('name', '')!r}")
+        predecessors[later].add(earlier)
+    return predecessors
+
+def _constrained_order(priority, predecessors):
+    """Order the debts by priority wherever the constraints allow (a stable topological sort)."""
+    order, placed = [], set()
+    while len(order) < len(priority):
+        ready = [i for i in priority if i not in placed and predecessors[i] <= placed]
+        if not ready:
+            raise ValueError("Repayment order constraints are contradictory")
+        order.append(ready[0])
+        placed.add(ready[0])
+    return order
+
+##############################
+# Partial-State Simulation    #
+##############################
+
+def _own_state(debt, months):
+    """
+    Balance and interest of a debt after months of its minimum payment alone, in closed
+    form. Until the extra funds reach a debt this is all it gets, whatever the order.
+    :param debt: [balance, monthly_rate, payment, months to pay off on the minimum alone,
+                 months until it stops amortizing (see FinanceModule._stuck_months)].
+    :return: (balance, interest), or None once the debt has stopped amortizing: the extra
+             funds can no longer pay it off, and its balance grows without bound.
+    """
+    balance, monthly_rate, payment, payoff, stuck = debt
+    if months >= stuck:
+        return None
+    if months < payoff:
+        return _amortize(balance, monthly_rate, payment, months)
+    balance, interest = _amortize(balance, monthly_rate, payment, payoff - 1)
+    return 0, interest + balance * monthly_rate
+
+def _advance(own, rates, payments, open_debts, target, extra_payment, month, interest, leftover):
+    """
+    Send the extra funds to target until it is paid off, in the fixed-order simulation.
+    The other open debts only make their minimum payments meanwhile, so the state left
+    behind depends on which debts were targeted and when, not on what comes next.
+    The target jumps to its payoff month in closed form and that month is stepped
+    operation for operation like _simulate_month.
+    :param own: _own_state lookup by (debt index, months), memoized across branches.
+    :param leftover: Extra funds of month not yet spent; they go to target first.
+    :return: Open debts, month, interest and leftover once target is paid off, stopping
+             mid-month if part of that month's extra funds is still unspent; or None if
+             target, or another open debt by then, has stopped amortizing.
+    """
+    monthly_rate, payment = rates[target], payments[target]
+    start = month
+    balance = own(target, month)[0]
+    spent = min(leftover, balance)
+    balance -= spent
+    leftover -= spent
+    if balance > 0:
+        months_left = _payoff_months(balance, monthly_rate, payment + extra_payment)
+        if months_left == math.inf:
+            return None
+        balance, accrued = _amortize(balance, monthly_rate, payment + extra_payment, months_left - 1)
+        month += months_left
+        final_interest = balance * monthly_rate
+        interest += accrued + final_interest
+        balance += final_interest
+        balance -= min(payment, balance)
+        leftover = extra_payment - min(extra_payment, balance)
+    still_open = []
+    for i in open_debts:
+        if i == target:
+            continue
+        state = own(i, month)
+        if state is None:
+            return None
+        balance, accrued = state
+        interest += accrued - own(i, start)[1]
+        if balance > 0:
+            still_open.append(i)
+    return frozenset(still_open), month, interest, leftover
+
+def _solo(own, rates, payments, debt, month, leftover, extra_payment):
+    """
+    Payoff month and lifetime interest of a debt if it alone got the extra funds from
+    month on (plus leftover in that month), after its minimum payments until then.
+    :return: (month, interest), or (inf, inf) if it is never paid off.
+    """
+    balance, interest = own(debt, month)
+    balance -= min(leftover, balance)
+    if balance <= 0:
+        return month, interest
+    payment = payments[debt] + extra_payment
+    months_left = _payoff_months(balance, rates[debt], payment)
+    if months_left == math.inf:
+        return math.inf, math.inf
+    balance, accrued = _amortize(balance, rates[debt], payment, months_left - 1)
+    return month + months_left, interest + accrued + max(balance * rates[debt], 0)
+
+def _lower_bound(own, rates, payments, open_debts, extra_payment, month, interest, leftover):
+    """
+    Optimistic (months, interest) for finishing from a partial state: every open debt
+    is costed as if it alone got the extra funds from now on, which only ever lowers
+    its interest and payoff month.
+    """
+    months_bound, interest_bound = month, interest
+    for i in open_debts:
+        finish, lifetime_interest = _solo(own, rates, payments, i, month, leftover, extra_payment)
+        months_bound = max(months_bound, finish)
+        interest_bound += lifetime_interest - own(i, month)[1]
+    return months_bound, interest_bound
+
+def _dominated(memo, key, month, interest, leftover):
+    """
+    Check a partial state against the states already searched with the same open debts
+    and remember it if it is new.
+    Open debts have only had their minimum payments, so their balances follow from the
+    month alone. An earlier state that paid no more interest can follow any later state's
+    order and stay ahead of it; in the same month it also needs as much unspent leftover.
+    """
+    states = memo.setdefault(key, [])
+    for seen_month, seen_interest, seen_leftover in states:
+        if seen_interest <= interest and (
+            seen_month < month or (seen_month == month and seen_leftover >= leftover)
+        ):
+            return True
+    states.append((month, interest, leftover))
+    if len(states) > MEMO_STATES:
+        states.pop(0)
+    return False
+
+##############################
+# Repayment Order Search      #
+##############################
+
+def _complete(own, rates, payments, order, extra_payment, open_debts):
+    """
+    Evaluate a full order from the start with the closed-form partial-state steps.
+    :return: (months, interest, targets) where targets lists (debt, first month of extra
+             funds) for the debts the extra funds reach, or None if a debt is never paid off.
+    """
+    month, interest, leftover = 0, 0, 0
+    targets = []
+    for i in order:
+        if i not in open_debts:
+            continue
+        start = month if leftover > 0 else month + 1
+        state = _advance(own, rates, payments, open_debts, i, extra_payment, month, interest, leftover)
+        if state is None:
+            return None
+        open_debts, month, interest, leftover = state
+        targets.append((i, start))
+    return month, interest, targets
+
+def _improve_order(order, evaluate, predecessors):
+    """
+    Local search over orders: move one debt to another position while that improves
+    the evaluation, keeping the order constraints. Gives the search a strong first bound.
+    :param evaluate: Maps an order to a comparable score (None if infeasible).
+    :return: Best order found and its score.
+    """
+    best_score = evaluate(order)
+    improved = True
+    while improved:
+        improved = False
+        for source in range(len(order)):
+            for target in range(len(order)):
+                if target == source:
+                    continue
+                candidate = order[:source] + order[source + 1:]
+                candidate.insert(target, order[source])
+                placed = set()
+                for i in candidate:
+                    if not predecessors[i] <= placed:
+                        break
+                    placed.add(i)
+                else:
+                    score = evaluate(candidate)
+                    if score is not None and (best_score is None or score < best_score):
+                        order, best_score, improved = candidate, score, True
+    return order, best_score
+
+def optimize_repayment_order(debts, extra_payment, objective="interest", first=(), before=(),
+                             max_months=DEFAULT_MAX_MONTHS, time_budget=DEFAULT_TIME_BUDGET, max_states=None):
+    """
+    Find the order in which to send the extra funds to the debts that minimizes total
+    interest or months to debt-free, under the semantics of simulate_debt_repayment
+    (minimum payments on every open debt, extra funds to the first open debt in order).
+    A local search over orders, starting from the avalanche or snowball order, sets the first
+    bound. A branch-and-bound search then extends orders one debt at a time from the
+    state their shared prefix leads to, in closed form with memoized minimum-payment
+    paths, pruning prefixes whose optimistic bound cannot beat the best order found and
+    partial states dominated by one already searched. It stops once time_budget runs out
+    (or after max_states states); "optimal" reports whether the search finished, proving
+    the order optimal.
+    :param debts: List of debt dictionaries (left unchanged).
+    :param extra_payment: Extra funds available each month to pay towards debt.
+    :param objective: "interest" or "months"; the other breaks ties.
+    :param first: Names of debts that must receive the extra funds first, in that order.
+    :param before: (earlier, later) pairs of debt names that must keep that order.
+    :param max_months: Horizon of the final simulation if the debts are never paid off
+                       (see simulate_debt_repayment); the search follows every order to
+                       the end and rules out those in which a debt stops amortizing.
+    :param time_budget: Seconds the branch-and-bound search may run (None for no limit).
+    :param max_states: Partial states the branch-and-bound search may visit (None for no
+                       limit); unlike the time budget, it gives reproducible results.
+    :return: simulate_debt_repayment result for the best order, plus "order" (debt
+             names; debts paid off by their minimum payments before the extra funds
+             reach them come last), "schedule" (the month each debt starts receiving
+             the extra funds), "optimal" and "states_explored".
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown optimization objective: {objective}")
+    balances = [d["total_amount"] for d in debts]
+    rates = [d["apr"] / 12 for d in debts]
+    payments = [d["monthly_payment"] for d in debts]
+    predecessors = _predecessors(debts, first, before)
+    open_debts = frozenset(i for i, b in enumerate(balances) if b > 0)
+
+    # Try the likely winners first: highest APR for interest (avalanche), smallest
+    # balance for months (snowball).
+    if objective == "interest":
+        priority = sorted(range(len(debts)), key=lambda i: (-rates[i], balances[i]))
+    else:
+        priority = sorted(range(len(debts)), key=lambda i: (balances[i], -rates[i]))
+    order = _constrained_order(priority, predecessors)
+
+    def rank(months, interest):
+        return (interest, months) if objective == "interest" else (months, interest)
+
+    # Untargeted debts follow the same minimum-payment path in every branch, so their
+    # states are computed once per month and shared.
+    own_debts = [
+        [
+            balances[i], rates[i], payments[i], _payoff_months(balances[i], rates[i], payments[i]),
+            _stuck_months(balances[i], rates[i], payments[i], extra_payment) if extra_payment > 0 else math.inf,
+        ]
+        for i in range(len(debts))
+    ]
+    own_states = {}
+
+    def own(debt, months):
+        key = (debt, months)
+        if key not in own_states:
+            own_states[key] = _own_state(own_debts[debt], months)
+        return own_states[key]
+
+    def evaluate(candidate):
+        completed = _complete(own, rates, payments, candidate, extra_payment, open_debts)
+        return None if completed is None else rank(completed[0], completed[1])
+
+    best = None
+    memo = {}
+    explored = 0
+    stopped = False
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+
+    def exhausted():
+        nonlocal stopped
+        if not stopped:
+            stopped = (max_states is not None and explored > max_states) or (
+                deadline is not None and time.perf_counter() > deadline
+            )
+        return stopped
+
+    def search(targets, open_debts, month, interest, leftover):
+        nonlocal best, explored
+        explored += 1
+        if not open_debts:
+            if best is None or rank(month, interest) < best[0]:
+                best = (rank(month, interest), targets)
+            return
+        if exhausted():
+            return
+        bound = rank(*_lower_bound(
+            own, rates, payments, open_debts, extra_payment, month, interest, leftover
+        ))
+        if best is not None and bound >= best[0]:
+            return
+        if _dominated(memo, open_debts, month, interest, leftover):
+            return
+        placed = set(range(len(debts))) - open_debts
+        for i in priority:
+            if exhausted():
+                break
+            if i in placed or not predecessors[i] <= placed:
+                continue
+            state = _advance(own, rates, payments, open_debts, i, extra_payment, month, interest, leftover)
+            if state is not None:
+                # Extra funds left over from a paid-off debt reach the next one in the same month.
+                search(targets + [(i, month if leftover > 0 else month + 1)], *state)
+
+    # Without extra funds the order does not matter, and a debt that is never paid off
+    # in any order makes every order equally infeasible.
+    if extra_payment > 0 and not analyze_debt_feasibility(debts, extra_payment)["never_paid_off"]:
+        order, score = _improve_order(order, evaluate, predecessors)
+        if score is not None:
+            best = (score, _complete(own, rates, payments, order, extra_payment, open_debts)[2])
+        search([], open_debts, 0, 0, 0)
+
+    targets = best[1] if best is not None else []
+    targeted = {i for i, _ in targets}
+    order = [i for i, _ in targets] + [i for i in order if i not in targeted]
+    state = [[balances[i], rates[i], payments[i]] for i in order]
+    result = _simulate_repayment(state, extra_payment, False, max_months)
+    result["order"] = [debts[i].get("name", "") for i in order]
+    result["schedule"] = [{"name": debts[i].get("name", ""), "from_month": month} for i, month in targets]
+    result["optimal"] = not stopped
+    result["states_explored"] = explored
+    return result
@@ -0,0 +1,228 @@
+import math
+
+# Numeric APRs above this are percentages, at or below it fractions: 18 -> 0.18 and
+# 0.18 stays, but also 1 -> 100% while 1.5 -> 1.5%. APRs above 100% must therefore be
+# given as strings ending in "%" ("150%"), which are always percentages.
+APR_PERCENT_THRESHOLD = 1
+
+###############################
+# Types                       #
+###############################
+
+class ProfileError(ValueError):
+    """A profile that cannot be analyzed; the message starts with the path of the bad value."""
+
+class _Record:
+    """
+    Base of the profile types: fixed fields in __slots__ (no per-instance dictionary),
+    plus read-only dictionary-style access (record["apr"], record.get("apr", 0)) so the
+    types can be passed anywhere the analysis takes the JSON dictionaries.
+    """
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        # Field names are the only keys callers use, so no check against the method names.
+        return getattr(self, key, default)
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def __eq__(self, other):
+        return type(other) is type(self) and all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{f}={getattr(self, f)!r}' for f in self.__slots__)})"
+
+    def to_dict(self):
+        """The record as the JSON dictionary it was parsed from (with defaults filled in)."""
+        return {f: _plain(getattr(self, f)) for f in self.__slots__}
+
+def _plain(value):
+    if isinstance(value, _Record):
+        return value.to_dict()
+    if isinstance(value, tuple):
+        return [_plain(v) for v in value]
+    return value
+
+class LineItem(_Record):
+    """An income or expense entry."""
+    __slots__ = ("title", "amount")
+
+    def __init__(self, title, amount):
+        self.title = title
+        self.amount = amount
+
+class Debt(_Record):
+    """A debt; apr is an annual fraction and tenure is in months."""
+    __slots__ = ("name", "total_amount", "monthly_payment", "apr", "tenure")
+
+    def __init__(self, name, total_amount, monthly_payment, apr=0, tenure=0):
+        self.name = name
+        self.total_amount = total_amount
+        self.monthly_payment = monthly_payment
+        self.apr = apr
+        self.tenure = tenure
+
+class Expenses(_Record):
+    """Needs and wants, tuples of LineItem."""
+    __slots__ = ("needs", "wants")
+
+    def __init__(self, needs=(), wants=()):
+        self.needs = needs
+        self.wants = wants
+
+class UserProfile(_Record):
+    """
+    A validated profile: income (tuple of LineItem), expenses (Expenses), debt (tuple
+    of Debt) and savings. compute_financial_analysis takes it in place of the JSON
+    dictionary, with the same results.
+    """
+    __slots__ = ("income", "expenses", "debt", "savings")
+
+    def __init__(self, income=(), expenses=None, debt=(), savings=0):
+        self.income = income
+        self.expenses = Expenses() if expenses is None else expenses
+        self.debt = debt
+        self.savings = savings
+
+###############################
+# Parsing                     #
+###############################
+
+def _number(value, path):
+    """A finite int or float; numeric strings are converted. Ints stay ints, as they are reported as given."""
+    kind = type(value)
+    if kind is int or kind is float:
+        number = value
+    elif kind is str:
+        text = value.strip().replace(",", "")
+        try:
+            number = int(text)
+        except ValueError:
+            try:
+                number = float(text)
+            except ValueError:
+                raise ProfileError(f"{path}: expected a number, got {value!r}") from None
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        number = value + 0
+    else:
+        raise ProfileError(f"{path}: expected a number, got {value!r}")
+    if number != number or number in (math.inf, -math.inf):
+        raise ProfileError(f"{path}: expected a finite number, got {value!r}")
+    return number
+
+def _amount(value, path):
+    number = _number(value, path)
+    if number < 0:
+        raise ProfileError(f"{path}: negative amount {value!r}")
+    return number
+
+def _apr(value, path):
+    """
+    An APR as a fraction: "18%" and 18 become 0.18, 0.18 stays. Numbers are read as
+    fractions up to APR_PERCENT_THRESHOLD inclusive, so 1 is 100% but 1.5 is 1.5%.
+    """
+    if type(value) is str and value.strip().endswith("%"):
+        return _amount(value.strip()[:-1], path) / 100
+    apr = _amount(value, path)
+    return apr / 100 if apr > APR_PERCENT_THRESHOLD else apr
+
+def _text(value, path):
+    if type(value) is not str:
+        raise ProfileError(f"{path}: expected a string, got {value!r}")
+    return value
+
+def _object(value, path):
+    if type(value) is not dict:
+        raise ProfileError(f"{path}: expected an object, got {type(value).__name__}")
+    return value
+
+def _list(value, path):
+    if type(value) is not list:
+        raise ProfileError(f"{path}: expected a list, got {type(value).__name__}")
+    return value
+
+# Types numbers may already have (anything else goes through _number).
+_NUMBERS = (int, float)
+
+def _line_items(items, path):
+    parsed = []
+    for i, item in enumerate(_list(items, path)):
+        if type(item) is not dict:
+            _object(item, f"{path}[{i}]")
+        title = item.get("title", "")
+        amount = item.get("amount", 0)
+        # Well-formed values are checked inline; the helpers only run (and build the
+        # path) for values that need converting or are invalid.
+        if type(title) is not str:
+            title = _text(title, f"{path}[{i}].title")
+        if not (type(amount) in _NUMBERS and 0 <= amount < math.inf):
+            amount = _amount(amount, f"{path}[{i}].amount")
+        parsed.append(LineItem(title, amount))
+    return tuple(parsed)
+
+def _debts(debts, path):
+    parsed = []
+    for i, d in enumerate(_list(debts, path)):
+        if type(d) is not dict:
+            _object(d, f"{path}[{i}]")
+        name = d.get("name", "")
+        total_amount = d.get("total_amount")
+        monthly_payment = d.get("monthly_payment")
+        apr = d.get("apr", 0)
+        tenure = d.get("tenure", 0)
+        if type(name) is not str:
+            name = _text(name, f"{path}[{i}].name")
+        if not (type(total_amount) in _NUMBERS and 0 <= total_amount < math.inf):
+            total_amount = _required_amount(d, "total_amount", f"{path}[{i}]")
+        if not (type(monthly_payment) in _NUMBERS and 0 <= monthly_payment < math.inf):
+            monthly_payment = _required_amount(d, "monthly_payment", f"{path}[{i}]")
+        if not (type(apr) in _NUMBERS and 0 <= apr <= APR_PERCENT_THRESHOLD):
+            apr = _apr(apr, f"{path}[{i}].apr")
+        if not (type(tenure) is int and tenure >= 0):
+            tenure = _tenure(tenure, f"{path}[{i}].tenure")
+        parsed.append(Debt(name, total_amount, monthly_payment, apr, tenure))
+    return tuple(parsed)
+
+def _required_amount(d, field, path):
+    if field not in d:
+        raise ProfileError(f"{path}.{field}: missing")
+    return _amount(d[field], f"{path}.{field}")
+
+def _tenure(value, path):
+    tenure = _amount(value, path)
+    if tenure != int(tenure):
+        raise ProfileError(f"{path}: expected whole months, got {value!r}")
+    return tenure
+
+def parse_profile(data):
+    """
+    Validate and normalize a JSON profile (see compute_financial_analysis for the format)
+    in one pass, at the boundary, so the analysis can rely on its fields:
+    numeric strings become numbers, APRs given as percentages become fractions (numbers
+    above APR_PERCENT_THRESHOLD = 1 and strings ending in "%" are percentages, so 1 is
+    100% but 1.5 is 1.5%, and "150%" is the way to write 150%), missing optional fields
+    get their defaults (empty sections, zero savings, APR and tenure, empty names), and
+    unknown keys are ignored.
+    Negative amounts, non-numeric or non-finite values, missing debt balances or payments
+    and malformed sections raise ProfileError.
+    :param data: Profile dictionary, as parsed from JSON.
+    :return: UserProfile.
+    """
+    data = _object(data, "profile")
+    expenses = _object(data.get("expenses", {}), "expenses")
+    return UserProfile(
+        _line_items(data.get("income", []), "income"),
+        Expenses(_line_items(expenses.get("needs", []), "expenses.needs"),
+                 _line_items(expenses.get("wants", []), "expenses.wants")),
+        _debts(data.get("debt", []), "debt"),
+        _amount(data.get("savings", 0), "savings")
+    )
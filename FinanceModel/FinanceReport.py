@@ -1,12 +1,41 @@
-from langchain_ollama import OllamaLLM
+import asyncio
+import hashlib
 import json
-def generate_financial_report_llama(financial_data):
-    """
-    Generate a detailed financial report using a local LLaMA model via LangChain's LlamaCpp.
-    The prompt includes the full financial analysis data to allow the model to generate an in-depth report.
-    """
+import math
+import os
+import re
+import time
+from urllib.parse import urlsplit
+
+from FinanceCache import ResultCache
+from FinanceMetrics import timed
+from FinanceModule import round_floats
+
+# Model used for reports, and the Ollama server (OLLAMA_HOST, as for the ollama CLI).
+REPORT_MODEL = "llama3.2"
+OLLAMA_URL = os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434")
 
-    prompt = f"""
+# Hugging Face tokenizer matching REPORT_MODEL, for exact prompt token counts (see
+# load_tokenizer); a hub name or a local directory.
+REPORT_TOKENIZER = os.environ.get("REPORT_TOKENIZER", "unsloth/Llama-3.2-1B-Instruct")
+
+# Reports generated at the same time by one OllamaClient; further ones wait for a slot.
+MAX_CONCURRENT_REPORTS = 4
+
+# Default limit on report prompt length, in tokens.
+PROMPT_TOKEN_BUDGET = 1024
+
+# Bump when the report instructions or the compact serialization change, so reports
+# generated from older prompts are not served from the cache.
+REPORT_PROMPT_VERSION = 1
+
+# Reports kept on disk, and how long a cached report counts as fresh (one week).
+REPORT_CACHE_SIZE = 10000
+REPORT_TTL = 7 * 24 * 3600
+
+def build_report_prompt(financial_data):
+    """Prompt asking for a report on the computed financial analysis, with the data embedded."""
+    return f"""
         You are a seasoned financial advisor with expertise in personal finance and wealth management.
         Generate a detailed, data-driven financial report using the following computed financial analysis.
         Use the exact numbers and computed values to provide specific, actionable recommendations.
@@ -22,54 +51,691 @@ def generate_financial_report_llama(financial_data):
 
         Please produce a comprehensive report of about 500 words that includes exact values, percentage splits, and clear, step-by-step recommendations.
     """
-<<<<<<< HEAD
-    
-    combined_prompt = """
-        You are a financial advisor specializing in debt reduction and savings growth. Based on the provided financial data, generate a comprehensive, structured report that includes the following:
 
-        - A summary of the client's total monthly income, categorized expenses (distinguishing between needs and wants), and outstanding debt details (including type, balance, APR, and monthly payment).
-        - A recommended debt repayment strategy (choose either Avalanche or Snowball) with an estimated payoff timeline and the potential interest savings.
-        - An analysis of the current budget with suggestions for reducing discretionary spending and reallocating funds to optimize debt repayment.
-        - A detailed savings plan that projects 5-year growth under different annual return scenarios (5%, 7%, and 10%), and recommendations for post-debt investment strategies (e.g., low-cost index funds, bonds, high-yield savings).
-        - A step-by-step 12-month action plan outlining key steps to achieve debt clearance, including an estimated debt-free date and projected savings balance after debt is cleared.
+###############################
+# Compact Prompt              #
+###############################
+
+REPORT_INSTRUCTIONS = """You are a seasoned financial advisor. Write a data-driven report of about 500 words from the financial analysis below, using its exact numbers for specific, actionable advice. Sections:
+1. Introduction: income, expenses, debt, current savings.
+2. Debt Repayment Plan: each debt, extra payments, time to debt-free, interest saved by the best strategy.
+3. Current Savings Status: current and recommended monthly savings.
+4. Future Savings Projections and Investment Recommendations, with the 5-year projection.
+5. Conclusion: key recommendations and clear next steps.
+Amounts are in dollars, rates are annual percentages, periods are months unless noted.
+
+"""
+
+def count_tokens(text, tokenizer=None):
+    """
+    Number of tokens in text.
+    :param tokenizer: Any tokenizer with an encode(text) method returning the token ids
+                      (Hugging Face or tiktoken) for an exact count. Without one, the count
+                      is estimated as the model tokenizers split English and numbers: about
+                      four letters or three digits per token and one per symbol.
+    """
+    if tokenizer is not None:
+        return len(tokenizer.encode(text))
+    return sum(
+        math.ceil(len(piece) / (3 if piece[0].isdigit() else 4)) if piece[0].isalnum() else 1
+        for piece in re.findall(r"[A-Za-z]+|\d+|\S", text)
+    )
+
+def load_tokenizer(name=REPORT_TOKENIZER):
+    """
+    Tokenizer for count_tokens, to be loaded once (e.g. at server startup) and passed to
+    every prompt builder.
+    :param name: Hugging Face hub name or local directory of the tokenizer.
+    :return: The tokenizer, or None if transformers is not installed or the tokenizer
+             cannot be loaded (offline and not cached), in which case the counts are
+             estimated (see count_tokens).
+    """
+    try:
+        from transformers import AutoTokenizer
+    except ImportError:
+        return None
+    try:
+        return AutoTokenizer.from_pretrained(name)
+    except (OSError, ValueError):
+        return None
+
+def _money(value):
+    return "n/a" if value is None else f"{value:.0f}"
 
-        For guidance, consider the following structure:
+def _percent(rate):
+    return f"{rate * 100:.3g}%"
 
-        1. **Introduction: Financial Overview**
-        - Total Monthly Income
-        - Total Expenses (Needs vs. Wants)
-        - Total Debt (Debt Type, Balance, APR, Monthly Payment)
-        - Current Savings
+def _compact_sections(analysis, snippets=()):
+    """
+    The analysis as compact text sections, most important first: whole dollars, rates as
+    percentages, and tables with a single header row instead of repeated keys.
+    Each snippet (retrieved advice, see FinanceRetrieval) is an optional "guidance<N>"
+    section at the end.
+    :return: List of (name, text, required) in prompt order.
+    """
+    summary = analysis["Financial Summary"]
+    sections = [("summary", (
+        f"Monthly: income {_money(summary['Total Income'])}, expenses {_money(summary['Total Expenses'])} "
+        f"(needs {_money(summary['  Needs'])}, wants {_money(summary['  Wants'])}), "
+        f"net cash flow {_money(summary['Net Cash Flow'])}, recommended savings {_money(summary['Recommended Monthly Savings'])}\n"
+        f"Total debt {_money(summary['Total Debt'])}, current savings {_money(summary['Current Savings'])}"
+    ), True)]
 
-        2. **Debt Analysis & Repayment Plan**
-        - Detailed Debt Breakdown
-        - Optimized Repayment Strategy (Avalanche/Snowball)
-        - Estimated Debt-Free Timeline
-        - Projected Interest Savings
+    debts = analysis["Debt Details"]
+    if debts:
+        rows = [f"{d['name']}|{_money(d['total_amount'])}|{_money(d['monthly_payment'])}|{_percent(d['apr'])}"
+                f"|{d['tenure']}|{_money(d['monthly_interest'])}" for d in debts]
+        sections.append(("debts", "Debts: name|balance|payment|APR|tenure|interest\n" + "\n".join(rows), False))
 
-        3. **Budget & Expense Optimization**
-        - Analysis of Needs vs. Wants
-        - Recommended Budget Adjustments
-        - Suggested Fund Reallocation for Debt Repayment
+    simulations = analysis["Debt Repayment Simulations"]
+    rows, stalled = [], []
+    for label in ("Avalanche", "Snowball"):
+        strategy = simulations[f"{label} Strategy"]
+        months = strategy["Estimated Months to Debt-Free"]
+        rows.append(f"{label.lower()}|{'never' if months is None else months}|{_money(strategy['Total Interest Paid'])}"
+                    f"|{_money(strategy['Extra Funds Used Monthly'])}")
+        never = strategy.get("Never Paid Off")
+        if never:
+            trajectory = ", ".join(f"{p['month']}:{_money(p['balance'])}" for p in never["Balance Trajectory"])
+            stalled.append(f"{label.lower()}: {_money(never['Remaining Balance'])} left after {never['Months Simulated']} "
+                           f"months; balance by month {trajectory}")
+    consolidation = simulations["Consolidation Strategy"]
+    sections.append(("repayment", (
+        "Repayment: strategy|months to debt-free|total interest|extra payment\n" + "\n".join(rows) + "\n"
+        f"consolidation at {_percent(consolidation['Assumed Consolidation APR'])} over {consolidation['Term (months)']} "
+        f"months: payment {_money(consolidation['Monthly Consolidated Payment'])}, "
+        f"interest {_money(consolidation['Total Interest Over Term'])}"
+    ), True))
+    if stalled:
+        sections.append(("never_paid_off", "Never paid off: " + "\n".join(stalled), False))
 
-        4. **Savings & Future Financial Projections**
-        - Current Savings & Monthly Contributions
-        - 5-Year Savings Growth Projections (at 5%, 7%, and 10% returns)
-        - Post-Debt Investment Recommendations
+    feasibility = analysis.get("Debt Feasibility")
+    if feasibility:
+        problems = "; ".join(f"{d['name']} {d['status']} (interest {_money(d['monthly_interest'])} vs payment "
+                             f"{_money(d['monthly_payment'])})" for d in feasibility["debts"] if d["status"] != "amortizing")
+        sections.append(("feasibility", (
+            f"Feasibility: monthly interest {_money(feasibility['total_monthly_interest'])} vs payments "
+            f"{_money(feasibility['total_monthly_payment'])}" + (f"; {problems}" if problems else "")
+        ), True))
 
-        5. **Action Plan & Final Recommendations**
-        - Step-by-Step 12-Month Action Plan
-        - Estimated Debt-Free Date
-        - Projected Savings Post-Debt
-        - Next Steps for Financial Stability and Wealth-Building
+    projection = analysis["Savings Projection"]
+    sections.append(("projection", (
+        f"Savings in 5 years at {_percent(projection['Assumed Annual Savings Growth Rate'])}: "
+        f"{_money(projection['Projected Savings in 5 Years'])}"
+    ), True))
+    scenarios = projection["Growth Scenarios"]
+    if scenarios:
+        years = sorted({s["years"] for s in scenarios})
+        by_rate = {}
+        for s in scenarios:
+            by_rate.setdefault(s["annual_rate"], {})[s["years"]] = s["projected_savings"]
+        rows = [_percent(rate) + "|" + "|".join(_money(values.get(y)) for y in years) for rate, values in by_rate.items()]
+        sections.append(("scenarios", "Savings scenarios: rate|" + "|".join(f"{y}y" for y in years) + "\n" + "\n".join(rows), False))
+    for number, snippet in enumerate(snippets, 1):
+        header = "Relevant guidance (use where it applies):\n" if number == 1 else ""
+        sections.append((f"guidance{number}", f"{header}- {snippet}", False))
+    return sections
 
-        Using this combined prompt, generate a report that clearly addresses each of these points with sufficient detail.
+def build_compact_report_prompt(analysis, budget=PROMPT_TOKEN_BUDGET, tokenizer=None, snippets=None):
+    """
+    Report prompt with the analysis in compact form (see _compact_sections), several
+    times shorter than build_report_prompt's indented JSON. Prompt processing time on
+    CPU grows with prompt length, so this is what the async report API sends.
+    If the prompt is over budget, optional sections are dropped, least important first
+    (scenarios, guidance snippets from the last, never-paid-off trajectories, then the
+    debt table); required sections are always kept, so the result can still exceed a
+    very small budget.
+    :param analysis: compute_financial_analysis output.
+    :param budget: Token limit for the whole prompt, or None for no limit.
+    :param tokenizer: Tokenizer for exact counts (see count_tokens).
+    :param snippets: Retrieved advice to ground the report in (see FinanceRetrieval.retrieve_snippets).
+    :return: The prompt and {"tokens", "budget", "dropped"}.
     """
+    sections = _compact_sections(analysis, snippets or ())
+    dropped = []
+    guidance = [f"guidance{number}" for number in range(len(snippets or ()), 0, -1)]
+    drop_order = [name for name in ["scenarios", *guidance, "never_paid_off", "debts"] if any(s[0] == name for s in sections)]
+    while True:
+        prompt = REPORT_INSTRUCTIONS + "\n".join(text for name, text, _ in sections if name not in dropped)
+        tokens = count_tokens(prompt, tokenizer)
+        if budget is None or tokens <= budget or not drop_order:
+            return prompt, {"tokens": tokens, "budget": budget, "dropped": dropped}
+        dropped.append(drop_order.pop(0))
 
-    llm = OllamaLLM(model="llama3.2", prompt=combined_prompt)
-    report = llm(combined_prompt)
+def generate_financial_report_llama(financial_data, cache=None, trace=None):
+    """
+    Generate a detailed financial report using a local LLaMA model via LangChain's LlamaCpp.
+    The prompt includes the full financial analysis data to allow the model to generate an in-depth report.
+    Blocks until the whole report is generated; see stream_financial_report for the async API.
+    :param cache: Optional ReportCache; a fresh cached report for the same data is returned as is.
+    :param trace: Optional FinanceMetrics.Trace recording the cache lookup, prompt and generation
+                  times and the prompt and response token counts.
+    """
+    key = report_key(financial_data, REPORT_MODEL, "json") if cache is not None else None
+    if key is not None:
+        report = timed(trace, "report_cache", cache.results.get, key)
+        if report is not None:
+            if trace is not None:
+                trace.add("report_cache_hits")
+            return report
+
+    from langchain_ollama import OllamaLLM
+
+    prompt = timed(trace, "prompt", build_report_prompt, financial_data)
+    llm = OllamaLLM(model=REPORT_MODEL, prompt=prompt)
+    report = timed(trace, "generate", llm, prompt)
+    if trace is not None:
+        trace.add("prompt_tokens", count_tokens(prompt))
+        trace.add("response_tokens", count_tokens(report))
+    if key is not None:
+        cache.results.put(key, report)
+        cache.counters["generated"] += 1
     return report
 
+###############################
+# Async Streaming Client      #
+###############################
+
+class OllamaError(Exception):
+    """Ollama answered with an error status or an error message in the stream."""
+
+async def _read_body(reader, headers):
+    """Yield the raw response body, chunked or with a Content-Length."""
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            if size == 0:
+                await reader.readuntil(b"\r\n")
+                return
+            data = await reader.readexactly(size + 2)
+            yield data[:-2]
+    elif "content-length" in headers:
+        remaining = int(headers["content-length"])
+        while remaining:
+            data = await reader.read(min(remaining, 65536))
+            if not data:
+                raise asyncio.IncompleteReadError(b"", remaining)
+            remaining -= len(data)
+            yield data
+    else:
+        while data := await reader.read(65536):
+            yield data
+
+class OllamaClient:
+    """
+    Async client for Ollama's /api/generate that keeps its HTTP connections open
+    between requests and runs at most max_concurrency generations at a time.
+    A generation whose consumer stops early (cancelled task, closed generator) has its
+    connection closed, which makes Ollama stop generating.
+    """
+
+    def __init__(self, base_url=OLLAMA_URL, model=REPORT_MODEL, max_concurrency=MAX_CONCURRENT_REPORTS):
+        url = urlsplit(base_url if "//" in base_url else "http://" + base_url)
+        self.host = url.hostname or "127.0.0.1"
+        self.port = url.port or 11434
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.idle = []
+
+    async def _connection(self):
+        """An idle pooled connection if there is one, else a new one; and whether it was reused."""
+        while self.idle:
+            reader, writer = self.idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer, True
+            writer.close()
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        return reader, writer, False
+
+    async def _request(self, body):
+        """Send a generate request; returns the connection and the response status and headers."""
+        while True:
+            reader, writer, reused = await self._connection()
+            try:
+                writer.write(
+                    f"POST /api/generate HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+                )
+                await writer.drain()
+                head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                if reused:
+                    # The server closed an idle connection; retry on a fresh one.
+                    continue
+                raise
+            except BaseException:
+                writer.close()
+                raise
+            headers = {}
+            for line in head[1:]:
+                name, _, value = line.partition(":")
+                if name:
+                    headers[name.strip().lower()] = value.strip()
+            return reader, writer, int(head[0].split(" ")[1]), headers
+
+    async def stream(self, prompt, options=None):
+        """
+        Generate a completion, yielding text fragments as Ollama produces them.
+        :param prompt: Prompt text.
+        :param options: Optional Ollama model options (temperature, num_predict, ...).
+        """
+        payload = {"model": self.model, "prompt": prompt, "stream": True}
+        if options:
+            payload["options"] = options
+        async with self.slots:
+            reader, writer, status, headers = await self._request(json.dumps(payload).encode("utf-8"))
+            complete = False
+            try:
+                if status != 200:
+                    body = b"".join([data async for data in _read_body(reader, headers)])
+                    complete = True
+                    raise OllamaError(f"Ollama returned {status}: {body.decode('utf-8', 'replace')}")
+                pending = b""
+                async for data in _read_body(reader, headers):
+                    *lines, pending = (pending + data).split(b"\n")
+                    for line in lines:
+                        if not line.strip():
+                            continue
+                        message = json.loads(line)
+                        if "error" in message:
+                            raise OllamaError(message["error"])
+                        if message.get("response"):
+                            yield message["response"]
+                complete = True
+            finally:
+                if complete and headers.get("connection", "").lower() != "close":
+                    self.idle.append((reader, writer))
+                else:
+                    writer.close()
+
+    async def generate(self, prompt, options=None):
+        """Whole completion text."""
+        return "".join([fragment async for fragment in self.stream(prompt, options)])
+
+    async def close(self):
+        """Close the pooled connections."""
+        idle, self.idle = self.idle, []
+        for _, writer in idle:
+            writer.close()
+
+async def _traced_stream(client, prompt, trace, tokenizer=None):
+    """client.stream(prompt), timed as the "first_token" and "generate" stages of trace."""
+    if trace is None:
+        async for fragment in client.stream(prompt):
+            yield fragment
+        return
+    fragments = []
+    with trace.stage("generate"):
+        start = time.perf_counter()
+        async for fragment in client.stream(prompt):
+            if not fragments:
+                trace.observe("first_token", time.perf_counter() - start)
+            fragments.append(fragment)
+            yield fragment
+    trace.add("response_tokens", count_tokens("".join(fragments), tokenizer))
+
+async def stream_financial_report(analysis, client, budget=PROMPT_TOKEN_BUDGET, tokenizer=None, snippets=None,
+                                  trace=None):
+    """
+    Async version of generate_financial_report_llama that yields the report as it is
+    generated, so the first words arrive long before the report is finished.
+    The analysis is sent in compact form (see build_compact_report_prompt).
+    :param analysis: compute_financial_analysis output.
+    :param client: OllamaClient, shared between reports so connections are reused.
+    :param budget: Prompt token budget.
+    :param tokenizer: Tokenizer for exact prompt token counts (see count_tokens).
+    :param snippets: Retrieved advice to include in the prompt, or None.
+    :param trace: Optional FinanceMetrics.Trace recording the prompt, first token and
+                  generation times and the prompt and response token counts.
+    """
+    prompt, stats = timed(trace, "prompt", build_compact_report_prompt, analysis, budget, tokenizer, snippets)
+    if trace is not None:
+        trace.add("prompt_tokens", stats["tokens"])
+    async for fragment in _traced_stream(client, prompt, trace, tokenizer):
+        yield fragment
+
+async def generate_financial_reports(analyses, client=None, on_fragment=None, budget=PROMPT_TOKEN_BUDGET):
+    """
+    Generate reports for many analyses concurrently, at most client.max_concurrency at once.
+    :param client: OllamaClient to use; a temporary one with the defaults if None.
+    :param on_fragment: Optional callable(index, fragment) called as each report streams in.
+    :param budget: Prompt token budget of each report.
+    :return: Reports in the order of analyses.
+    """
+    own_client = client is None
+    client = OllamaClient() if own_client else client
+
+    async def report(index, analysis):
+        fragments = []
+        async for fragment in stream_financial_report(analysis, client, budget):
+            fragments.append(fragment)
+            if on_fragment is not None:
+                on_fragment(index, fragment)
+        return "".join(fragments)
+
+    try:
+        return await asyncio.gather(*(report(i, a) for i, a in enumerate(analyses)))
+    finally:
+        if own_client:
+            await client.close()
+
+###############################
+# Report Cache                #
+###############################
+
+def report_key(financial_data, model=REPORT_MODEL, template="compact", budget=None, snippets=None):
+    """
+    Cache key of a report: a fingerprint of the data rounded as in round_floats (so
+    float noise below a cent does not miss), the prompt template and REPORT_PROMPT_VERSION,
+    the token budget, the model and the retrieved snippets, if any.
+    """
+    content = {
+        "data": round_floats(financial_data),
+        "template": template,
+        "version": REPORT_PROMPT_VERSION,
+        "budget": budget,
+        "model": model,
+    }
+    if snippets:
+        content["snippets"] = list(snippets)
+    canonical = json.dumps(content, sort_keys=True, separators=(",", ":"), default=repr)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class ReportCache:
+    """
+    Generated reports kept in a SQLite file shared by every worker process (see
+    ResultCache), at most max_entries of them, least recently used evicted first.
+    A report older than ttl is regenerated; with serve_stale it is still returned right
+    away while a background task regenerates it. Concurrent requests for a report that
+    is being generated wait for that generation instead of starting another.
+    """
+
+    def __init__(self, path, max_entries=REPORT_CACHE_SIZE, ttl=REPORT_TTL, serve_stale=True, memory_entries=256):
+        """
+        :param path: SQLite file of the cache.
+        :param max_entries: Reports kept on disk.
+        :param ttl: Seconds a report stays fresh, or None to keep it until evicted.
+        :param serve_stale: Return an expired report while it is refreshed in the background.
+        :param memory_entries: Reports also kept in this process's memory.
+        """
+        self.results = ResultCache(max_entries=memory_entries, ttl=ttl, path=path, max_disk_entries=max_entries)
+        self.serve_stale = serve_stale
+        self.pending = {}
+        self.counters = {"generated": 0, "refreshes": 0, "refresh_errors": 0}
+
+    async def report(self, analysis, client, budget=PROMPT_TOKEN_BUDGET, tokenizer=None, template="compact",
+                     snippets=None):
+        """
+        Report for a compute_financial_analysis result, from the cache when possible,
+        otherwise generated with client.
+        :param template: Prompt in PROMPT_TEMPLATES: "compact" for the whole report,
+                         "narrative" for the recommendations of the templated report.
+        :param snippets: Retrieved advice to include in the prompt (part of the key).
+        """
+        key = report_key(analysis, client.model, template, budget, snippets)
+        # SQLite may wait on another worker's write, so it is kept off the event loop.
+        report, fresh = await asyncio.to_thread(self.results.get_stale, key)
+        if report is not None and (fresh or self.serve_stale):
+            if not fresh and key not in self.pending:
+                self.counters["refreshes"] += 1
+                self._generate(key, analysis, client, budget, tokenizer, template, snippets).add_done_callback(self._refreshed)
+            return report
+        return await asyncio.shield(self._generate(key, analysis, client, budget, tokenizer, template, snippets))
+
+    def _generate(self, key, analysis, client, budget, tokenizer, template, snippets):
+        """Task generating and storing the report for key, shared by everyone asking meanwhile."""
+        task = self.pending.get(key)
+        if task is None:
+            async def generate():
+                prompt, _ = PROMPT_TEMPLATES[template](analysis, budget, tokenizer, snippets)
+                report = await client.generate(prompt)
+                await asyncio.to_thread(self.results.put, key, report)
+                self.counters["generated"] += 1
+                return report
+
+            task = asyncio.ensure_future(generate())
+            self.pending[key] = task
+            task.add_done_callback(lambda _: self.pending.pop(key, None))
+        return task
+
+    def _refreshed(self, task):
+        if task.cancelled() or task.exception() is not None:
+            self.counters["refresh_errors"] += 1
+
+    def metrics(self):
+        """Cache counters plus the hit rate (fresh and stale hits over all lookups)."""
+        stats = dict(self.results.stats, **self.counters)
+        hits = stats["hits"] + stats["disk_hits"] + stats["stale_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = hits / lookups if lookups else None
+        stats["generating"] = len(self.pending)
+        return stats
+
+    def close(self):
+        self.results.close()
+
+###############################
+# Templated Report            #
+###############################
+
+# Narrative sections asked of the model by the templated report, their length, and the
+# prompt budget (room for the data and two or three retrieved snippets).
+NARRATIVE_WORDS = 150
+NARRATIVE_TOKEN_BUDGET = 512
+
+NARRATIVE_INSTRUCTIONS = f"""You are a seasoned financial advisor. The client's report already states all the numbers below. Write only a "Recommendations" paragraph and a numbered "Next Steps" list, about {NARRATIVE_WORDS} words in total, with specific, actionable advice. Quote numbers only from the data, unchanged. Amounts are in dollars, rates are annual percentages, periods are months.
+
+"""
+
+def _dollars(value):
+    if value is None:
+        return "n/a"
+    return f"-${-value:,.2f}" if value < 0 else f"${value:,.2f}"
+
+def _duration(months):
+    if months is None:
+        return "not within the simulated horizon"
+    years, rest = divmod(months, 12)
+    parts = ([f"{years} year{'s' * (years != 1)}"] if years else []) + ([f"{rest} month{'s' * (rest != 1)}"] if rest or not years else [])
+    return " ".join(parts)
+
+def _share(part, whole):
+    return f"{part / whole:.0%}" if whole else "n/a"
+
+def render_report_sections(analysis):
+    """
+    The deterministic sections of the report, rendered from a compute_financial_analysis
+    result with its exact numbers: overview, debt repayment plan, savings status and
+    projections. Pure string formatting, so it takes microseconds.
+    :return: List of (title, markdown text).
+    """
+    summary = analysis["Financial Summary"]
+    income = summary["Total Income"]
+    debts = analysis["Debt Details"]
+    min_payments = sum(d["monthly_payment"] for d in debts)
+    sections = [("Financial Overview", "\n".join([
+        f"- Monthly income: {_dollars(income)}",
+        f"- Monthly expenses: {_dollars(summary['Total Expenses'])} ({_share(summary['Total Expenses'], income)} of income): "
+        f"needs {_dollars(summary['  Needs'])} ({_share(summary['  Needs'], income)}), "
+        f"wants {_dollars(summary['  Wants'])} ({_share(summary['  Wants'], income)})",
+        f"- Minimum debt payments: {_dollars(min_payments)} ({_share(min_payments, income)} of income)",
+        f"- Net cash flow: {_dollars(summary['Net Cash Flow'])} per month",
+        f"- Total debt: {_dollars(summary['Total Debt'])}",
+        f"- Current savings: {_dollars(summary['Current Savings'])}",
+    ]))]
+
+    simulations = analysis["Debt Repayment Simulations"]
+    if debts:
+        avalanche, snowball = simulations["Avalanche Strategy"], simulations["Snowball Strategy"]
+        consolidation = simulations["Consolidation Strategy"]
+        lines = ["| Debt | Balance | Monthly payment | APR | Monthly interest |", "|---|---|---|---|---|"]
+        lines += [f"| {d['name']} | {_dollars(d['total_amount'])} | {_dollars(d['monthly_payment'])} | {d['apr']:.2%} "
+                  f"| {_dollars(d['monthly_interest'])} |" for d in debts]
+        lines += ["", f"Extra funds available for debt each month: {_dollars(avalanche['Extra Funds Used Monthly'])}.", ""]
+        lines += ["| Strategy | Debt-free in | Total interest |", "|---|---|---|"]
+        for label, strategy in (("Avalanche (highest APR first)", avalanche), ("Snowball (smallest balance first)", snowball)):
+            lines.append(f"| {label} | {_duration(strategy['Estimated Months to Debt-Free'])} "
+                         f"| {_dollars(strategy['Total Interest Paid'])} |")
+        lines.append(f"| Consolidation at {consolidation['Assumed Consolidation APR']:.2%} | "
+                     f"{_duration(consolidation['Term (months)'])} at {_dollars(consolidation['Monthly Consolidated Payment'])}/month "
+                     f"| {_dollars(consolidation['Total Interest Over Term'])} |")
+        lines.append("")
+        if avalanche["Estimated Months to Debt-Free"] is not None and snowball["Estimated Months to Debt-Free"] is not None:
+            saved = snowball["Total Interest Paid"] - avalanche["Total Interest Paid"]
+            best, other = ("avalanche", "snowball") if saved >= 0 else ("snowball", "avalanche")
+            lines.append(f"The {best} strategy saves {_dollars(abs(saved))} in interest over the {other} strategy.")
+        for label, strategy in (("avalanche", avalanche), ("snowball", snowball)):
+            never = strategy.get("Never Paid Off")
+            if never:
+                lines.append(f"With the {label} strategy the debt is never paid off: {_dollars(never['Remaining Balance'])} "
+                             f"is still owed after {_duration(never['Months Simulated'])}.")
+        feasibility = analysis.get("Debt Feasibility")
+        if feasibility:
+            for d in feasibility["debts"]:
+                if d["status"] in ("interest only", "negative amortization"):
+                    lines.append(f"{d['name']}: the {_dollars(d['monthly_payment'])} payment does not exceed the "
+                                 f"{_dollars(d['monthly_interest'])} of monthly interest ({d['status']}).")
+        sections.append(("Debt Repayment Plan", "\n".join(lines).rstrip()))
+    else:
+        sections.append(("Debt Repayment Plan", "No outstanding debt."))
+
+    if summary["Recommended Monthly Savings"] > 0:
+        saving = (f"Setting aside {_dollars(summary['Recommended Monthly Savings'])} per month "
+                  f"({_share(summary['Recommended Monthly Savings'], summary['Net Cash Flow'])} of net cash flow) is recommended.")
+    else:
+        saving = "There is no net cash flow left to save each month."
+    sections.append(("Current Savings Status", f"Current savings are {_dollars(summary['Current Savings'])}. {saving}"))
+
+    projection = analysis["Savings Projection"]
+    scenarios = projection["Growth Scenarios"]
+    years = sorted({s["years"] for s in scenarios})
+    by_rate = {}
+    for s in scenarios:
+        by_rate.setdefault(s["annual_rate"], {})[s["years"]] = s["projected_savings"]
+    lines = [f"At {projection['Assumed Annual Savings Growth Rate']:.0%} annual growth, savings reach "
+             f"{_dollars(projection['Projected Savings in 5 Years'])} in 5 years."]
+    if scenarios:
+        lines += ["", "| Annual return | " + " | ".join(f"{y} year{'s' * (y != 1)}" for y in years) + " |",
+                  "|---" * (len(years) + 1) + "|"]
+        lines += [f"| {rate:.0%} | " + " | ".join(_dollars(values.get(y)) for y in years) + " |" for rate, values in by_rate.items()]
+    sections.append(("Savings Projections", "\n".join(lines)))
+    return sections
+
+def rule_recommendations(analysis):
+    """
+    Recommendations and next steps from fixed rules, for reports made without the model:
+    cover interest first, keep wants under 30% of income (the 50/30/20 rule), hold three
+    months of outgoings as an emergency fund, and pick the cheapest repayment strategy.
+    """
+    summary = analysis["Financial Summary"]
+    income = summary["Total Income"]
+    simulations = analysis["Debt Repayment Simulations"]
+    outgoings = summary["Total Expenses"] + sum(d["monthly_payment"] for d in analysis["Debt Details"])
+    steps = []
+    if summary["Net Cash Flow"] < 0:
+        steps.append(f"Spending exceeds income by {_dollars(-summary['Net Cash Flow'])} a month; cut expenses "
+                     f"before anything else, starting with the {_dollars(summary['  Wants'])} of wants.")
+    feasibility = analysis.get("Debt Feasibility")
+    if feasibility:
+        for d in feasibility["debts"]:
+            if d["status"] in ("interest only", "negative amortization"):
+                steps.append(f"Raise the payment on {d['name']} above its {_dollars(d['monthly_interest'])} monthly "
+                             f"interest, or refinance it; otherwise it never shrinks.")
+    if income and summary["  Wants"] > 0.3 * income:
+        steps.append(f"Trim wants from {_dollars(summary['  Wants'])} to {_dollars(0.3 * income)} (30% of income) and "
+                     f"put the difference towards {'debt' if analysis['Debt Details'] else 'savings'}.")
+    if analysis["Debt Details"]:
+        strategies = {label: simulations[f"{label.title()} Strategy"] for label in ("avalanche", "snowball")}
+        paid_off = {label: s for label, s in strategies.items() if s["Estimated Months to Debt-Free"] is not None}
+        if paid_off:
+            best = min(paid_off, key=lambda label: paid_off[label]["Total Interest Paid"])
+            strategy = paid_off[best]
+            steps.append(f"Follow the {best} strategy with {_dollars(strategy['Extra Funds Used Monthly'])} of extra "
+                         f"payments a month to be debt-free in {_duration(strategy['Estimated Months to Debt-Free'])}.")
+            consolidation = simulations["Consolidation Strategy"]
+            if consolidation["Total Interest Over Term"] < strategy["Total Interest Paid"]:
+                steps.append(f"Consider consolidating at {consolidation['Assumed Consolidation APR']:.2%}: "
+                             f"{_dollars(consolidation['Total Interest Over Term'])} of interest instead of "
+                             f"{_dollars(strategy['Total Interest Paid'])}.")
+    if summary["Current Savings"] < 3 * outgoings:
+        steps.append(f"Build an emergency fund of {_dollars(3 * outgoings)} (three months of expenses and debt payments).")
+    if summary["Recommended Monthly Savings"] > 0:
+        steps.append(f"Automate {_dollars(summary['Recommended Monthly Savings'])} of savings a month into a high-yield "
+                     f"account or low-cost index funds.")
+    if not steps:
+        steps.append("Keep the current budget; it covers expenses, debt and savings.")
+    return "\n".join(f"{i}. {step}" for i, step in enumerate(steps, 1))
+
+def build_narrative_prompt(analysis, budget=NARRATIVE_TOKEN_BUDGET, tokenizer=None, snippets=None):
+    """
+    Small prompt for the recommendations of the templated report: the required compact
+    sections only (summary, repayment, feasibility, projection), since the report
+    already shows the rest, and the retrieved snippets if given. Without snippets this
+    always fits NARRATIVE_TOKEN_BUDGET in practice, so the budget only limits the
+    snippets: the last ones are left out until the prompt fits.
+    :return: The prompt and {"tokens", "budget", "dropped"} (see build_compact_report_prompt).
+    """
+    sections = _compact_sections(analysis, snippets or ())
+    kept = [text for _, text, required in sections if required]
+    guidance = [text for name, text, _ in sections if name.startswith("guidance")]
+    dropped = [name for name, _, required in sections if not required and not name.startswith("guidance")]
+    while True:
+        prompt = NARRATIVE_INSTRUCTIONS + "\n".join(kept + guidance)
+        tokens = count_tokens(prompt, tokenizer)
+        if budget is None or tokens <= budget or not guidance:
+            return prompt, {"tokens": tokens, "budget": budget, "dropped": dropped}
+        dropped.append(f"guidance{len(guidance)}")
+        guidance.pop()
+
+# Prompt builders by template name, as used in report cache keys.
+PROMPT_TEMPLATES = {
+    "compact": build_compact_report_prompt,
+    "narrative": build_narrative_prompt,
+}
+
+def render_financial_report(analysis, narrative=None):
+    """
+    Full markdown report: the deterministic sections and a recommendations section.
+    :param analysis: compute_financial_analysis output.
+    :param narrative: Recommendations text (e.g. from the model); None uses rule_recommendations,
+                      which makes the report fully deterministic (no-LLM mode).
+    """
+    sections = render_report_sections(analysis)
+    sections.append(("Recommendations and Next Steps", rule_recommendations(analysis) if narrative is None else narrative.strip()))
+    return "\n\n".join(f"## {title}\n\n{text}" for title, text in sections) + "\n"
+
+async def stream_templated_report(analysis, client, cache=None, snippets=None, trace=None, tokenizer=None):
+    """
+    Templated report whose recommendations are written by the model: the deterministic
+    sections are yielded at once, then the recommendations as they are generated
+    (in one piece when they come from cache, a ReportCache).
+    :param snippets: Retrieved advice for the model to draw on, or None.
+    :param trace: Optional FinanceMetrics.Trace recording the render, prompt and generation
+                  times and the token counts (see stream_financial_report).
+    :param tokenizer: Tokenizer for exact token counts (see count_tokens).
+    """
+    sections = timed(trace, "render", render_report_sections, analysis)
+    yield "\n\n".join(f"## {title}\n\n{text}" for title, text in sections) + "\n\n## Recommendations and Next Steps\n\n"
+    if cache is not None:
+        narrative = cache.report(analysis, client, NARRATIVE_TOKEN_BUDGET, tokenizer, "narrative", snippets)
+        if trace is None:
+            narrative = await narrative
+        else:
+            with trace.stage("generate"):
+                narrative = await narrative
+            trace.add("response_tokens", count_tokens(narrative, tokenizer))
+        yield narrative.strip()
+    else:
+        prompt, stats = timed(trace, "prompt", build_narrative_prompt, analysis, NARRATIVE_TOKEN_BUDGET, tokenizer,
+                              snippets)
+        if trace is not None:
+            trace.add("prompt_tokens", stats["tokens"])
+        async for fragment in _traced_stream(client, prompt, trace, tokenizer):
+            yield fragment
+    yield "\n"
+
 if __name__ == "__main__":
     financial_data = {
         "income": [
@@ -96,9 +762,3 @@ if __name__ == "__main__":
 
     report = generate_financial_report_llama(financial_data)
     print(report)
-=======
-
-    llm = OllamaLLM(model="llama3.2", prompt=prompt)
-    report = llm(prompt)
-    return report
->>>>>>> 28baa4484efc29906374904b1d8e7106d0b9266e
@@ -0,0 +1,322 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+import shutil
+import tempfile
+
+import numpy as np
+
+from TuningData import read_examples, CSV_FILE, TRAIN_FILE, VALIDATION_FILE, HERE
+
+# Articles indexed by default: the CSV and the chat-formatted splits (which mostly repeat
+# the CSV; identical articles are indexed once).
+CORPUS_FILES = [CSV_FILE, TRAIN_FILE, VALIDATION_FILE]
+
+# The index is built here (one subdirectory per segment plus manifest.json).
+INDEX_DIR = os.environ.get("RETRIEVAL_INDEX_DIR", os.path.join(HERE, ".retrieval_index"))
+
+# Bump when tokenization or the stored layout changes; older indexes are rebuilt.
+INDEX_VERSION = 1
+
+# BM25 term-frequency saturation and length normalization.
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Segments kept before an incremental build merges them into one.
+MAX_SEGMENTS = 8
+
+# Snippets put into report prompts, and their length in words.
+DEFAULT_TOP_K = 3
+SNIPPET_WORDS = 40
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between both but
+by can could did do does doing down during each few for from further had has have having he her here hers herself
+him himself his how i if in into is it its itself just me more most my myself no nor not now of off on once only or
+other our ours ourselves out over own same she should so some such than that the their theirs them themselves then
+there these they this those through to too under until up very was we were what when where which while who whom why
+will with you your yours yourself yourselves you'll you're you've it's don't can't won't that's there's let's
+""".split())
+
+###############################
+# Text                        #
+###############################
+
+def _stem(word):
+    """Fold the plural and a few verb forms so "payments"/"payment" and "paying"/"pay" match."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 5 and word.endswith("ing"):
+        return word[:-3]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+def tokenize(text):
+    """Index terms of text: lowercase words and numbers, stopwords removed, lightly stemmed."""
+    return [_stem(word) for word in re.findall(r"[a-z0-9]+(?:'[a-z]+)?", text.lower()) if word not in STOPWORDS]
+
+def document_id(title, content):
+    """Content hash of an article, so the same article from two files is indexed once."""
+    return hashlib.sha256(f"{title.strip()}\0{content.strip()}".encode("utf-8")).hexdigest()[:32]
+
+def corpus_documents(paths=CORPUS_FILES):
+    """{"id", "title", "content", "source"} of every distinct article in paths, in file order."""
+    seen = set()
+    for path in paths:
+        for title, content in read_examples(path):
+            doc_id = document_id(title, content)
+            if doc_id not in seen:
+                seen.add(doc_id)
+                yield {"id": doc_id, "title": title.strip(), "content": content.strip(), "source": os.path.basename(path)}
+
+###############################
+# Index Build                 #
+###############################
+
+def _write_segment(directory, documents):
+    """
+    One segment: a term dictionary, postings as CSR arrays (term offsets, document
+    numbers, term frequencies), document lengths, and the documents as JSON lines with
+    their byte offsets. Every array is .npy so it can be memory-mapped.
+    """
+    postings = {}
+    lengths = np.zeros(len(documents), dtype=np.int32)
+    for number, document in enumerate(documents):
+        terms = tokenize(document["title"] + " " + document["content"])
+        lengths[number] = len(terms)
+        for term in terms:
+            counts = postings.setdefault(term, {})
+            counts[number] = counts.get(number, 0) + 1
+    vocabulary = sorted(postings)
+    term_offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    np.cumsum([len(postings[term]) for term in vocabulary], out=term_offsets[1:])
+    doc_numbers = np.empty(term_offsets[-1], dtype=np.int32)
+    frequencies = np.empty(term_offsets[-1], dtype=np.float32)
+    for term, start in zip(vocabulary, term_offsets):
+        counts = postings[term]
+        doc_numbers[start:start + len(counts)] = list(counts)
+        frequencies[start:start + len(counts)] = list(counts.values())
+
+    with open(os.path.join(directory, "terms.json"), "w", encoding="utf-8") as f:
+        json.dump(vocabulary, f)
+    np.save(os.path.join(directory, "term_offsets.npy"), term_offsets)
+    np.save(os.path.join(directory, "doc_numbers.npy"), doc_numbers)
+    np.save(os.path.join(directory, "frequencies.npy"), frequencies)
+    np.save(os.path.join(directory, "lengths.npy"), lengths)
+    offsets = [0]
+    with open(os.path.join(directory, "documents.jsonl"), "wb") as f:
+        for document in documents:
+            offsets.append(offsets[-1] + f.write((json.dumps(document) + "\n").encode("utf-8")))
+    np.save(os.path.join(directory, "doc_offsets.npy"), np.array(offsets, dtype=np.int64))
+
+def _read_manifest(index_dir):
+    try:
+        with open(os.path.join(index_dir, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("version") == INDEX_VERSION else None
+
+def _write_manifest(index_dir, manifest):
+    """Replace manifest.json atomically: readers see the old or the new segment list, never a mix."""
+    handle, temporary = tempfile.mkstemp(prefix=".manifest-", dir=index_dir)
+    with os.fdopen(handle, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temporary, os.path.join(index_dir, "manifest.json"))
+
+def build_index(paths=CORPUS_FILES, index_dir=INDEX_DIR):
+    """
+    Build or update the retrieval index of the articles in paths.
+    Updates are incremental: articles already indexed are skipped and new ones are
+    written as a new segment, so adding rows to a file only tokenizes the new rows. The
+    index is rebuilt from scratch when an indexed article disappeared or changed, when
+    INDEX_VERSION changed, or to merge segments once there are more than MAX_SEGMENTS.
+    Segments are written to temporary directories and published by replacing the manifest.
+    :return: Dictionary with "added" documents, "documents" in total, "segments" and "rebuilt".
+    """
+    documents = list(corpus_documents(paths))
+    current = {document["id"] for document in documents}
+    manifest = _read_manifest(index_dir)
+    indexed = set()
+    if manifest is not None:
+        for segment in manifest["segments"]:
+            with open(os.path.join(index_dir, segment, "ids.json"), encoding="utf-8") as f:
+                indexed.update(json.load(f))
+    rebuild = manifest is None or not indexed <= current
+    new = documents if rebuild else [document for document in documents if document["id"] not in indexed]
+    if not new:
+        return {"added": 0, "documents": len(indexed), "segments": len(manifest["segments"]), "rebuilt": False}
+    if not rebuild and len(manifest["segments"]) >= MAX_SEGMENTS:
+        rebuild, new = True, documents
+
+    os.makedirs(index_dir, exist_ok=True)
+    segment_dir = tempfile.mkdtemp(prefix="segment-", dir=index_dir)
+    _write_segment(segment_dir, new)
+    with open(os.path.join(segment_dir, "ids.json"), "w", encoding="utf-8") as f:
+        json.dump([document["id"] for document in new], f)
+    segments = [os.path.basename(segment_dir)] if rebuild else manifest["segments"] + [os.path.basename(segment_dir)]
+    _write_manifest(index_dir, {"version": INDEX_VERSION, "segments": segments})
+    if rebuild and manifest is not None:
+        for segment in manifest["segments"]:
+            shutil.rmtree(os.path.join(index_dir, segment), ignore_errors=True)
+    return {"added": len(new), "documents": len(current), "segments": len(segments), "rebuilt": rebuild}
+
+###############################
+# Search                      #
+###############################
+
+class _Segment:
+    def __init__(self, directory):
+        with open(os.path.join(directory, "terms.json"), encoding="utf-8") as f:
+            self.terms = {term: number for number, term in enumerate(json.load(f))}
+        load = lambda name: np.load(os.path.join(directory, name), mmap_mode="r")
+        self.term_offsets = load("term_offsets.npy")
+        self.doc_numbers = load("doc_numbers.npy")
+        self.frequencies = load("frequencies.npy")
+        self.lengths = np.asarray(load("lengths.npy"), dtype=np.float32)
+        self.doc_offsets = load("doc_offsets.npy")
+        with open(os.path.join(directory, "documents.jsonl"), "rb") as f:
+            self.documents = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(f.name) else b""
+
+    def postings(self, term):
+        number = self.terms.get(term)
+        if number is None:
+            return None
+        start, end = self.term_offsets[number], self.term_offsets[number + 1]
+        return self.doc_numbers[start:end], self.frequencies[start:end]
+
+    def document(self, number):
+        return json.loads(self.documents[self.doc_offsets[number]:self.doc_offsets[number + 1]])
+
+class RetrievalIndex:
+    """
+    BM25 search over a built index (see build_index). Postings are memory-mapped, so
+    opening an index reads only its term dictionaries, and processes searching the same
+    index share its pages. Collection statistics (document frequencies, average length)
+    are computed over all segments, so scores do not depend on how the index was built.
+    """
+
+    def __init__(self, index_dir=INDEX_DIR):
+        manifest = _read_manifest(index_dir)
+        if manifest is None:
+            raise FileNotFoundError(f"no retrieval index in {index_dir}; run build_index first")
+        self.segments = [_Segment(os.path.join(index_dir, name)) for name in manifest["segments"]]
+        self.documents = sum(len(segment.lengths) for segment in self.segments)
+        self.average_length = sum(float(segment.lengths.sum()) for segment in self.segments) / max(self.documents, 1)
+        self.norms = [BM25_K1 * (1 - BM25_B + BM25_B * segment.lengths / self.average_length) for segment in self.segments]
+        self._idf = {}
+
+    def idf(self, term):
+        """BM25 inverse document frequency of term over the whole index (0 if it does not occur)."""
+        idf = self._idf.get(term)
+        if idf is None:
+            frequency = sum(len(p[0]) for p in (segment.postings(term) for segment in self.segments) if p is not None)
+            idf = float(np.log(1 + (self.documents - frequency + 0.5) / (frequency + 0.5))) if frequency else 0.0
+            self._idf[term] = idf
+        return idf
+
+    def search(self, query, k=DEFAULT_TOP_K):
+        """
+        The k best documents for query.
+        :param query: Text, or a list of (text, weight) pairs whose terms are weighted.
+        :return: List of (score, document) with document {"id", "title", "content", "source"}, best first.
+        """
+        weights = {}
+        for text, weight in ([(query, 1.0)] if isinstance(query, str) else query):
+            for term in tokenize(text):
+                weights[term] = weights.get(term, 0.0) + weight
+        results = []
+        for segment, norm in zip(self.segments, self.norms):
+            scores = np.zeros(len(segment.lengths), dtype=np.float32)
+            for term, weight in weights.items():
+                postings = segment.postings(term)
+                if postings is not None:
+                    # Document numbers within one term's postings are unique, so += is safe.
+                    numbers, frequencies = postings
+                    scores[numbers] += (weight * self.idf(term) * (BM25_K1 + 1)) * frequencies / (frequencies + norm[numbers])
+            best = np.flatnonzero(scores) if len(scores) <= k else np.argpartition(-scores, k)[:k]
+            results.extend((float(scores[number]), segment, int(number)) for number in best if scores[number] > 0)
+        results.sort(key=lambda result: -result[0])
+        return [(score, segment.document(number)) for score, segment, number in results[:k]]
+
+###############################
+# Report Grounding            #
+###############################
+
+def analysis_query(analysis):
+    """
+    Weighted search terms for the advice an analysis calls for: the kinds of debt held,
+    high interest rates, the cheaper repayment strategy, consolidation when it saves
+    interest, payments that do not cover interest, overspending, a thin emergency fund
+    and room to invest.
+    """
+    summary = analysis["Financial Summary"]
+    income = summary["Total Income"]
+    debts = analysis["Debt Details"]
+    simulations = analysis["Debt Repayment Simulations"]
+    query = [(debt["name"], 1.0) for debt in debts]
+    if debts:
+        query.append(("pay off debt", 1.0))
+        if any(debt["apr"] > 0.15 for debt in debts):
+            query.append(("high interest rate credit card", 1.0))
+        avalanche, snowball = simulations["Avalanche Strategy"], simulations["Snowball Strategy"]
+        if avalanche["Estimated Months to Debt-Free"] is not None and snowball["Estimated Months to Debt-Free"] is not None:
+            query.append(("debt snowball" if snowball["Total Interest Paid"] <= avalanche["Total Interest Paid"]
+                          else "debt avalanche highest interest", 1.5))
+        consolidation = simulations["Consolidation Strategy"]
+        if consolidation["Total Interest Over Term"] < avalanche["Total Interest Paid"]:
+            query.append(("debt consolidation loan refinance", 1.0))
+        feasibility = analysis.get("Debt Feasibility") or {"debts": []}
+        if any(debt["status"] != "amortizing" for debt in feasibility["debts"]):
+            query.append(("minimum payment interest", 1.5))
+    if summary["Net Cash Flow"] < 0:
+        query.append(("budget cut expenses spending", 2.0))
+    if income and summary["  Wants"] > 0.3 * income:
+        query.append(("budget spending wants", 1.0))
+    outgoings = summary["Total Expenses"] + sum(debt["monthly_payment"] for debt in debts)
+    if summary["Current Savings"] < 3 * outgoings:
+        query.append(("emergency fund", 1.5))
+    if summary["Recommended Monthly Savings"] > 0:
+        query.append(("invest retirement saving", 1.0))
+    return query
+
+def _snippet(document, terms, words=SNIPPET_WORDS):
+    """Title and about `words` words of the content, starting at the sentence that best matches terms."""
+    sentences = re.split(r"(?<=[.!?])\s+", document["content"])
+    best = max(range(len(sentences)), key=lambda i: (len(terms.intersection(tokenize(sentences[i]))), -i))
+    text = " ".join(" ".join(sentences[best:]).split()[:words])
+    if len(text) < len(" ".join(sentences[best:])):
+        text += " ..."
+    return f"{document['title']}: {text}"
+
+def retrieve_snippets(analysis, index, k=DEFAULT_TOP_K):
+    """Short excerpts of the k articles most relevant to an analysis, for report prompts (see FinanceReport)."""
+    query = analysis_query(analysis)
+    if not query:
+        return []
+    terms = {term for text, _ in query for term in tokenize(text)}
+    return [_snippet(document, terms) for _, document in index.search(query, k)]
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Build or update the retrieval index over the finance articles, "
+                                                 "and optionally search it.")
+    parser.add_argument("--index-dir", default=INDEX_DIR)
+    parser.add_argument("files", nargs="*", help=f"CSV or chat JSONL files (default: {', '.join(os.path.relpath(p, HERE) for p in CORPUS_FILES)}).")
+    parser.add_argument("-q", "--query", help="Search the index for this text.")
+    parser.add_argument("-k", type=int, default=DEFAULT_TOP_K)
+    args = parser.parse_args()
+    print(build_index(args.files or CORPUS_FILES, args.index_dir))
+    if args.query:
+        index = RetrievalIndex(args.index_dir)
+        start = time.perf_counter()
+        results = index.search(args.query, args.k)
+        elapsed = time.perf_counter() - start
+        for score, document in results:
+            print(f"{score:6.2f}  {document['title']}")
+        print(f"{elapsed * 1e6:.0f} µs")
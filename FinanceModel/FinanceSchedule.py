@@ -0,0 +1,233 @@
+import numpy as np
+
+from FinanceModule import (
+    _stopped_amortizing,
+    analysis_inputs,
+    ANALYSIS_STAGES,
+    CONSOLIDATION_RATE,
+    CONSOLIDATION_TERM,
+    DEFAULT_MAX_MONTHS,
+)
+
+# Strategies with a schedule; "consolidation" replaces the debts with one loan.
+STRATEGIES = ("avalanche", "snowball", "consolidation")
+
+# Name of the single column of a consolidation schedule.
+CONSOLIDATED_NAME = "Consolidated loan"
+
+# Default resolution of schedules sent to the dashboard charts.
+CHART_POINTS = 120
+
+###############################
+# Month-by-Month Schedules    #
+###############################
+
+def _repayment_rows(debts, extra_payment, strategy):
+    """
+    Month-by-month avalanche or snowball repayment, following FinanceModule._simulate_month
+    operation for operation (the event-driven simulation skips the months a schedule needs).
+    Yields (month, balances, interest, payments) lists in the order of debts, from month 0
+    (opening balances) until the debts are paid off, or until a debt has stopped
+    amortizing (FinanceModule._stopped_amortizing): it is then never paid off, and its
+    balance would only grow, at high APRs until it overflows.
+    """
+    if strategy == "avalanche":
+        order = sorted(range(len(debts)), key=lambda i: debts[i].get("apr", 0), reverse=True)
+    elif strategy == "snowball":
+        order = sorted(range(len(debts)), key=lambda i: debts[i]["total_amount"])
+    else:
+        raise ValueError(f"Unknown repayment strategy: {strategy}")
+    # [balance, monthly_rate, payment, column] in strategy order.
+    state = [[debts[i]["total_amount"], debts[i]["apr"] / 12, debts[i]["monthly_payment"], i] for i in order]
+    balances = [d["total_amount"] for d in debts]
+    yield 0, balances, [0.0] * len(debts), [0.0] * len(debts)
+
+    month = 0
+    while any(d[0] > 0 for d in state) and not _stopped_amortizing(state, extra_payment):
+        month += 1
+        interest = [0.0] * len(debts)
+        payments = [0.0] * len(debts)
+        for d in state:
+            if d[0] <= 0:
+                continue
+            accrued = d[0] * d[1]
+            interest[d[3]] = accrued
+            d[0] += accrued
+            paid = min(d[2], d[0])
+            d[0] -= paid
+            payments[d[3]] = paid
+        available_extra = extra_payment
+        for d in state:
+            if d[0] > 0 and available_extra > 0:
+                paid = min(available_extra, d[0])
+                d[0] -= paid
+                payments[d[3]] += paid
+                available_extra -= paid
+                if available_extra <= 0:
+                    break
+        if strategy == "snowball":
+            state.sort(key=lambda d: d[0])
+        balances = [0.0] * len(debts)
+        for d in state:
+            balances[d[3]] = d[0]
+        yield month, balances, interest, payments
+
+def _consolidation_rows(debts, consolidation_rate, consolidation_term):
+    """
+    The consolidated loan of FinanceModule.simulate_debt_consolidation, month by month;
+    the last payment is only what is left.
+    """
+    balance = sum(d["total_amount"] for d in debts)
+    monthly_rate = consolidation_rate / 12
+    if monthly_rate == 0:
+        payment = balance / consolidation_term
+    else:
+        growth = (1 + monthly_rate) ** consolidation_term
+        payment = balance * (monthly_rate * growth) / (growth - 1)
+    yield 0, [balance], [0.0], [0.0]
+    for month in range(1, consolidation_term + 1):
+        if balance <= 0:
+            return
+        interest = balance * monthly_rate
+        paid = min(payment, balance + interest)
+        balance = max(balance + interest - payment, 0)
+        yield month, [balance], [interest], [paid]
+
+def _rows(debts, extra_payment, strategy, max_months):
+    if strategy == "consolidation":
+        return _consolidation_rows(debts, CONSOLIDATION_RATE, CONSOLIDATION_TERM)
+    return _repayment_rows(debts, extra_payment, strategy)
+
+def schedule_columns(debts, strategy="avalanche"):
+    """Column names of a schedule: the debt names, or CONSOLIDATED_NAME for consolidation."""
+    if strategy == "consolidation":
+        return [CONSOLIDATED_NAME]
+    return [d.get("name", "") for d in debts]
+
+def iter_schedule(debts, extra_payment, strategy="avalanche", max_months=DEFAULT_MAX_MONTHS, every=1):
+    """
+    Lazy amortization schedule: yields one month at a time, so a long schedule never
+    has to be held in memory whole.
+    :param debts: List of debt dictionaries or FinanceProfile.Debt records (left unchanged).
+    :param extra_payment: Extra funds each month (avalanche and snowball; consolidation has none).
+    :param strategy: One of STRATEGIES.
+    :param max_months: Horizon of avalanche and snowball (see simulate_debt_repayment);
+                       a monthly schedule has no jumps for it to bound, so it does not
+                       change the rows.
+    :param every: Yield only every every-th month (and the last one); interest and payments
+                  are then summed over the months since the previous one yielded.
+    :return: Generator of (month, balance, interest, payment); the last three are float
+             arrays with one entry per column (see schedule_columns), month 0 holding the
+             opening balances.
+    """
+    if every < 1:
+        raise ValueError(f"every must be at least 1, got {every}")
+    pending = None
+    for month, balances, interest, payments in _rows(debts, extra_payment, strategy, max_months):
+        if pending is None:
+            pending = [np.array(interest, dtype=float), np.array(payments, dtype=float)]
+        else:
+            pending[0] += interest
+            pending[1] += payments
+        last = month
+        if month % every == 0:
+            yield month, np.array(balances, dtype=float), pending[0], pending[1]
+            pending = None
+    if pending is not None:
+        yield last, np.array(balances, dtype=float), pending[0], pending[1]
+
+def amortization_schedule(debts, extra_payment, strategy="avalanche", max_months=DEFAULT_MAX_MONTHS, points=None):
+    """
+    Columnar amortization schedule of a repayment strategy.
+    :param debts: List of debt dictionaries or FinanceProfile.Debt records (left unchanged).
+    :param extra_payment: Extra funds each month (avalanche and snowball; consolidation has none).
+    :param strategy: "avalanche", "snowball" or "consolidation".
+    :param max_months: Horizon of avalanche and snowball (see simulate_debt_repayment);
+                       a monthly schedule has no jumps for it to bound, so it does not
+                       change the rows.
+    :param points: Downsample to at most this many months (see downsample_schedule), or None.
+    :return: Dictionary with "strategy", "names" (one per column), "month" (int array),
+             "balance", "interest" and "payment" (float arrays, one row per month and one
+             column per debt; balance at the end of the month), "paid_off", "months" (to
+             debt-free, None if never) and "total_interest".
+    """
+    names = schedule_columns(debts, strategy)
+    rows = list(_rows(debts, extra_payment, strategy, max_months))
+    balance = np.array([r[1] for r in rows], dtype=float).reshape(len(rows), len(names))
+    interest = np.array([r[2] for r in rows], dtype=float).reshape(len(rows), len(names))
+    paid_off = not (balance[-1] > 0).any()
+    schedule = {
+        "strategy": strategy,
+        "names": names,
+        "month": np.array([r[0] for r in rows], dtype=np.int32),
+        "balance": balance,
+        "interest": interest,
+        "payment": np.array([r[3] for r in rows], dtype=float).reshape(len(rows), len(names)),
+        "paid_off": paid_off,
+        "months": int(rows[-1][0]) if paid_off else None,
+        "total_interest": float(interest.sum()),
+    }
+    return schedule if points is None else downsample_schedule(schedule, points)
+
+def downsample_schedule(schedule, points=CHART_POINTS):
+    """
+    A schedule at chart resolution: at most points months, evenly spaced, always with
+    the first and last. Balances are taken at the kept months; interest and payments are
+    summed over the months since the previous kept one, so their totals are unchanged.
+    """
+    count = len(schedule["month"])
+    if count <= points:
+        return schedule
+    if points < 2:
+        raise ValueError(f"points must be at least 2, got {points}")
+    ends = np.unique(np.linspace(0, count - 1, points).round().astype(np.intp))
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    return dict(
+        schedule,
+        month=schedule["month"][ends],
+        balance=schedule["balance"][ends],
+        interest=np.add.reduceat(schedule["interest"], starts, axis=0),
+        payment=np.add.reduceat(schedule["payment"], starts, axis=0),
+    )
+
+###############################
+# Profiles and JSON           #
+###############################
+
+def profile_extra_funds(user_data):
+    """The monthly extra funds compute_financial_analysis applies to the debts of user_data."""
+    values = analysis_inputs(user_data)
+    for name, inputs, stage in ANALYSIS_STAGES:
+        values[name] = stage(*(values[i] for i in inputs))
+        if name == "extra_funds":
+            return values[name]["extra_funds"]
+
+def profile_schedule(user_data, strategy="avalanche", max_months=DEFAULT_MAX_MONTHS, points=None):
+    """amortization_schedule of a profile's debts with the extra funds of its analysis."""
+    debts = analysis_inputs(user_data)["debt"]
+    return amortization_schedule(debts, profile_extra_funds(user_data), strategy, max_months, points)
+
+def schedule_json(schedule):
+    """
+    A schedule as JSON-ready columns rounded to cents: {"strategy", "month", "debts":
+    [{"name", "balance", "interest", "payment"}], "total_balance", "paid_off", "months",
+    "total_interest"}, as the dashboard charts plot them.
+    """
+    balance = schedule["balance"]
+    return {
+        "strategy": schedule["strategy"],
+        "month": schedule["month"].tolist(),
+        "debts": [
+            {
+                "name": name,
+                "balance": balance[:, i].round(2).tolist(),
+                "interest": schedule["interest"][:, i].round(2).tolist(),
+                "payment": schedule["payment"][:, i].round(2).tolist(),
+            }
+            for i, name in enumerate(schedule["names"])
+        ],
+        "total_balance": balance.sum(axis=1).round(2).tolist(),
+        "paid_off": schedule["paid_off"],
+        "months": schedule["months"],
+        "total_interest": round(schedule["total_interest"], 2),
+    }
@@ -0,0 +1,610 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import parse_qs, urlsplit
+
+from FinanceCache import analysis_key, ResultCache
+from FinanceMetrics import timed, LatencyHistogram, Metrics, StackSampler, Trace
+from FinanceModule import compute_financial_analysis, round_floats, DEFAULT_MAX_MONTHS
+from FinanceProfile import parse_profile
+from FinanceRetrieval import build_index, retrieve_snippets, RetrievalIndex, INDEX_DIR
+from FinanceSchedule import profile_schedule, schedule_json, CHART_POINTS, STRATEGIES
+from FinanceReport import (
+    build_compact_report_prompt,
+    count_tokens,
+    load_tokenizer,
+    render_financial_report,
+    stream_templated_report,
+    OllamaClient,
+    OllamaError,
+    ReportCache,
+    PROMPT_TOKEN_BUDGET,
+    REPORT_TOKENIZER,
+)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+
+# Requests for single profiles that arrive in the same event-loop tick are sent to the
+# pool as one task of at most this many profiles.
+MAX_BATCH = 64
+
+# Rendered analyses kept in memory, keyed like FinanceCache.
+RESPONSE_CACHE_SIZE = 4096
+
+# Largest request body accepted, in bytes.
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+# Seconds between rewrites of the Prometheus metrics file.
+METRICS_WRITE_INTERVAL = 15
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error", 502: "Bad Gateway",
+           503: "Service Unavailable"}
+
+###############################
+# Worker Side                 #
+###############################
+
+# (StackSampler or None, slow seconds) of a worker process that traces its analyses,
+# or None when tracing is off (see _init_worker).
+_worker_tracing = None
+
+def _init_worker(tracing=False, slow_seconds=None, profile_interval=None):
+    """
+    Worker process initializer: trace analyses, and sample the stacks of slow ones; then
+    warm up, so every worker (including those of a replaced pool) is warm before its first task.
+    """
+    global _worker_tracing
+    if tracing:
+        _worker_tracing = (StackSampler(profile_interval) if slow_seconds is not None else None, slow_seconds)
+    _warm_up()
+
+def _analyze_batch(items):
+    """
+    Analyze (user_data, max_months) pairs in a worker process.
+    Profiles are validated here (see FinanceProfile.parse_profile), and results are
+    rendered to JSON, so both are done off the event loop.
+    :return: One (ok, body, trace record or None) triple per item; body is the JSON text
+             or an error message.
+    """
+    results = []
+    for user_data, max_months in items:
+        trace = Trace("analysis", *_worker_tracing) if _worker_tracing is not None else None
+        try:
+            profile = timed(trace, "parse", parse_profile, user_data)
+            analysis = compute_financial_analysis(profile, max_months, trace)
+            body = timed(trace, "encode", json.dumps, timed(trace, "round_floats", round_floats, analysis))
+            ok = True
+        except Exception as error:
+            ok, body = False, f"{type(error).__name__}: {error}"
+            if trace is not None:
+                trace.add("errors")
+        results.append((ok, body, trace.finish() if trace is not None else None))
+    return results
+
+def _schedules(user_data, strategies, max_months, points):
+    """Amortization schedules of a profile as JSON text (see FinanceSchedule.schedule_json); runs in a worker."""
+    profile = parse_profile(user_data)
+    return json.dumps({strategy: schedule_json(profile_schedule(profile, strategy, max_months, points))
+                       for strategy in strategies})
+
+def _warm_up():
+    """Import everything and run one analysis so the first real request is not slower."""
+    return _analyze_batch([({"income": [{"amount": 1}], "debt": [], "expenses": {}}, DEFAULT_MAX_MONTHS)])
+
+def _started(_):
+    """No-op task: the pool starts its workers on the first tasks submitted."""
+    return os.getpid()
+
+###############################
+# Analysis Service            #
+###############################
+
+class AnalysisService:
+    """
+    Analyses computed in a warm process pool.
+    Identical profiles in flight at the same time share one computation, finished
+    analyses are served from an in-memory ResultCache, and single-profile requests
+    arriving together are sent to the pool in batches of up to MAX_BATCH.
+    If a worker dies, the pool is replaced and the task retried once (see run).
+    With metrics (a FinanceMetrics.Metrics), the workers trace every analysis they compute.
+    """
+
+    def __init__(self, workers=None, cache_size=RESPONSE_CACHE_SIZE, metrics=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None
+        self.metrics = metrics
+        self.cache = ResultCache(max_entries=cache_size)
+        self.in_flight = {}
+        self.queue = []
+        self.counters = {"computed": 0, "coalesced": 0, "batches": 0, "pool_restarts": 0}
+
+    def _start_pool(self):
+        tracing = (True, self.metrics.slow_seconds, self.metrics.profile_interval) if self.metrics is not None else ()
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=tracing)
+
+    async def start(self):
+        """Start the workers; each warms up in its initializer, before it takes any task."""
+        self._start_pool()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, _started, i) for i in range(self.workers)))
+
+    def _replace_pool(self, broken):
+        """Replace the broken executor, unless a task that saw it break first already did."""
+        if self.executor is broken:
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._start_pool()
+            self.counters["pool_restarts"] += 1
+
+    async def run(self, function, *args):
+        """
+        function(*args) in the pool. When a worker dies (say, killed for memory), every
+        task of its pool fails with BrokenProcessPool: the pool is then replaced and the
+        task retried once, and a second failure is raised.
+        """
+        loop = asyncio.get_running_loop()
+        for retry in (True, False):
+            executor = self.executor
+            try:
+                return await loop.run_in_executor(executor, function, *args)
+            except BrokenProcessPool:
+                self._replace_pool(executor)
+                if not retry:
+                    raise
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+
+    def analyze(self, user_data, max_months=DEFAULT_MAX_MONTHS):
+        """
+        Awaitable (ok, body) for one profile; body is the round_floats analysis as JSON text.
+        It raises BrokenProcessPool if the workers die again on the retry (see run).
+        """
+        loop = asyncio.get_running_loop()
+        key = analysis_key(user_data, max_months)
+        cached = self.cache.get(key)
+        if cached is not None:
+            future = loop.create_future()
+            future.set_result((True, cached))
+            return future
+        future = self.in_flight.get(key)
+        if future is not None:
+            self.counters["coalesced"] += 1
+            return future
+        future = loop.create_future()
+        self.in_flight[key] = future
+        if not self.queue:
+            loop.call_soon(self._flush)
+        self.queue.append((key, user_data, max_months, future))
+        return future
+
+    def _flush(self):
+        """Send everything queued in this tick to the pool, MAX_BATCH profiles per task."""
+        queue, self.queue = self.queue, []
+        for start in range(0, len(queue), MAX_BATCH):
+            batch = queue[start:start + MAX_BATCH]
+            self.counters["batches"] += 1
+            asyncio.ensure_future(self._run_batch(batch))
+
+    async def _run_batch(self, batch):
+        try:
+            results = await self.run(_analyze_batch, [(user_data, max_months) for _, user_data, max_months, _ in batch])
+        except BrokenProcessPool as error:
+            # Not an error in the profiles: the callers get the exception (a 503), nothing is cached.
+            for key, _, _, future in batch:
+                del self.in_flight[key]
+                if not future.done():
+                    future.set_exception(error)
+            return
+        except Exception as error:
+            results = [(False, f"{type(error).__name__}: {error}", None)] * len(batch)
+        for (key, _, _, future), (ok, body, record) in zip(batch, results):
+            del self.in_flight[key]
+            self.counters["computed"] += 1
+            if record is not None:
+                self.metrics.record(record)
+            if ok:
+                self.cache.put(key, body)
+            if not future.done():
+                future.set_result((ok, body))
+
+###############################
+# HTTP                        #
+###############################
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def _error_body(message):
+    return json.dumps({"error": message})
+
+class AnalysisServer:
+    """
+    Minimal HTTP/1.1 JSON server (keep-alive, Content-Length bodies) in front of
+    AnalysisService.
+
+    POST /analyze           profile -> analysis
+    POST /analyze/batch     list of profiles -> list of analyses (or {"error": ...} items)
+    POST /report            profile -> {"analysis", "report", "prompt" token stats} from Ollama (see FinanceReport)
+    POST /report/templated  profile -> {"analysis", "report"}: templated report, recommendations
+                            from Ollama, or from rules with ?llm=0
+    POST /schedule          profile -> amortization schedule per strategy, for the dashboard charts
+                            (?strategy=avalanche,snowball,consolidation, ?points=N months, 0 for all)
+    GET  /metrics           latency histograms per route, service counters and stage traces
+    GET  /health
+
+    ?max_months=N sets the repayment simulation horizon of the analysis and report routes.
+    With a retrieval index, report prompts include the most relevant article snippets.
+    With metrics (a FinanceMetrics.Metrics), report requests are traced stage by stage
+    (analysis, retrieval, prompt, generation); if slow, they keep the stacks sampled
+    during their synchronous stages only, since the event loop thread they await on
+    runs other requests meanwhile.
+    Prompt tokens are counted with tokenizer (see FinanceReport.load_tokenizer), or
+    estimated without one.
+    """
+
+    def __init__(self, service, report_client=None, report_cache=None, retrieval_index=None, metrics=None,
+                 tokenizer=None):
+        self.service = service
+        self.report_client = report_client or OllamaClient()
+        self.report_cache = report_cache
+        self.tokenizer = tokenizer
+        self.retrieval_index = retrieval_index
+        self.metrics = metrics
+        self.histograms = {}
+        self.routes = {
+            ("POST", "/analyze"): self._analyze,
+            ("POST", "/analyze/batch"): self._analyze_batch,
+            ("POST", "/report"): self._report,
+            ("POST", "/report/templated"): self._templated_report,
+            ("POST", "/schedule"): self._schedule,
+            ("GET", "/metrics"): self._metrics,
+            ("GET", "/health"): self._health,
+        }
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                start = time.perf_counter()
+                lines = head.decode("latin-1").split("\r\n")
+                method, target, version = (lines[0].split(" ") + ["", ""])[:3]
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+                length = headers.get("content-length") or "0"
+                length = int(length) if length.isdigit() else MAX_BODY_BYTES + 1
+                if length > MAX_BODY_BYTES:
+                    status, body, route = 413, _error_body("invalid or too large Content-Length"), None
+                    keep_alive = False
+                else:
+                    payload = await reader.readexactly(length) if length else b""
+                    status, body, route = await self._dispatch(method, target, payload)
+                    connection = headers.get("connection", "").lower()
+                    keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                data = body.encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                if route is not None:
+                    self.histograms.setdefault(route, LatencyHistogram()).observe(time.perf_counter() - start)
+                if not keep_alive:
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, target, payload):
+        """Route a request; returns (status, JSON body, route name for the histograms)."""
+        url = urlsplit(target)
+        handler = self.routes.get((method, url.path))
+        if handler is None:
+            known = any(path == url.path for _, path in self.routes)
+            return (405, _error_body("method not allowed"), None) if known else (404, _error_body("not found"), None)
+        try:
+            query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            data = json.loads(payload) if payload else None
+            status, body = await handler(data, query)
+        except HTTPError as error:
+            status, body = error.status, _error_body(str(error))
+        except BrokenProcessPool as error:
+            status, body = 503, _error_body(f"analysis workers unavailable: {error}")
+        except ValueError as error:
+            status, body = 400, _error_body(f"{type(error).__name__}: {error}")
+        except Exception as error:
+            status, body = 500, _error_body(f"{type(error).__name__}: {error}")
+        return status, body, f"{method} {url.path}"
+
+    async def _analyze(self, data, query):
+        max_months = int(query.get("max_months", DEFAULT_MAX_MONTHS))
+        if not isinstance(data, dict):
+            raise HTTPError(400, "expected a profile object")
+        ok, body = await self.service.analyze(data, max_months)
+        return (200, body) if ok else (400, _error_body(body))
+
+    async def _analyze_batch(self, data, query):
+        max_months = int(query.get("max_months", DEFAULT_MAX_MONTHS))
+        if not isinstance(data, list) or not all(isinstance(d, dict) for d in data):
+            raise HTTPError(400, "expected a list of profile objects")
+        results = await asyncio.gather(*(self.service.analyze(d, max_months) for d in data))
+        return 200, "[" + ",".join(body if ok else _error_body(body) for ok, body in results) + "]"
+
+    async def _traced(self, name, handler, data, query):
+        """Run a handler(data, query, trace), recording its trace if there are metrics."""
+        if self.metrics is None:
+            return await handler(data, query, None)
+        # The handlers await on the event loop thread: only their synchronous stages are profiled.
+        trace = self.metrics.trace(name, event_loop=True)
+        try:
+            status, body = await handler(data, query, trace)
+            if status != 200:
+                trace.add("errors")
+            return status, body
+        except BaseException:
+            trace.add("errors")
+            raise
+        finally:
+            self.metrics.record(trace.finish())
+
+    async def _analysis(self, data, query, trace):
+        """The analysis of a report request's profile, or the error response to send."""
+        max_months = int(query.get("max_months", DEFAULT_MAX_MONTHS))
+        if not isinstance(data, dict):
+            raise HTTPError(400, "expected a profile object")
+        if trace is None:
+            ok, body = await self.service.analyze(data, max_months)
+        else:
+            with trace.stage("analysis"):
+                ok, body = await self.service.analyze(data, max_months)
+        return (json.loads(body), None) if ok else (None, (400, _error_body(body)))
+
+    async def _report(self, data, query):
+        return await self._traced("report", self._traced_report, data, query)
+
+    async def _traced_report(self, data, query, trace):
+        analysis, error_response = await self._analysis(data, query, trace)
+        if error_response is not None:
+            return error_response
+        snippets = timed(trace, "retrieval", self._snippets, analysis)
+        prompt, prompt_stats = timed(trace, "prompt", build_compact_report_prompt, analysis, PROMPT_TOKEN_BUDGET,
+                                     self.tokenizer, snippets)
+        if self.report_cache is not None:
+            generation = self.report_cache.report(analysis, self.report_client, tokenizer=self.tokenizer,
+                                                  snippets=snippets)
+        else:
+            generation = self.report_client.generate(prompt)
+        try:
+            if trace is None:
+                report = await generation
+            else:
+                with trace.stage("generate"):
+                    report = await generation
+        except OllamaError as error:
+            raise HTTPError(502, f"report generation failed: {error}")
+        except OSError as error:
+            raise HTTPError(503, f"report generator unavailable: {error}")
+        if trace is not None:
+            trace.add("prompt_tokens", prompt_stats["tokens"])
+            trace.add("response_tokens", count_tokens(report, self.tokenizer))
+        return 200, json.dumps({"analysis": analysis, "report": report, "prompt": prompt_stats})
+
+    async def _templated_report(self, data, query):
+        return await self._traced("templated_report", self._traced_templated_report, data, query)
+
+    async def _traced_templated_report(self, data, query, trace):
+        analysis, error_response = await self._analysis(data, query, trace)
+        if error_response is not None:
+            return error_response
+        if query.get("llm", "1") in ("0", "false", "no"):
+            report = timed(trace, "render", render_financial_report, analysis)
+            return 200, json.dumps({"analysis": analysis, "report": report})
+        snippets = timed(trace, "retrieval", self._snippets, analysis)
+        try:
+            report = "".join([fragment async for fragment in stream_templated_report(
+                analysis, self.report_client, self.report_cache, snippets, trace, self.tokenizer)])
+        except OllamaError as error:
+            raise HTTPError(502, f"report generation failed: {error}")
+        except OSError as error:
+            raise HTTPError(503, f"report generator unavailable: {error}")
+        return 200, json.dumps({"analysis": analysis, "report": report})
+
+    async def _schedule(self, data, query):
+        max_months = int(query.get("max_months", DEFAULT_MAX_MONTHS))
+        points = int(query.get("points", CHART_POINTS)) or None
+        strategies = query.get("strategy", ",".join(STRATEGIES)).split(",")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "expected a profile object")
+        unknown = [s for s in strategies if s not in STRATEGIES]
+        if unknown:
+            raise HTTPError(400, f"unknown strategy {unknown[0]!r}, expected one of {', '.join(STRATEGIES)}")
+        return 200, await self.service.run(_schedules, data, strategies, max_months, points)
+
+    def _snippets(self, analysis):
+        """Retrieved advice for an analysis's report prompt, or None without an index."""
+        if self.retrieval_index is None:
+            return None
+        return retrieve_snippets(analysis, self.retrieval_index)
+
+    async def _metrics(self, data, query):
+        return 200, json.dumps({
+            "latency": {route: histogram.snapshot() for route, histogram in self.histograms.items()},
+            "service": dict(self.service.counters, in_flight=len(self.service.in_flight)),
+            "cache": self.service.cache.stats,
+            "report_cache": self.report_cache.metrics() if self.report_cache is not None else None,
+            "report_model": self.report_client.metrics() if hasattr(self.report_client, "metrics") else None,
+            "traces": self.metrics.snapshot() if self.metrics is not None else None
+        })
+
+    async def _health(self, data, query):
+        return 200, json.dumps({"status": "ok", "workers": self.service.workers})
+
+async def _write_metrics(metrics):
+    """Rewrite the Prometheus file and flush the trace log every METRICS_WRITE_INTERVAL seconds."""
+    while True:
+        await asyncio.sleep(METRICS_WRITE_INTERVAL)
+        await asyncio.to_thread(metrics.write_prometheus)
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, report_cache_path=None, local_model=None,
+                retrieval_index_dir=None, metrics=None, tokenizer_name=REPORT_TOKENIZER):
+    """
+    Start the workers, then serve until cancelled.
+    :param report_cache_path: SQLite file for caching generated reports, or None.
+    :param local_model: Checkpoint directory of the fine-tuned model to generate reports with
+                        in this process (see TuningInference), instead of Ollama; or None.
+    :param retrieval_index_dir: Retrieval index (see FinanceRetrieval) to ground reports in,
+                                updated from the corpus at startup; or None.
+    :param metrics: FinanceMetrics.Metrics to trace analyses and reports into (exported
+                    every METRICS_WRITE_INTERVAL seconds and at exit), or None for no tracing.
+    :param tokenizer_name: Tokenizer counting report prompt tokens (see FinanceReport.load_tokenizer);
+                           the local model's own with local_model. Prompt tokens are estimated
+                           if it cannot be loaded.
+    """
+    service = AnalysisService(workers, metrics=metrics)
+    await service.start()
+    report_cache = ReportCache(report_cache_path) if report_cache_path else None
+    report_client = None
+    if local_model:
+        from TuningInference import InferenceEngine, LocalModelClient
+        report_client = LocalModelClient(await asyncio.to_thread(InferenceEngine.load, local_model))
+        tokenizer = report_client.engine.tokenizer
+    else:
+        tokenizer = await asyncio.to_thread(load_tokenizer, tokenizer_name)
+    if tokenizer is None:
+        print(f"Tokenizer {tokenizer_name!r} unavailable; estimating prompt tokens", flush=True)
+    retrieval_index = None
+    if retrieval_index_dir:
+        await asyncio.to_thread(build_index, index_dir=retrieval_index_dir)
+        retrieval_index = RetrievalIndex(retrieval_index_dir)
+    server = AnalysisServer(service, report_client, report_cache, retrieval_index, metrics, tokenizer)
+    listener = await asyncio.start_server(server.handle_connection, host, port, limit=MAX_BODY_BYTES)
+    print(f"Analysis service on http://{host}:{port} with {service.workers} workers", flush=True)
+    writer = asyncio.ensure_future(_write_metrics(metrics)) if metrics is not None else None
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        if writer is not None:
+            writer.cancel()
+            metrics.close()
+        service.close()
+        await server.report_client.close()
+        if report_cache is not None:
+            report_cache.close()
+
+###############################
+# Load Generator              #
+###############################
+
+async def load_test(profiles, host=DEFAULT_HOST, port=DEFAULT_PORT, rps=1000, seconds=10, connections=64):
+    """
+    Open-loop load generator: sends POST /analyze at a fixed rate over keep-alive
+    connections, picking profiles at random, and measures latency on the client side
+    (including time spent waiting for a free connection).
+    :return: Dictionary with "sent", "errors", "achieved_rps" and the latency snapshot.
+    """
+    bodies = [json.dumps(p).encode("utf-8") for p in profiles]
+    idle = asyncio.Queue()
+    for _ in range(connections):
+        idle.put_nowait(await asyncio.open_connection(host, port))
+    histogram = LatencyHistogram()
+    errors = 0
+
+    async def request(body, scheduled):
+        nonlocal errors
+        reader, writer = await idle.get()
+        try:
+            writer.write(
+                f"POST /analyze HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+            )
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = int(head.lower().split(b"content-length:")[1].split(b"\r\n")[0])
+            await reader.readexactly(length)
+            if not head.startswith(b"HTTP/1.1 200"):
+                errors += 1
+        finally:
+            idle.put_nowait((reader, writer))
+        histogram.observe(time.perf_counter() - scheduled)
+
+    loop_start = time.perf_counter()
+    tasks = []
+    total = int(rps * seconds)
+    for i in range(total):
+        scheduled = loop_start + i / rps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(request(random.choice(bodies), scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - loop_start
+    while not idle.empty():
+        _, writer = idle.get_nowait()
+        writer.close()
+    return {"sent": total, "errors": errors, "achieved_rps": total / elapsed, "latency": histogram.snapshot()}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Financial analysis HTTP service.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes (default: all cores).")
+    parser.add_argument("--report-cache", metavar="SQLITE_FILE", default=None,
+                        help="Cache generated reports in this file (shared by every instance using it).")
+    parser.add_argument("--local-model", metavar="CHECKPOINT_DIR", default=None,
+                        help="Generate reports with this fine-tuned model on CPU instead of Ollama (short answers).")
+    parser.add_argument("--retrieval-index", metavar="INDEX_DIR", nargs="?", const=INDEX_DIR, default=None,
+                        help="Ground reports in the most relevant finance articles, from this index "
+                             "(built or updated at startup; default directory if none given).")
+    parser.add_argument("--tokenizer", metavar="NAME_OR_DIR", default=REPORT_TOKENIZER,
+                        help="Hugging Face tokenizer counting report prompt tokens (estimated if it cannot be loaded).")
+    parser.add_argument("--trace", action="store_true",
+                        help="Trace the stages of every analysis and report (shown in /metrics).")
+    parser.add_argument("--trace-log", metavar="JSONL_FILE", default=None,
+                        help="Append one JSON line per traced request to this file (implies --trace).")
+    parser.add_argument("--metrics-file", metavar="PROM_FILE", default=None,
+                        help="Write the traced stage metrics to this file in Prometheus text format "
+                             "(implies --trace).")
+    parser.add_argument("--profile-slow", metavar="MS", type=float, default=None,
+                        help="Sample the stacks of traced requests and keep them for those slower than "
+                             "MS milliseconds, in the trace log (implies --trace).")
+    parser.add_argument("--load-test", metavar="PROFILES_JSONL",
+                        help="Instead of serving, load a running service with these profiles.")
+    parser.add_argument("--rps", type=float, default=1000, help="Load test request rate.")
+    parser.add_argument("--seconds", type=float, default=10, help="Load test duration.")
+    parser.add_argument("--connections", type=int, default=64, help="Load test keep-alive connections.")
+    args = parser.parse_args(argv)
+    if args.load_test:
+        with open(args.load_test, encoding="utf-8") as f:
+            profiles = [json.loads(line) for line in f if line.strip()]
+        result = asyncio.run(load_test(profiles, args.host, args.port, args.rps, args.seconds, args.connections))
+        print(json.dumps(result, indent=2))
+    else:
+        metrics = None
+        if args.trace or args.trace_log or args.metrics_file or args.profile_slow is not None:
+            metrics = Metrics(args.trace_log, args.metrics_file,
+                              args.profile_slow / 1000 if args.profile_slow is not None else None)
+        try:
+            asyncio.run(serve(args.host, args.port, args.workers, args.report_cache, args.local_model,
+                              args.retrieval_index, metrics, args.tokenizer))
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == "__main__":
+    main()
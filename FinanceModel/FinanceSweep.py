@@ -0,0 +1,125 @@
+import numpy as np
+
+from FinanceBatch import (
+    _never_paid_off,
+    _simulate_avalanche_batch,
+    _simulate_snowball_batch,
+    project_savings_grid,
+)
+from FinanceModule import (
+    compute_total_income,
+    compute_total_expenses,
+    DEFAULT_MAX_MONTHS,
+    RECOMMENDED_SAVINGS_RATE,
+    CONSOLIDATION_RATE,
+    CONSOLIDATION_TERM,
+    ANNUAL_SAVINGS_RATE,
+    PROJECTION_YEARS,
+)
+
+###############################
+# Vectorized Consolidation    #
+###############################
+
+def simulate_consolidation_grid(total_balance, consolidation_rates, consolidation_terms):
+    """
+    Vectorized simulate_debt_consolidation over every rate and term combination.
+    Uses the closed-form annuity payment; the total interest is what the payments add
+    on top of the balance, which is what the month-by-month loop sums to.
+    A zero rate repays the balance in equal payments with no interest.
+    :param total_balance: Balance being consolidated.
+    :param consolidation_rates: Sequence of APRs.
+    :param consolidation_terms: Sequence of terms in months.
+    :return: Monthly payments and total interest, each of shape (len(rates), len(terms)).
+    """
+    monthly_rate = np.asarray(consolidation_rates, dtype=np.float64)[:, None] / 12
+    term = np.asarray(consolidation_terms, dtype=np.float64)[None, :]
+    # expm1/log1p keep (1 + r) ** n - 1 accurate for small monthly rates.
+    growth = np.expm1(term * np.log1p(monthly_rate))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        payment = np.where(monthly_rate == 0, total_balance / term, total_balance * monthly_rate * (1 + growth) / growth)
+    return payment, payment * term - total_balance
+
+###############################
+# Parameter Sweep             #
+###############################
+
+def _repeat_debts(values, columns):
+    """Debt-major (debts x columns) matrix with the profile's debts in every column."""
+    return np.repeat(np.array(values, dtype=np.float64).reshape(-1, 1), columns, axis=1)
+
+def _table(columns, *values):
+    """Compact table: column names and one row per combination, as Python numbers."""
+    return {"columns": columns, "rows": [list(row) for row in zip(*(v.tolist() for v in values))]}
+
+def sweep_parameters(user_data, savings_rates=(RECOMMENDED_SAVINGS_RATE,),
+                     consolidation_rates=(CONSOLIDATION_RATE,), consolidation_terms=(CONSOLIDATION_TERM,),
+                     annual_savings_rates=(ANNUAL_SAVINGS_RATE,), years=PROJECTION_YEARS,
+                     max_months=DEFAULT_MAX_MONTHS):
+    """
+    Evaluate compute_financial_analysis for one profile over grids of model parameters.
+    Totals are computed once, the debt simulations run once per savings rate in a single
+    batched pass, and consolidation and savings projections are evaluated on their whole
+    grids at once. Each table only spans the parameters it depends on, so every
+    combination of slider values can be read off by joining on the shared columns.
+    :param user_data: Profile dictionary (see compute_financial_analysis).
+    :param savings_rates: Recommended savings rates (share of net cash flow saved).
+    :param consolidation_rates: Consolidation APRs.
+    :param consolidation_terms: Consolidation terms in months.
+    :param annual_savings_rates: Annual growth rates for the savings projection.
+    :param years: Savings projection horizon in years.
+    :param max_months: Horizon of the debt repayment simulations.
+    :return: Dictionary of "savings", "consolidation" and "projection" tables, each with
+             "columns" and "rows". Months are None for debts never paid off.
+    """
+    debts = user_data.get("debt", [])
+    total_income = compute_total_income(user_data.get("income", []))
+    _, _, total_expenses = compute_total_expenses(user_data.get("expenses", {}))
+    total_min_debt_payments = sum(d.get("monthly_payment", 0) for d in debts)
+    net_cash_flow = total_income - (total_expenses + total_min_debt_payments)
+
+    rates = np.asarray(savings_rates, dtype=np.float64)
+    recommended_monthly_savings = np.maximum(net_cash_flow * rates, 0)
+    extra_funds = np.maximum(net_cash_flow - recommended_monthly_savings, 0)
+
+    # One column per savings rate: the same debts, each with its own extra funds.
+    balance = _repeat_debts([d["total_amount"] for d in debts], rates.size)
+    rate = _repeat_debts([d["apr"] / 12 for d in debts], rates.size)
+    payment = _repeat_debts([d["monthly_payment"] for d in debts], rates.size)
+    never = _never_paid_off(balance, rate, payment, extra_funds)
+    avalanche_months, avalanche_interest, _ = _simulate_avalanche_batch(balance, rate, payment, extra_funds, max_months, never)
+    snowball_months, snowball_interest, _ = _simulate_snowball_batch(balance, rate, payment, extra_funds, max_months, never)
+
+    total_debt = sum(d.get("total_amount", 0) for d in debts)
+    consolidation_payment, consolidation_interest = simulate_consolidation_grid(
+        total_debt, consolidation_rates, consolidation_terms
+    )
+    projected = project_savings_grid(
+        user_data.get("savings", 0) + recommended_monthly_savings, recommended_monthly_savings,
+        annual_savings_rates, [years]
+    )[:, :, 0]
+
+    def months_or_none(months):
+        return np.array([m if m >= 0 else None for m in months.tolist()], dtype=object)
+
+    consolidation_grid = np.meshgrid(
+        np.asarray(consolidation_rates, dtype=np.float64), np.asarray(consolidation_terms), indexing="ij"
+    )
+    projection_grid = np.meshgrid(rates, np.asarray(annual_savings_rates, dtype=np.float64), indexing="ij")
+    return {
+        "savings": _table(
+            ["savings_rate", "recommended_monthly_savings", "extra_funds", "avalanche_months",
+             "avalanche_interest", "snowball_months", "snowball_interest"],
+            rates, recommended_monthly_savings, extra_funds, months_or_none(avalanche_months),
+            avalanche_interest, months_or_none(snowball_months), snowball_interest
+        ),
+        "consolidation": _table(
+            ["consolidation_rate", "consolidation_term", "monthly_payment", "total_interest"],
+            consolidation_grid[0].ravel(), consolidation_grid[1].ravel(),
+            consolidation_payment.ravel(), consolidation_interest.ravel()
+        ),
+        "projection": _table(
+            ["savings_rate", "annual_savings_rate", "projected_savings"],
+            projection_grid[0].ravel(), projection_grid[1].ravel(), projected.ravel()
+        ),
+    }
@@ -1,116 +1,51 @@
-import os
-os.environ["TOKENIZERS_PARALLELISM"] = "false"  # Suppress parallelism warning
-
 import torch
-from datasets import load_dataset
-from transformers import (
-    AutoTokenizer,
-    AutoModelForCausalLM,
-    DataCollatorForLanguageModeling,
-    TrainingArguments,
-    Trainer
-)
-from peft import get_peft_model, LoraConfig
-import evaluate
-import numpy as np
-
-if torch.backends.mps.is_available():
-    device = torch.device("mps")
-elif torch.cuda.is_available():
-    device = torch.device("cuda")
-else:
-    device = torch.device("cpu")
-
-print("Using device:", device)
 
-dataset = load_dataset('Sribhuvan/FinanceData')
-dataset = dataset["train"].train_test_split(test_size=0.1)
-dataset["validation"] = dataset.pop("test")
-print(dataset)
+from TuningData import load_token_store
+from TuningEval import evaluate_perplexity
+from TuningTrain import train, pick_device, cpu_supports_bf16, MODEL_CHECKPOINT, FINAL_DIR
 
-model_checkpoint = 'distilbert/distilgpt2'
-model = AutoModelForCausalLM.from_pretrained(model_checkpoint)
-tokenizer = AutoTokenizer.from_pretrained(model_checkpoint)
-tokenizer.pad_token = tokenizer.eos_token  # Set padding token for distilgpt2
+# Pack articles into full 1024-token blocks (no padding). When False, articles are kept
+# whole and batched with others of similar length to limit padding.
+PACKING = True
+BLOCK_SIZE = 1024
 
-def tokenize_function(examples):
-    combined_text = [title + "\n" + content for title, content in zip(examples['Title'], examples['Content'])]
-    return tokenizer(combined_text, truncation=True, max_length=1024)
+# Stride of the final sliding-window evaluation of whole (untruncated) validation articles.
+EVAL_STRIDE = 512
 
-tokenized_datasets = dataset.map(
-    tokenize_function,
-    batched=True,
-    remove_columns=dataset["train"].column_names
-)
+# torch.compile the PEFT model (slower start, faster steps on long runs).
+COMPILE = False
 
-data_collator = DataCollatorForLanguageModeling(
-    tokenizer=tokenizer,
-    mlm=False
-)
+device = pick_device()
+print("Using device:", device)
 
-# Configure LoRA
-lora_config = LoraConfig(
-    r=16,
-    lora_alpha=32,
-    target_modules=["attn.c_attn"],
-    lora_dropout=0.1,
-    bias="none",
-    task_type="CAUSAL_LM"
+# Without an accelerator, train with the CPU profile (thread pools sized to the cores, bf16
+# autocast where the CPU has native bf16). For data-parallel CPU training run this file
+# under torchrun --nproc_per_node N.
+cpu = device.type == "cpu"
+trainer, tokenizer, _ = train(
+    checkpoint=MODEL_CHECKPOINT,
+    max_length=1024,
+    packing=PACKING,
+    block_size=BLOCK_SIZE,
+    cpu=cpu,
+    bf16=cpu and cpu_supports_bf16(),
+    compile=COMPILE,
 )
+if not trainer.is_world_process_zero():
+    raise SystemExit
 
-# Wrap the model with LoRA modifications
-model = get_peft_model(model, lora_config)
-model.print_trainable_parameters()
+trainer.save_model(FINAL_DIR)
+tokenizer.save_pretrained(FINAL_DIR)
 
-# Move model to the selected device
+model = trainer.model
 model.to(device)
 
-# Load evaluation metric
-metric = evaluate.load("perplexity")
-
-def compute_metrics(eval_pred):
-    logits, labels = eval_pred
-    if isinstance(logits, np.ndarray):
-        logits = torch.from_numpy(logits)
-    if isinstance(labels, np.ndarray):
-        labels = torch.from_numpy(labels)
-    # Shift logits and labels for causal LM loss calculation
-    shift_logits = logits[..., :-1, :].contiguous()
-    shift_labels = labels[..., 1:].contiguous()
-    loss_fct = torch.nn.CrossEntropyLoss()
-    loss = loss_fct(shift_logits.view(-1, shift_logits.size(-1)), shift_labels.view(-1))
-    return {"perplexity": torch.exp(loss).item()}
-
-# Training arguments
-training_args = TrainingArguments(
-    output_dir="./distilgpt2-finance",
-    eval_strategy="epoch",
-    learning_rate=2e-5,
-    per_device_train_batch_size=8,
-    per_device_eval_batch_size=8,
-    num_train_epochs=3,
-    weight_decay=0.01,
-    save_strategy="epoch",
-    load_best_model_at_end=True,
-    push_to_hub=False,
-    logging_steps=100,
-    gradient_accumulation_steps=4,
-)
-
-# Initialize Trainer
-trainer = Trainer(
-    model=model,
-    args=training_args,
-    train_dataset=tokenized_datasets["train"],
-    eval_dataset=tokenized_datasets["validation"],
-    data_collator=data_collator,
-    compute_metrics=compute_metrics,
-)
-
-trainer.train()
-
-trainer.save_model("./distilgpt2-finance-final")
-tokenizer.save_pretrained("./distilgpt2-finance-final")
+# Whole validation articles, scored with sliding windows instead of truncated at 1024 tokens.
+full_validation = load_token_store(MODEL_CHECKPOINT, max_length=None, tokenizer=tokenizer)["validation"]
+print("Validation (sliding window):", evaluate_perplexity(
+    model, full_validation, batch_size=trainer.args.per_device_eval_batch_size, context_length=BLOCK_SIZE,
+    stride=EVAL_STRIDE, pad_token_id=tokenizer.pad_token_id
+))
 
 model = model.merge_and_unload()
 model.to(device)
@@ -0,0 +1,328 @@
+import csv
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Local copies of the Sribhuvan/FinanceData articles: the chat-formatted train and
+# validation splits, and the same articles as one Title/Content CSV.
+TRAIN_FILE = os.path.join(HERE, "Misc", "training.jsonl")
+VALIDATION_FILE = os.path.join(HERE, "Misc", "validation.jsonl")
+CSV_FILE = os.path.join(HERE, "Misc", "Finance-Data.csv")
+
+# Tokenized datasets are kept here, one directory per tokenizer, max_length and data.
+STORE_DIR = os.environ.get("TOKEN_STORE_DIR", os.path.join(HERE, ".token_store"))
+
+# Share of examples held out when a single file has to be split, and the split's seed.
+VALIDATION_SHARE = 0.1
+SPLIT_SEED = 42
+
+# Bump when the stored layout or the text of an example changes.
+STORE_VERSION = 1
+
+# Label of positions the training loss skips (padding), as in transformers.
+IGNORE_INDEX = -100
+
+###############################
+# Examples                    #
+###############################
+
+def read_examples(path):
+    """
+    (title, content) pairs from a Title/Content CSV or a chat JSONL file, where the
+    user message is the title and the assistant message the content.
+    """
+    if path.endswith(".csv"):
+        with open(path, encoding="utf-8", newline="") as f:
+            return [(row["Title"], row["Content"]) for row in csv.DictReader(f)]
+    examples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                messages = {m["role"]: m["content"] for m in json.loads(line)["messages"]}
+                examples.append((messages["user"], messages["assistant"]))
+    return examples
+
+def example_text(title, content):
+    """Training text of one example, as tokenize_function in Tuning.py builds it."""
+    return title + "\n" + content
+
+def _split(examples):
+    """Deterministic train/validation split of a single file."""
+    order = list(range(len(examples)))
+    random.Random(SPLIT_SEED).shuffle(order)
+    held_out = max(1, round(len(examples) * VALIDATION_SHARE))
+    return [examples[i] for i in order[held_out:]], [examples[i] for i in order[:held_out]]
+
+###############################
+# Token Store                 #
+###############################
+
+def data_hash(*paths):
+    """SHA-256 of the data files' contents (and which file is which)."""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.basename(path).encode("utf-8") + b"\0")
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+def store_path(tokenizer_name, max_length, digest, store_dir=STORE_DIR):
+    """Directory of the store for this tokenizer, max_length (None: untruncated) and data hash."""
+    slug = re.sub(r"[^A-Za-z0-9._-]+", "_", tokenizer_name)
+    length = "full" if max_length is None else max_length
+    return os.path.join(store_dir, f"{slug}-{length}-{digest[:16]}-v{STORE_VERSION}")
+
+def _write_split(directory, name, token_lists, vocab_size):
+    """One split as a flat token array and example offsets, both .npy so they can be memory-mapped."""
+    dtype = np.uint16 if vocab_size <= np.iinfo(np.uint16).max + 1 else np.uint32
+    lengths = np.fromiter((len(ids) for ids in token_lists), dtype=np.int64, count=len(token_lists))
+    offsets = np.zeros(len(token_lists) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    tokens = np.empty(offsets[-1], dtype=dtype)
+    for ids, start, end in zip(token_lists, offsets[:-1], offsets[1:]):
+        tokens[start:end] = ids
+    np.save(os.path.join(directory, f"{name}.tokens.npy"), tokens)
+    np.save(os.path.join(directory, f"{name}.offsets.npy"), offsets)
+
+def build_token_store(tokenizer_name, max_length=1024, train_file=TRAIN_FILE, validation_file=VALIDATION_FILE,
+                      store_dir=STORE_DIR, tokenizer=None):
+    """
+    Tokenize the local training data once and save it as memory-mappable arrays.
+    Nothing is downloaded except the tokenizer itself, and only when the store does not
+    exist yet. The store is written to a temporary directory and renamed into place, so
+    concurrent builds are safe and a reader never sees a half-written store.
+    :param tokenizer_name: Hugging Face tokenizer (e.g. "distilbert/distilgpt2"); part of the key.
+    :param max_length: Examples are truncated to this many tokens (None keeps them whole,
+                       e.g. for sliding-window evaluation); part of the key.
+    :param train_file: CSV or chat JSONL of training examples.
+    :param validation_file: Validation examples, or None to split VALIDATION_SHARE off train_file.
+    :param store_dir: Parent directory of the stores.
+    :param tokenizer: Already loaded tokenizer for tokenizer_name, to avoid loading it again.
+    :return: Path of the store.
+    """
+    files = [train_file] + ([validation_file] if validation_file else [])
+    path = store_path(tokenizer_name, max_length, data_hash(*files), store_dir)
+    if os.path.exists(os.path.join(path, "meta.json")):
+        return path
+
+    if tokenizer is None:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+    if validation_file:
+        splits = {"train": read_examples(train_file), "validation": read_examples(validation_file)}
+    else:
+        splits = dict(zip(("train", "validation"), _split(read_examples(train_file))))
+
+    os.makedirs(store_dir, exist_ok=True)
+    building = tempfile.mkdtemp(prefix=".building-", dir=store_dir)
+    try:
+        counts = {}
+        for name, examples in splits.items():
+            texts = [example_text(*e) for e in examples]
+            if max_length is None:
+                token_lists = tokenizer(texts)["input_ids"]
+            else:
+                token_lists = tokenizer(texts, truncation=True, max_length=max_length)["input_ids"]
+            _write_split(building, name, token_lists, len(tokenizer))
+            counts[name] = {"examples": len(token_lists), "tokens": sum(len(ids) for ids in token_lists)}
+        with open(os.path.join(building, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"tokenizer": tokenizer_name, "max_length": max_length, "files": files,
+                       "version": STORE_VERSION, "splits": counts}, f, indent=2)
+        try:
+            os.replace(building, path)
+        except OSError:
+            # Another process finished the same store first.
+            if not os.path.exists(os.path.join(path, "meta.json")):
+                raise
+    finally:
+        shutil.rmtree(building, ignore_errors=True)
+    return path
+
+class TokenDataset:
+    """
+    One split of a token store, memory-mapped read-only: opening it costs nothing, and
+    every process reading the same store shares its pages through the OS page cache.
+    Items are {"input_ids", "attention_mask"} as the tokenizer returns them, so it can be
+    passed to Trainer with CausalLMCollator in place of a tokenized dataset.
+    """
+
+    def __init__(self, path, split):
+        self.tokens = np.load(os.path.join(path, f"{split}.tokens.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, f"{split}.offsets.npy"), mmap_mode="r")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        input_ids = self.tokens[self.offsets[index]:self.offsets[index + 1]].tolist()
+        return {"input_ids": input_ids, "attention_mask": [1] * len(input_ids)}
+
+    def lengths(self):
+        """Token count of every example."""
+        return np.diff(self.offsets)
+
+class PackedDataset:
+    """
+    A TokenDataset packed for causal LM training: all examples concatenated with an EOS
+    token after each, cut into blocks of block_size tokens, so batches carry no padding
+    (only the last block can be shorter). Examples longer than a block simply continue
+    into the next one. The EOS separators are real tokens the model learns to predict,
+    so batch them with CausalLMCollator, which keeps their labels even when EOS is also
+    the pad token.
+    """
+
+    def __init__(self, dataset, block_size, eos_token_id):
+        """
+        :param dataset: TokenDataset to pack.
+        :param block_size: Tokens per block (the model's context length or less).
+        :param eos_token_id: Separator appended to every example.
+        """
+        offsets = np.asarray(dataset.offsets)
+        self.tokens = np.insert(np.asarray(dataset.tokens[:offsets[-1]]), offsets[1:], eos_token_id)
+        self.block_size = block_size
+
+    def __len__(self):
+        return -(-len(self.tokens) // self.block_size)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        input_ids = self.tokens[index * self.block_size:(index + 1) * self.block_size].tolist()
+        return {"input_ids": input_ids, "attention_mask": [1] * len(input_ids)}
+
+    def lengths(self):
+        """Token count of every block."""
+        lengths = np.full(len(self), self.block_size, dtype=np.int64)
+        if len(self):
+            lengths[-1] = len(self.tokens) - (len(self) - 1) * self.block_size
+        return lengths
+
+class CausalLMCollator:
+    """
+    Data collator for causal LM training: pads the batch to its longest item (on the
+    right) and labels every real token, masking only the padding, which it finds by the
+    attention mask. DataCollatorForLanguageModeling masks every label equal to the pad
+    token instead, so with pad = EOS (GPT-2) it drops the EOS separators of packed blocks.
+    The model shifts the labels itself.
+    """
+
+    def __init__(self, pad_token_id):
+        self.pad_token_id = pad_token_id
+
+    def __call__(self, features):
+        import torch
+
+        width = max(len(f["input_ids"]) for f in features)
+        input_ids = torch.full((len(features), width), self.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(features), width), dtype=torch.long)
+        for row, f in enumerate(features):
+            size = len(f["input_ids"])
+            input_ids[row, :size] = torch.as_tensor(f["input_ids"], dtype=torch.long)
+            attention_mask[row, :size] = torch.as_tensor(f["attention_mask"], dtype=torch.long)
+        labels = input_ids.masked_fill(attention_mask == 0, IGNORE_INDEX)
+        return {"input_ids": input_ids, "attention_mask": attention_mask, "labels": labels}
+
+class PaddingMeter:
+    """
+    Data collator wrapper that counts the real (attention_mask) and total tokens of the
+    batches it builds, to report effective tokens per second and the share of padding.
+    """
+
+    def __init__(self, collator):
+        self.collator = collator
+        self.reset()
+
+    def reset(self):
+        self.real_tokens = 0
+        self.total_tokens = 0
+        self.started = time.perf_counter()
+
+    def __call__(self, features):
+        batch = self.collator(features)
+        mask = batch["attention_mask"]
+        self.real_tokens += int(mask.sum())
+        self.total_tokens += int(np.prod(mask.shape))
+        return batch
+
+    def snapshot(self, reset=True):
+        """{"tokens_per_second", "padding_ratio"} since the last reset."""
+        elapsed = time.perf_counter() - self.started
+        stats = {
+            "tokens_per_second": self.real_tokens / elapsed if elapsed > 0 else 0.0,
+            "padding_ratio": 1 - self.real_tokens / self.total_tokens if self.total_tokens else 0.0,
+        }
+        if reset:
+            self.reset()
+        return stats
+
+def eval_windows(dataset, context_length, stride=None, rank=0, world_size=1):
+    """
+    (input_ids, first_scored) windows over the documents of dataset, read one at a time.
+    A document that fits the context is one window with every token scored. A longer one
+    is covered by windows of context_length tokens starting every stride tokens; each
+    window scores only the tokens the previous one did not, so every token but the first
+    is scored exactly once, with at least context_length - stride tokens of context.
+    Plain token lists, so windows can be planned (and sharded) without torch; TuningEval
+    batches and scores them.
+    :param dataset: TokenDataset, PackedDataset or any sequence of {"input_ids": ...} items.
+    :param context_length: The model's context length (or less).
+    :param stride: Tokens between window starts, below context_length; None is
+                   context_length - 1, the cheapest windows that still score every token.
+    :param rank: With world_size, read only the documents rank, rank + world_size, ...:
+                 one shard per process of a data-parallel run.
+    :param world_size: Number of shards.
+    """
+    stride = stride or context_length - 1
+    if not 0 < stride < context_length:
+        raise ValueError(f"stride must be between 1 and context_length - 1 ({context_length - 1}), got {stride}")
+    for index in range(rank, len(dataset), world_size):
+        input_ids = list(dataset[index]["input_ids"])
+        scored_until = 0
+        for start in range(0, max(len(input_ids) - context_length, 0) + stride, stride):
+            end = min(start + context_length, len(input_ids))
+            if end <= scored_until:
+                break
+            # The first token of a document has no context and is never scored.
+            yield input_ids[start:end], max(scored_until, start + 1) - start
+            scored_until = end
+
+def load_token_store(tokenizer_name, max_length=1024, train_file=TRAIN_FILE, validation_file=VALIDATION_FILE,
+                     store_dir=STORE_DIR, tokenizer=None):
+    """
+    The "train" and "validation" TokenDatasets for this tokenizer, max_length and data,
+    building the store first if it does not exist (see build_token_store).
+    """
+    path = build_token_store(tokenizer_name, max_length, train_file, validation_file, store_dir, tokenizer)
+    return {split: TokenDataset(path, split) for split in ("train", "validation")}
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tokenize the local training data into a memory-mapped token store.")
+    parser.add_argument("--tokenizer", default="distilbert/distilgpt2")
+    parser.add_argument("--max-length", type=int, default=1024)
+    parser.add_argument("--csv", action="store_true", help=f"Use {os.path.relpath(CSV_FILE, HERE)} with a seeded split.")
+    args = parser.parse_args()
+    if args.csv:
+        path = build_token_store(args.tokenizer, args.max_length, CSV_FILE, None)
+    else:
+        path = build_token_store(args.tokenizer, args.max_length)
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+        print(path)
+        print(f.read())
@@ -0,0 +1,135 @@
+import math
+
+import torch
+import torch.nn.functional as F
+
+from TuningData import eval_windows
+
+# Positions whose logits are materialized at once when scoring a batch: the logits of a
+# batch are batch_size x EVAL_CHUNK_TOKENS x vocabulary instead of batch_size x sequence
+# x vocabulary (about 200 MB per 1024-token sequence for GPT-2's 50257 tokens).
+EVAL_CHUNK_TOKENS = 128
+
+# Label of positions that are not scored (padding, and the context part of a window).
+IGNORE_INDEX = -100
+
+###############################
+# Windows                     #
+###############################
+
+def _batches(windows, batch_size, pad_token_id):
+    """Padded (input_ids, attention_mask, labels) tensors of batch_size windows."""
+    batch = []
+    for window in windows:
+        batch.append(window)
+        if len(batch) == batch_size:
+            yield _collate(batch, pad_token_id)
+            batch = []
+    if batch:
+        yield _collate(batch, pad_token_id)
+
+def _collate(batch, pad_token_id):
+    width = max(len(ids) for ids, _ in batch)
+    input_ids = torch.full((len(batch), width), pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(batch), width), dtype=torch.long)
+    labels = torch.full((len(batch), width), IGNORE_INDEX, dtype=torch.long)
+    for row, (ids, first_scored) in enumerate(batch):
+        input_ids[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+        attention_mask[row, :len(ids)] = 1
+        labels[row, first_scored:len(ids)] = input_ids[row, first_scored:len(ids)]
+    return input_ids, attention_mask, labels
+
+###############################
+# Scoring                     #
+###############################
+
+def _split_head(model):
+    """
+    (backbone, lm_head) of a causal LM (also behind a PEFT wrapper), so hidden states
+    can be projected to the vocabulary a chunk at a time; None if the model has no
+    separate backbone.
+    """
+    lm = model.get_base_model() if hasattr(model, "get_base_model") else model
+    backbone = getattr(lm, "base_model", lm)
+    head = lm.get_output_embeddings() if hasattr(lm, "get_output_embeddings") else None
+    if backbone is lm or head is None:
+        return None
+    return backbone, head
+
+def batch_nll(model, input_ids, attention_mask, labels, chunk_tokens=EVAL_CHUNK_TOKENS):
+    """
+    Summed negative log-likelihood of the labelled tokens of one batch, and their count.
+    labels[:, t] is the target at position t (IGNORE_INDEX to skip it), predicted from the
+    positions before it. Only chunk_tokens positions of logits exist at any time.
+    """
+    targets = labels[:, 1:]
+    split = _split_head(model)
+    if split is None:
+        logits = model(input_ids=input_ids, attention_mask=attention_mask).logits[:, :-1]
+        nll = F.cross_entropy(logits.float().transpose(1, 2), targets, ignore_index=IGNORE_INDEX, reduction="sum")
+        return nll.item(), int((targets != IGNORE_INDEX).sum())
+
+    backbone, head = split
+    hidden = backbone(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state[:, :-1]
+    nll = 0.0
+    for start in range(0, hidden.shape[1], chunk_tokens):
+        chunk_targets = targets[:, start:start + chunk_tokens]
+        if (chunk_targets == IGNORE_INDEX).all():
+            continue
+        logits = head(hidden[:, start:start + chunk_tokens]).float()
+        nll += F.cross_entropy(logits.transpose(1, 2), chunk_targets, ignore_index=IGNORE_INDEX, reduction="sum").item()
+    return nll, int((targets != IGNORE_INDEX).sum())
+
+@torch.no_grad()
+def perplexity_sums(model, dataset, batch_size=8, context_length=1024, stride=None, pad_token_id=0,
+                    device=None, chunk_tokens=EVAL_CHUNK_TOKENS, rank=0, world_size=1):
+    """
+    Summed negative log-likelihood and count of the scored tokens of one shard of dataset
+    (see eval_windows), streamed one batch at a time. Sums of all shards add up to those
+    of the whole dataset; perplexity_stats turns them into loss and perplexity.
+    See evaluate_perplexity for the other parameters.
+    :return: (nll, tokens).
+    """
+    device = device or next(model.parameters()).device
+    was_training = model.training
+    model.eval()
+    total_nll, total_tokens = 0.0, 0
+    try:
+        for input_ids, attention_mask, labels in _batches(eval_windows(dataset, context_length, stride, rank, world_size),
+                                                          batch_size, pad_token_id):
+            nll, tokens = batch_nll(model, input_ids.to(device), attention_mask.to(device), labels.to(device),
+                                    chunk_tokens)
+            total_nll += nll
+            total_tokens += tokens
+    finally:
+        model.train(was_training)
+    return total_nll, total_tokens
+
+def perplexity_stats(nll, tokens):
+    """{"loss" (mean NLL per token), "perplexity", "tokens"} of summed NLL over tokens."""
+    loss = nll / tokens if tokens else float("nan")
+    return {"loss": loss, "perplexity": math.exp(loss) if tokens else float("nan"), "tokens": tokens}
+
+def evaluate_perplexity(model, dataset, batch_size=8, context_length=1024, stride=None, pad_token_id=0,
+                        device=None, chunk_tokens=EVAL_CHUNK_TOKENS):
+    """
+    Token-level loss and perplexity of model on dataset, streamed: windows are read,
+    batched and scored one batch at a time and only the summed negative log-likelihood
+    and token count are kept, so memory does not grow with the dataset. Padding is
+    masked by the attention mask rather than the pad token, so EOS tokens that double as
+    padding (GPT-2) are still scored inside documents.
+    :param model: Causal LM (transformers, optionally PEFT-wrapped); evaluated in eval mode
+                  and put back in training mode afterwards if it was in it.
+    :param dataset: Sequence of {"input_ids": ...} documents (TokenDataset, PackedDataset).
+    :param batch_size: Windows per forward pass.
+    :param context_length: Longest window; longer documents are evaluated in windows.
+    :param stride: Sliding-window stride for documents longer than context_length;
+                   None is context_length - 1 (windows overlap by the one token each
+                   needs to predict its first scored token).
+    :param pad_token_id: Token used to pad windows (never scored).
+    :param device: Device of the inputs; defaults to the model's.
+    :param chunk_tokens: Positions projected to the vocabulary at a time.
+    :return: Dictionary with "loss" (mean NLL per token), "perplexity" and "tokens".
+    """
+    return perplexity_stats(*perplexity_sums(model, dataset, batch_size, context_length, stride, pad_token_id,
+                                             device, chunk_tokens))
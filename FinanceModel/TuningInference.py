@@ -0,0 +1,367 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+
+import torch
+from transformers import AutoTokenizer, AutoModelForCausalLM
+
+from FinanceMetrics import LatencyHistogram
+
+# Checkpoint written by Tuning.py (TuningTrain.FINAL_DIR): the LoRA adapter and tokenizer.
+MODEL_DIR = "./distilgpt2-finance-final"
+MODEL_NAME = "distilgpt2-finance"
+
+# Requests generated together in one batch, and how long the first request of a batch
+# waits for others to join it.
+MAX_BATCH = 8
+BATCH_WAIT = 0.005
+
+# Tokens generated per request unless it asks for another number (Ollama's num_predict).
+MAX_NEW_TOKENS = 128
+
+# Sampling defaults (Ollama's temperature and top_k options); temperature 0 is greedy.
+DEFAULT_TEMPERATURE = 0.7
+TOP_K = 40
+
+# distilgpt2's context; prompts are cut from the left to leave room for the answer.
+CONTEXT_LENGTH = 1024
+
+###############################
+# Model                       #
+###############################
+
+def _conv1d_to_linear(module):
+    """Replace GPT-2's Conv1D layers (transposed Linear weights) by nn.Linear, which dynamic quantization handles."""
+    from transformers.pytorch_utils import Conv1D
+    for name, child in module.named_children():
+        if isinstance(child, Conv1D):
+            linear = torch.nn.Linear(child.weight.shape[0], child.weight.shape[1])
+            linear.weight.data = child.weight.data.t().contiguous()
+            linear.bias.data = child.bias.data
+            setattr(module, name, linear)
+        else:
+            _conv1d_to_linear(child)
+
+def load_inference_model(path=MODEL_DIR, quantize=True):
+    """
+    The fine-tuned model for CPU inference: the LoRA adapter in path merged into its base
+    model (or a plain model if path holds one), in eval mode, with int8 dynamic
+    quantization of every linear layer including the LM head.
+    :return: (model, tokenizer)
+    """
+    if os.path.exists(os.path.join(path, "adapter_config.json")):
+        from peft import AutoPeftModelForCausalLM
+        model = AutoPeftModelForCausalLM.from_pretrained(path).merge_and_unload()
+    else:
+        model = AutoModelForCausalLM.from_pretrained(path)
+    tokenizer = AutoTokenizer.from_pretrained(path)
+    tokenizer.pad_token = tokenizer.eos_token
+    model.eval()
+    if quantize:
+        _conv1d_to_linear(model)
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model, tokenizer
+
+def _select_rows(past, index):
+    """Keep the rows of a KV cache at index (a Cache object or legacy per-layer tuples)."""
+    if hasattr(past, "batch_select_indices"):
+        past.batch_select_indices(index)
+        return past
+    return tuple(tuple(tensor.index_select(0, index) for tensor in layer) for layer in past)
+
+###############################
+# Engine                      #
+###############################
+
+class GenerationRequest:
+    """One prompt being generated; text is delivered to on_token as it is decoded."""
+
+    __slots__ = ("prompt", "max_new_tokens", "temperature", "on_token", "on_done", "tokens", "emitted",
+                 "cancelled", "submitted", "started", "first_token", "finished")
+
+    def __init__(self, prompt, max_new_tokens, temperature, on_token, on_done):
+        self.prompt = prompt
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.on_token = on_token
+        self.on_done = on_done
+        self.tokens = []
+        self.emitted = 0
+        self.cancelled = False
+        self.submitted = time.perf_counter()
+        self.started = self.first_token = self.finished = None
+
+    def cancel(self):
+        """Stop generating; the request leaves its batch at the next step."""
+        self.cancelled = True
+
+    def stats(self):
+        """Per-request latencies in milliseconds and generated tokens."""
+        ms = lambda since, until: None if since is None or until is None else (until - since) * 1000
+        return {
+            "queued_ms": ms(self.submitted, self.started),
+            "first_token_ms": ms(self.submitted, self.first_token),
+            "total_ms": ms(self.submitted, self.finished),
+            "tokens": len(self.tokens),
+        }
+
+class InferenceEngine:
+    """
+    Batched generation on a background thread. Requests that arrive while the thread is
+    idle, or within BATCH_WAIT of the first one, are generated together: prompts are
+    left-padded so every row's next token is at the last position, the prompts' keys and
+    values are computed once and the KV cache is extended one token per step, and rows
+    that finish (EOS, their token limit, or cancelled) are dropped from the cache so the
+    rest of the batch does not pay for them. Requests arriving during a batch form the
+    next one. Only the last position is projected to the vocabulary.
+    """
+
+    def __init__(self, model, tokenizer, max_batch=MAX_BATCH, batch_wait=BATCH_WAIT, name=MODEL_NAME):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.tokenizer.padding_side = "left"
+        self.tokenizer.truncation_side = "left"
+        self.backbone = model.base_model
+        self.head = model.get_output_embeddings()
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait
+        self.name = name
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "batches": 0, "generated_tokens": 0, "busy_seconds": 0.0}
+        self.latency = LatencyHistogram()
+        self.first_token_latency = LatencyHistogram()
+
+    @classmethod
+    def load(cls, path=MODEL_DIR, quantize=True, **options):
+        """Engine for the fine-tuned checkpoint in path (see load_inference_model)."""
+        model, tokenizer = load_inference_model(path, quantize)
+        return cls(model, tokenizer, name=os.path.basename(os.path.normpath(path)), **options)
+
+    def submit(self, prompt, max_new_tokens=None, temperature=None, on_token=None, on_done=None):
+        """
+        Queue a prompt. Callbacks run on the engine thread.
+        :param on_token: callable(text) for each decoded fragment.
+        :param on_done: callable(error, stats) when the request ends; error is None on success.
+        :return: The GenerationRequest (cancel() it to stop early).
+        """
+        request = GenerationRequest(
+            prompt,
+            MAX_NEW_TOKENS if max_new_tokens is None else max_new_tokens,
+            DEFAULT_TEMPERATURE if temperature is None else temperature,
+            on_token or (lambda text: None),
+            on_done or (lambda error, stats: None),
+        )
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="inference-engine", daemon=True)
+                self.thread.start()
+        self.queue.put(request)
+        return request
+
+    def close(self):
+        """Finish the queued requests and stop the engine thread."""
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            self.queue.put(None)
+            thread.join()
+
+    def _run(self):
+        while True:
+            request = self.queue.get()
+            if request is None:
+                return
+            batch = [request]
+            deadline = time.perf_counter() + self.batch_wait
+            while len(batch) < self.max_batch:
+                try:
+                    request = self.queue.get(timeout=max(deadline - time.perf_counter(), 0))
+                except queue.Empty:
+                    break
+                if request is None:
+                    self.queue.put(None)
+                    break
+                batch.append(request)
+            batch = [request for request in batch if not request.cancelled]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            try:
+                self._generate(batch)
+            except Exception as error:
+                for request in batch:
+                    if request.finished is None:
+                        self._finish(request, error)
+            self.counters["batches"] += 1
+            self.counters["busy_seconds"] += time.perf_counter() - started
+
+    def _emit(self, request, token):
+        """Add a token and pass on the text it completes (held back inside a multi-byte character)."""
+        request.tokens.append(token)
+        if request.first_token is None:
+            request.first_token = time.perf_counter()
+        text = self.tokenizer.decode(request.tokens, skip_special_tokens=True)
+        if text.endswith("\ufffd"):
+            return
+        fragment, request.emitted = text[request.emitted:], len(text)
+        if fragment:
+            request.on_token(fragment)
+
+    def _finish(self, request, error=None):
+        request.finished = time.perf_counter()
+        self.counters["requests"] += 1
+        self.counters["generated_tokens"] += len(request.tokens)
+        self.latency.observe(request.finished - request.submitted)
+        if request.first_token is not None:
+            self.first_token_latency.observe(request.first_token - request.submitted)
+        request.on_done(error, request.stats())
+
+    def _sample(self, logits, temperatures):
+        """Next token of every row: greedy where the temperature is 0, else top-k sampling."""
+        greedy = logits.argmax(-1)
+        if not (temperatures > 0).any():
+            return greedy
+        values, indices = logits.topk(min(TOP_K, logits.shape[-1]), dim=-1)
+        probabilities = torch.softmax(values / temperatures.clamp(min=1e-5)[:, None], dim=-1)
+        sampled = indices.gather(1, torch.multinomial(probabilities, 1)).squeeze(1)
+        return torch.where(temperatures > 0, sampled, greedy)
+
+    @torch.inference_mode()
+    def _generate(self, batch):
+        now = time.perf_counter()
+        for request in batch:
+            request.started = now
+        longest = max(request.max_new_tokens for request in batch)
+        encoded = self.tokenizer([request.prompt for request in batch], return_tensors="pt", padding=True,
+                                 truncation=True, max_length=max(CONTEXT_LENGTH - longest, 1))
+        input_ids, attention_mask = encoded["input_ids"], encoded["attention_mask"]
+        temperatures = torch.tensor([request.temperature for request in batch], dtype=torch.float32)
+        active = list(batch)
+        past = None
+        while active:
+            # Positions count real tokens only, so left padding does not shift them.
+            position_ids = attention_mask.cumsum(-1) - 1
+            position_ids = position_ids.clamp(min=0) if past is None else position_ids[:, -1:]
+            output = self.backbone(input_ids=input_ids, attention_mask=attention_mask, position_ids=position_ids,
+                                   past_key_values=past, use_cache=True)
+            past = output.past_key_values
+            next_tokens = self._sample(self.head(output.last_hidden_state[:, -1]).float(), temperatures)
+
+            keep = []
+            for row, (request, token) in enumerate(zip(active, next_tokens.tolist())):
+                if request.cancelled:
+                    self._finish(request)
+                    continue
+                if token == self.tokenizer.eos_token_id:
+                    self._finish(request)
+                    continue
+                self._emit(request, token)
+                if len(request.tokens) >= request.max_new_tokens:
+                    self._finish(request)
+                else:
+                    keep.append(row)
+            if len(keep) < len(active):
+                if not keep:
+                    return
+                index = torch.tensor(keep)
+                past = _select_rows(past, index)
+                attention_mask = attention_mask.index_select(0, index)
+                next_tokens = next_tokens.index_select(0, index)
+                temperatures = temperatures.index_select(0, index)
+                active = [active[row] for row in keep]
+            input_ids = next_tokens[:, None]
+            attention_mask = torch.cat([attention_mask, attention_mask.new_ones((len(active), 1))], dim=1)
+
+    def metrics(self):
+        """Counters, aggregate generated tokens per busy second, and request / first-token latency histograms."""
+        counters = dict(self.counters)
+        busy = counters["busy_seconds"]
+        counters["tokens_per_second"] = counters["generated_tokens"] / busy if busy else None
+        counters["mean_batch"] = counters["requests"] / counters["batches"] if counters["batches"] else None
+        counters["queued"] = self.queue.qsize()
+        return {"engine": counters, "latency": self.latency.snapshot(),
+                "first_token_latency": self.first_token_latency.snapshot()}
+
+###############################
+# Client                      #
+###############################
+
+class LocalModelClient:
+    """
+    OllamaClient-compatible async client for an InferenceEngine, so the fine-tuned model
+    can stand in for Ollama wherever a report client is taken (stream_financial_report,
+    stream_templated_report, ReportCache, AnalysisServer) for short answers.
+    Honours the num_predict and temperature options.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.model = engine.name
+        self.max_concurrency = engine.max_batch
+
+    async def stream(self, prompt, options=None):
+        """Generate a completion, yielding text fragments as they are decoded."""
+        options = options or {}
+        loop = asyncio.get_running_loop()
+        fragments = asyncio.Queue()
+        done = object()
+
+        def on_done(error, stats):
+            loop.call_soon_threadsafe(fragments.put_nowait, (done, error))
+
+        request = self.engine.submit(prompt, options.get("num_predict"), options.get("temperature"),
+                                     lambda text: loop.call_soon_threadsafe(fragments.put_nowait, (text, None)),
+                                     on_done)
+        try:
+            while True:
+                fragment, error = await fragments.get()
+                if fragment is done:
+                    if error is not None:
+                        raise error
+                    return
+                yield fragment
+        finally:
+            request.cancel()
+
+    async def generate(self, prompt, options=None):
+        """Whole completion text."""
+        return "".join([fragment async for fragment in self.stream(prompt, options)])
+
+    async def close(self):
+        await asyncio.to_thread(self.engine.close)
+
+    def metrics(self):
+        return self.engine.metrics()
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Generate with the fine-tuned model on CPU, batching concurrent prompts.")
+    parser.add_argument("--model", default=MODEL_DIR, help="Fine-tuned checkpoint directory.")
+    parser.add_argument("--no-quantize", action="store_true", help="Keep fp32 weights.")
+    parser.add_argument("--requests", type=int, default=16, help="Concurrent requests of the demo.")
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--temperature", type=float, default=0.0)
+    args = parser.parse_args()
+
+    prompts = ["What is the best debt strategy?", "How big should an emergency fund be?",
+               "Should I consolidate my credit card debt?", "How do I start investing with little money?"]
+
+    async def demo():
+        client = LocalModelClient(InferenceEngine.load(args.model, quantize=not args.no_quantize))
+        options = {"num_predict": args.max_new_tokens, "temperature": args.temperature}
+        try:
+            answers = await asyncio.gather(*(client.generate(prompts[i % len(prompts)], options)
+                                             for i in range(args.requests)))
+        finally:
+            await client.close()
+        for prompt, answer in zip(prompts, answers):
+            print(f"{prompt}\n{answer.strip()}\n")
+        print(json.dumps(client.metrics(), indent=2))
+
+    asyncio.run(demo())
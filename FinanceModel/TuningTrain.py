@@ -0,0 +1,402 @@
+import os
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")  # Suppress parallelism warning
+
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import torch
+from transformers import (
+    AutoTokenizer,
+    AutoModelForCausalLM,
+    TrainingArguments,
+    Trainer,
+    TrainerCallback
+)
+from peft import get_peft_model, LoraConfig
+
+from TuningData import load_token_store, CSV_FILE, CausalLMCollator, PackedDataset, PaddingMeter
+from TuningEval import perplexity_stats, perplexity_sums
+
+MODEL_CHECKPOINT = "distilbert/distilgpt2"
+OUTPUT_DIR = "./distilgpt2-finance"
+FINAL_DIR = "./distilgpt2-finance-final"
+
+# LoRA adapters on the attention projections (the only trained weights).
+LORA_SETTINGS = {
+    "r": 16,
+    "lora_alpha": 32,
+    "target_modules": ["attn.c_attn"],
+    "lora_dropout": 0.1,
+    "bias": "none",
+    "task_type": "CAUSAL_LM",
+}
+
+# Optimization settings shared by every device; device profiles only change how it runs.
+TRAINING_SETTINGS = {
+    "learning_rate": 2e-5,
+    "per_device_train_batch_size": 8,
+    "per_device_eval_batch_size": 8,
+    "num_train_epochs": 3,
+    "weight_decay": 0.01,
+    "gradient_accumulation_steps": 4,
+    "logging_steps": 100,
+    "push_to_hub": False,
+}
+
+# Inter-op threads per process on CPU. A training step is one chain of large ops, so
+# extra inter-op threads only compete with the intra-op pool for the same cores.
+CPU_INTEROP_THREADS = 1
+
+# Named configurations of the benchmark harness: keyword arguments of build_trainer, and
+# "processes" for data-parallel runs (started with torchrun).
+BENCH_CONFIGS = {
+    "default": {},
+    "cpu": {"cpu": True},
+    "cpu-bf16": {"cpu": True, "bf16": True},
+    "cpu-compile": {"cpu": True, "compile": True},
+    "cpu-bf16-compile": {"cpu": True, "bf16": True, "compile": True},
+    "cpu-ddp2": {"cpu": True, "processes": 2},
+}
+
+###############################
+# Device                      #
+###############################
+
+def pick_device():
+    """MPS, CUDA or CPU, in that order of preference."""
+    if torch.backends.mps.is_available():
+        return torch.device("mps")
+    if torch.cuda.is_available():
+        return torch.device("cuda")
+    return torch.device("cpu")
+
+def available_cores():
+    """Cores this process may run on (its affinity mask where the OS has one)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def world_size():
+    """Processes in this training run (torchrun sets LOCAL_WORLD_SIZE / WORLD_SIZE)."""
+    return int(os.environ.get("LOCAL_WORLD_SIZE", os.environ.get("WORLD_SIZE", 1)))
+
+def configure_cpu_threads(threads=None, interop_threads=CPU_INTEROP_THREADS):
+    """
+    Size torch's thread pools for CPU training: by default the available cores are split
+    evenly between the processes of a data-parallel run, so they do not oversubscribe.
+    :return: (intra-op threads, inter-op threads) in effect.
+    """
+    threads = threads or max(1, available_cores() // world_size())
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(interop_threads)
+    except RuntimeError:
+        # Only settable before the first inter-op parallel work in this process.
+        pass
+    return torch.get_num_threads(), torch.get_num_interop_threads()
+
+def cpu_supports_bf16():
+    """Whether the CPU has native bf16 instructions (AVX512-BF16 or AMX); elsewhere bf16 autocast is emulated and slower than fp32."""
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+###############################
+# Model and Data              #
+###############################
+
+def load_model(checkpoint=MODEL_CHECKPOINT, verbose=True):
+    """The base model wrapped with LoRA adapters, and its tokenizer (pad = EOS)."""
+    model = AutoModelForCausalLM.from_pretrained(checkpoint)
+    tokenizer = AutoTokenizer.from_pretrained(checkpoint)
+    tokenizer.pad_token = tokenizer.eos_token  # Set padding token for distilgpt2
+    model = get_peft_model(model, LoraConfig(**LORA_SETTINGS))
+    if verbose:
+        model.print_trainable_parameters()
+    return model, tokenizer
+
+def load_datasets(tokenizer, checkpoint=MODEL_CHECKPOINT, source="jsonl", max_length=1024, packing=True,
+                  block_size=1024, max_examples=None):
+    """
+    "train" and "validation" datasets from TuningData's token store.
+    :param source: "jsonl" for Misc/training.jsonl and Misc/validation.jsonl, "csv" for
+                   Misc/Finance-Data.csv with a seeded 10% validation split.
+    :param max_length: Examples are truncated to this many tokens.
+    :param packing: Pack examples into full block_size blocks (no padding).
+    :param max_examples: Keep only the first examples of each split (for benchmarks).
+    """
+    if source == "csv":
+        datasets = load_token_store(checkpoint, max_length, CSV_FILE, None, tokenizer=tokenizer)
+    else:
+        datasets = load_token_store(checkpoint, max_length, tokenizer=tokenizer)
+    if max_examples is not None:
+        for data in datasets.values():
+            data.offsets = data.offsets[:max_examples + 1]
+    if packing:
+        datasets = {split: PackedDataset(data, block_size, tokenizer.eos_token_id) for split, data in datasets.items()}
+    return datasets
+
+###############################
+# Trainer                     #
+###############################
+
+class ThroughputCallback(TrainerCallback):
+    """
+    Reports effective (non-padding) training tokens per second and the padding ratio
+    since the last report, in the training logs and at the end of every epoch.
+    """
+
+    def __init__(self, meter):
+        self.meter = meter
+
+    def on_log(self, args, state, control, logs=None, **kwargs):
+        if logs is not None and "loss" in logs:
+            logs.update(self.meter.snapshot())
+
+    def on_epoch_end(self, args, state, control, **kwargs):
+        stats = self.meter.snapshot()
+        if state.is_world_process_zero:
+            print(f"epoch {state.epoch:.0f}: {stats['tokens_per_second']:.0f} tokens/s, {stats['padding_ratio']:.1%} padding")
+
+    def on_evaluate(self, args, state, control, **kwargs):
+        # Evaluation batches go through the same collator; leave them out of training throughput.
+        self.meter.reset()
+
+class StepTimer(TrainerCallback):
+    """
+    Wall time of every optimizer step after the first warmup steps (compilation, allocator
+    warm-up); the meter is reset after warmup so it counts the tokens of the timed steps.
+    """
+
+    def __init__(self, meter, warmup):
+        self.meter = meter
+        self.warmup = warmup
+        self.step_times = []
+        self._step_started = None
+
+    def on_step_begin(self, args, state, control, **kwargs):
+        self._step_started = time.perf_counter()
+
+    def on_step_end(self, args, state, control, **kwargs):
+        if state.global_step > self.warmup:
+            self.step_times.append(time.perf_counter() - self._step_started)
+        elif state.global_step == self.warmup:
+            self.meter.reset()
+
+class StreamingEvalTrainer(Trainer):
+    """
+    Trainer whose evaluation is TuningEval.evaluate_perplexity: token-level loss and
+    perplexity accumulated batch by batch, with padding masked, instead of gathering
+    every eval logit (N x sequence x 50257 floats) for compute_metrics. In a
+    data-parallel run each process scores its own shard of the eval documents and the
+    summed NLL and token counts are all-reduced, so every process reports the metrics
+    of the whole eval set for 1/world_size of the work.
+    """
+
+    def __init__(self, *args, context_length=1024, pad_token_id=0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.context_length = context_length
+        self.pad_token_id = pad_token_id
+
+    def evaluate(self, eval_dataset=None, ignore_keys=None, metric_key_prefix="eval"):
+        nll, tokens = perplexity_sums(
+            self.model,
+            eval_dataset if eval_dataset is not None else self.eval_dataset,
+            batch_size=self.args.per_device_eval_batch_size,
+            context_length=self.context_length,
+            pad_token_id=self.pad_token_id,
+            rank=self.args.process_index,
+            world_size=self.args.world_size,
+        )
+        if self.args.world_size > 1:
+            # float64 keeps token counts exact far beyond any eval set.
+            totals = torch.tensor([nll, tokens], dtype=torch.float64, device=self.args.device)
+            torch.distributed.all_reduce(totals)
+            nll, tokens = totals[0].item(), int(totals[1].item())
+        stats = perplexity_stats(nll, tokens)
+        metrics = {f"{metric_key_prefix}_{name}": value for name, value in stats.items()}
+        self.log(metrics)
+        self.control = self.callback_handler.on_evaluate(self.args, self.state, self.control, metrics)
+        return metrics
+
+def training_arguments(output_dir=OUTPUT_DIR, cpu=False, bf16=False, compile=False, evaluate=True, max_steps=-1,
+                       **overrides):
+    """
+    TrainingArguments of TRAINING_SETTINGS for the chosen profile.
+    The CPU profile forces the CPU even where MPS/CUDA exist, skips pinned memory (there
+    is no device copy), uses gloo for data-parallel runs started with torchrun, and
+    optionally bf16 autocast and torch.compile of the PEFT model.
+    :param evaluate: Evaluate and save every epoch, keeping the best model; off, nothing
+                     is evaluated or saved (benchmarks).
+    :param max_steps: Stop after this many optimizer steps (-1: num_train_epochs).
+    :param overrides: Any other TrainingArguments.
+    """
+    settings = dict(TRAINING_SETTINGS, output_dir=output_dir, max_steps=max_steps, bf16=bf16, torch_compile=compile)
+    if evaluate:
+        settings.update(eval_strategy="epoch", save_strategy="epoch", load_best_model_at_end=True)
+    else:
+        settings.update(eval_strategy="no", save_strategy="no", report_to="none")
+    if cpu:
+        settings.update(use_cpu=True, dataloader_pin_memory=False, ddp_backend="gloo",
+                        ddp_find_unused_parameters=False)
+    settings.update(overrides)
+    return TrainingArguments(**settings)
+
+def build_trainer(checkpoint=MODEL_CHECKPOINT, source="jsonl", max_length=1024, packing=True, block_size=1024,
+                  cpu=False, bf16=False, compile=False, threads=None, evaluate=True, max_steps=-1,
+                  max_examples=None, output_dir=OUTPUT_DIR, callbacks=(), **overrides):
+    """
+    Trainer fine-tuning LoRA adapters of checkpoint on the local finance articles.
+    Run under torchrun (e.g. torchrun --nproc_per_node 2 TuningTrain.py --cpu) for
+    data-parallel training across processes.
+    :param cpu: CPU profile (see training_arguments); also sizes the thread pools.
+    :param bf16: bf16 autocast (on CPU, only faster with native bf16, see cpu_supports_bf16).
+    :param compile: torch.compile the model.
+    :param threads: Intra-op threads per process on CPU; None splits the cores between processes.
+    :param callbacks: Extra TrainerCallbacks.
+    See load_datasets and training_arguments for the other parameters.
+    :return: (trainer, tokenizer, meter), where meter is the PaddingMeter of the training batches.
+    """
+    if cpu:
+        configure_cpu_threads(threads)
+    model, tokenizer = load_model(checkpoint, verbose=int(os.environ.get("RANK", 0)) == 0)
+    datasets = load_datasets(tokenizer, checkpoint, source, max_length, packing, block_size, max_examples)
+
+    # Counts real and padded tokens in every batch for the throughput logs. Padding is
+    # masked by the attention mask, so the EOS separators of packed blocks keep their labels.
+    meter = PaddingMeter(CausalLMCollator(tokenizer.pad_token_id))
+    args = training_arguments(output_dir, cpu, bf16, compile, evaluate, max_steps,
+                              # Unpacked articles are grouped by length so batches need little padding.
+                              group_by_length=not packing, **overrides)
+    trainer = StreamingEvalTrainer(
+        model=model,
+        args=args,
+        train_dataset=datasets["train"],
+        eval_dataset=datasets["validation"],
+        data_collator=meter,
+        callbacks=[ThroughputCallback(meter), *callbacks],
+        context_length=block_size if packing else max_length,
+        pad_token_id=tokenizer.pad_token_id,
+    )
+    return trainer, tokenizer, meter
+
+def train(**options):
+    """Build the trainer (see build_trainer) and train; returns (trainer, tokenizer, meter)."""
+    trainer, tokenizer, meter = build_trainer(**options)
+    trainer.train()
+    return trainer, tokenizer, meter
+
+###############################
+# Benchmark                   #
+###############################
+
+def peak_rss():
+    """Peak resident set size of this process, in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def _benchmark_worker(config, steps, warmup, block_size, max_examples, out):
+    """Train one configuration for warmup + steps optimizer steps and write its measurements to out (rank 0) or out.rank<N>."""
+    with tempfile.TemporaryDirectory() as output_dir:
+        trainer, _, meter = build_trainer(block_size=block_size, evaluate=False, max_steps=warmup + steps,
+                                          max_examples=max_examples, output_dir=output_dir,
+                                          logging_steps=warmup + steps, disable_tqdm=True, **config)
+        timer = StepTimer(meter, warmup)
+        trainer.add_callback(timer)
+        trainer.train()
+    timed = sum(timer.step_times)
+    rank = int(os.environ.get("RANK", 0))
+    result = {
+        "steps": len(timer.step_times),
+        "tokens": meter.real_tokens,
+        "seconds": timed,
+        "threads": torch.get_num_threads(),
+        "peak_rss": peak_rss(),
+    }
+    with open(out if rank == 0 else f"{out}.rank{rank}", "w", encoding="utf-8") as f:
+        json.dump(result, f)
+
+def benchmark(configs=None, steps=20, warmup=3, block_size=256, max_examples=64):
+    """
+    Run each named configuration (BENCH_CONFIGS) in fresh processes for a fixed number of
+    optimizer steps on a small slice of the local data, so peak memory is per configuration.
+    :param configs: Names of BENCH_CONFIGS entries; None runs all of them.
+    :param steps: Timed optimizer steps, after warmup untimed ones.
+    :param block_size: Packed block size (tokens per sequence).
+    :param max_examples: Examples of the training split used.
+    :return: List of dictionaries with "config", "tokens_per_second" (all processes),
+             "step_seconds" (mean), "peak_rss" (largest process, bytes) and "processes".
+    """
+    results = []
+    for name in configs or BENCH_CONFIGS:
+        config = dict(BENCH_CONFIGS[name])
+        processes = config.pop("processes", 1)
+        with tempfile.TemporaryDirectory() as scratch:
+            out = os.path.join(scratch, "result.json")
+            worker = [os.path.abspath(__file__), "--bench-worker", json.dumps(config), "--steps", str(steps),
+                      "--warmup", str(warmup), "--block-size", str(block_size),
+                      "--max-examples", str(max_examples), "--bench-out", out]
+            if processes > 1:
+                command = [sys.executable, "-m", "torch.distributed.run", "--standalone",
+                           f"--nproc_per_node={processes}", *worker]
+            else:
+                command = [sys.executable, *worker]
+            subprocess.run(command, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+            ranks = [out] + [f"{out}.rank{rank}" for rank in range(1, processes)]
+            measured = []
+            for path in ranks:
+                with open(path, encoding="utf-8") as f:
+                    measured.append(json.load(f))
+        seconds = max(m["seconds"] for m in measured)
+        results.append({
+            "config": name,
+            "processes": processes,
+            "threads": measured[0]["threads"],
+            "tokens_per_second": sum(m["tokens"] for m in measured) / seconds if seconds > 0 else 0.0,
+            "step_seconds": seconds / max(measured[0]["steps"], 1),
+            "peak_rss": max(m["peak_rss"] for m in measured),
+        })
+    return results
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fine-tune distilgpt2 with LoRA on the local finance articles, "
+                                                 "or benchmark training configurations.")
+    parser.add_argument("--cpu", action="store_true", help="CPU training profile.")
+    parser.add_argument("--bf16", action="store_true", help="bf16 autocast.")
+    parser.add_argument("--compile", action="store_true", help="torch.compile the PEFT model.")
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op threads per process (CPU).")
+    parser.add_argument("--csv", action="store_true", help="Train on Misc/Finance-Data.csv with a seeded split.")
+    parser.add_argument("--benchmark", nargs="?", const="", metavar="CONFIGS",
+                        help=f"Benchmark comma-separated configurations (default: all of {', '.join(BENCH_CONFIGS)}).")
+    parser.add_argument("--steps", type=int, default=20, help="Timed benchmark steps.")
+    parser.add_argument("--warmup", type=int, default=3, help="Untimed benchmark steps.")
+    parser.add_argument("--block-size", type=int, default=256, help="Benchmark block size.")
+    parser.add_argument("--max-examples", type=int, default=64, help="Benchmark training examples.")
+    parser.add_argument("--bench-worker", help=argparse.SUPPRESS)
+    parser.add_argument("--bench-out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.bench_worker is not None:
+        _benchmark_worker(json.loads(args.bench_worker), args.steps, args.warmup, args.block_size,
+                          args.max_examples, args.bench_out)
+    elif args.benchmark is not None:
+        names = [name for name in args.benchmark.split(",") if name] or None
+        print(f"{'config':<18}{'procs':>6}{'threads':>8}{'tokens/s':>10}{'step s':>9}{'peak RSS MB':>13}")
+        for row in benchmark(names, args.steps, args.warmup, args.block_size, args.max_examples):
+            print(f"{row['config']:<18}{row['processes']:>6}{row['threads']:>8}{row['tokens_per_second']:>10.0f}"
+                  f"{row['step_seconds']:>9.3f}{row['peak_rss'] / 2**20:>13.0f}")
+    else:
+        trainer, tokenizer, _ = train(source="csv" if args.csv else "jsonl", cpu=args.cpu, bf16=args.bf16,
+                                      compile=args.compile, threads=args.threads)
+        if trainer.is_world_process_zero():
+            trainer.save_model(FINAL_DIR)
+            tokenizer.save_pretrained(FINAL_DIR)
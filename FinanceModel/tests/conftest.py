@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The Finance modules import each other by file name, as when run from FinanceModel/.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,63 @@
+import json
+import random
+
+import pytest
+
+from FinanceBench import synthetic_profiles
+from FinanceModule import compute_financial_analysis
+from FinanceBatch import compute_financial_analysis_batch
+
+CASES = 500
+
+def _mismatches(scalar, batch):
+    # json.dumps tells 5000 from 5000.0, which == does not.
+    return [i for i, (a, b) in enumerate(zip(scalar, batch)) if json.dumps(a) != json.dumps(b)]
+
+@pytest.mark.parametrize("kind", ["typical", "long_tenure", "near_zero"])
+def test_batch_matches_scalar_exactly(kind):
+    profiles = list(synthetic_profiles(CASES, seed=7, kind=kind))
+    batch = compute_financial_analysis_batch(profiles, chunk_size=128)
+    assert len(batch) == CASES
+    assert _mismatches([compute_financial_analysis(p) for p in profiles], batch) == []
+
+def test_batch_matches_scalar_on_edge_cases():
+    # Int and float amounts, zero APRs and payments, and debts never paid off.
+    rng = random.Random("edge")
+    profiles = []
+    for _ in range(CASES):
+        debts = []
+        for i in range(rng.randint(0, 4)):
+            amount = rng.choice([0, rng.randint(1, 50000), round(rng.uniform(1, 50000), 2), 1000000])
+            apr = rng.choice([0, 0.0, 0.18, rng.uniform(0, 0.4)])
+            payment = rng.choice([0, rng.randint(1, 500), round(amount * apr / 12, 2), round(rng.uniform(1, 2000), 2)])
+            debts.append({"name": f"Debt {i}", "total_amount": amount, "monthly_payment": payment, "apr": apr})
+        profiles.append({
+            "income": [{"title": "Salary", "amount": rng.choice([0, rng.randint(1, 9000), round(rng.uniform(1, 9000), 2)])}],
+            "expenses": {"needs": [{"title": "Rent", "amount": rng.randint(0, 3000)}], "wants": []},
+            "debt": debts,
+            "savings": rng.randint(0, 1000)
+        })
+    batch = compute_financial_analysis_batch(profiles, chunk_size=128)
+    assert _mismatches([compute_financial_analysis(p) for p in profiles], batch) == []
+    assert any("Debt Feasibility" in a for a in batch)
+
+@pytest.mark.parametrize("max_months", [0, 60, 1200])
+def test_batch_matches_scalar_around_the_horizon(max_months):
+    # Payments near the interest: paid off past the horizon, never, or stopped past it.
+    rng = random.Random(f"horizon/{max_months}")
+    profiles = []
+    for _ in range(CASES):
+        debts = []
+        for i in range(rng.randint(1, 4)):
+            amount = round(rng.uniform(100, 50000), 2)
+            apr = rng.choice([0.05, 0.18, 0.3])
+            interest = amount * apr / 12
+            payment = interest * rng.choice([rng.uniform(1.00001, 1.002), rng.uniform(0.95, 1.0), 1.2])
+            debts.append({"name": f"Debt {i}", "total_amount": amount, "monthly_payment": payment, "apr": apr})
+        income = sum(d["monthly_payment"] for d in debts) + rng.choice([0, -10, 1, 5, 30, 200])
+        profiles.append({"income": [{"title": "Salary", "amount": income}], "debt": debts})
+    batch = compute_financial_analysis_batch(profiles, chunk_size=128, max_months=max_months)
+    scalar = [compute_financial_analysis(p, max_months) for p in profiles]
+    assert _mismatches(scalar, batch) == []
+    months = [a["Debt Repayment Simulations"]["Avalanche Strategy"]["Estimated Months to Debt-Free"] for a in scalar]
+    assert any(m is not None and m > max_months for m in months)
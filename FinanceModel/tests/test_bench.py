@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+import FinanceBench
+from FinanceBench import compare, main, synthetic_profiles, BENCH_VERSION
+from FinanceModule import compute_financial_analysis
+from FinanceProfile import parse_profile
+
+# One small case, so main runs in well under a second.
+SUITES = {"quick": [("parse_profile", "typical", 50, (1, 3))]}
+
+NAME = "parse_profile/typical/users=50/debts=1-3"
+
+def _report(best_p50_us, suite="quick", seed=0):
+    return {"version": BENCH_VERSION, "suite": suite, "seed": seed, "results": {NAME: {"best_p50_us": best_p50_us}}}
+
+@pytest.mark.parametrize("kind", ["typical", "long_tenure", "near_zero"])
+def test_synthetic_profiles_are_seeded_and_valid(kind):
+    profiles = list(synthetic_profiles(20, seed=3, debts=(1, 4), kind=kind))
+    assert profiles == list(synthetic_profiles(20, seed=3, debts=(1, 4), kind=kind))
+    assert profiles != list(synthetic_profiles(20, seed=4, debts=(1, 4), kind=kind))
+    for profile in profiles:
+        assert 1 <= len(profile["debt"]) <= 4
+        compute_financial_analysis(parse_profile(profile))
+
+def test_compare():
+    baseline = _report(10.0)
+    assert compare(_report(10.9), baseline) == []
+    assert compare(_report(12.0), baseline) == [(NAME, 10.0, 12.0, pytest.approx(0.2))]
+    assert compare(_report(12.0), baseline, threshold=0.25) == []
+    for report in (_report(10.0, suite="full"), _report(10.0, seed=1)):
+        with pytest.raises(ValueError):
+            compare(report, baseline)
+
+def test_main_exit_codes(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(FinanceBench, "SUITES", SUITES)
+    baseline = tmp_path / "baseline.json"
+    assert main(["--save", str(baseline), "--repeats", "1"]) == 0
+    assert main(["--compare", str(baseline), "--repeats", "1", "--threshold", "1000"]) == 0
+
+    saved = json.loads(baseline.read_text())
+    saved["results"][NAME]["best_p50_us"] = 1e-6
+    baseline.write_text(json.dumps(saved))
+    assert main(["--compare", str(baseline), "--repeats", "1"]) == 1
+    assert "REGRESSION " + NAME in capsys.readouterr().err
+
+    assert main(["--compare", str(baseline), "--seed", "1"]) == 2
+    assert "cannot compare: baseline has seed 0" in capsys.readouterr().err
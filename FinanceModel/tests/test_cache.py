@@ -0,0 +1,131 @@
+import pytest
+
+import FinanceCache
+import FinanceModule
+from FinanceCache import analysis_key, cached_financial_analysis, ResultCache
+from FinanceModule import compute_financial_analysis
+
+PROFILE = {
+    "income": [{"title": "Salary", "amount": 5000}],
+    "debt": [{"name": "Card", "total_amount": 5000, "monthly_payment": 100, "apr": 0.18}],
+    "savings": 1000
+}
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "cache.sqlite")
+
+def _cache(path, clock, **options):
+    return ResultCache(path=path, clock=clock, **options)
+
+def test_entries_expire_after_ttl(path, clock):
+    cache = _cache(path, clock, ttl=60)
+    cache.put("a", {"x": 1})
+    clock.now += 60
+    assert cache.get("a") == {"x": 1}
+    clock.now += 1
+    assert cache.get("a") is None
+    # Dropped from both tiers, so another process misses it too.
+    assert cache.stats["expirations"] == 2
+    other = _cache(path, clock, ttl=60, max_entries=0)
+    assert other.get("a") is None and other.stats["misses"] == 1
+    cache.close()
+    other.close()
+
+def test_get_stale_returns_expired_entries(path, clock):
+    cache = _cache(path, clock, ttl=60)
+    cache.put("a", [1, 2])
+    assert cache.get_stale("a") == ([1, 2], True)
+    clock.now += 61
+    assert cache.get_stale("a") == ([1, 2], False)
+    other = _cache(path, clock, ttl=60, max_entries=0)
+    assert other.get_stale("a") == ([1, 2], False)
+    assert other.get_stale("b") == (None, False)
+    assert cache.stats["stale_hits"] == other.stats["stale_hits"] == 1
+    cache.close()
+    other.close()
+
+def test_memory_tier_evicts_least_recently_used(clock):
+    cache = ResultCache(max_entries=2, clock=clock)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats["evictions"] == 1
+
+def test_disk_tier_keeps_max_disk_entries(path, clock):
+    cache = _cache(path, clock, max_entries=0, max_disk_entries=2)
+    for key in "abc":
+        clock.now += 1
+        cache.put(key, key)
+    assert cache.get("a") is None
+    assert cache.get("b") == "b" and cache.get("c") == "c"
+    assert cache.stats["evictions"] == 1
+    cache.close()
+
+def test_disk_tier_evicts_least_recently_read(path, clock):
+    cache = _cache(path, clock, max_entries=0, max_disk_entries=2)
+    cache.put("a", 1)
+    clock.now += 1
+    cache.put("b", 2)
+    clock.now += 1
+    assert cache.get("a") == 1
+    clock.now += 1
+    # The buffered access time of "a" is written with this put, before evicting.
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    cache.close()
+
+def test_disk_tier_is_shared(path, clock):
+    writer = _cache(path, clock)
+    writer.put("a", {"x": [1, 2.5]})
+    reader = _cache(path, clock)
+    assert reader.get("a") == {"x": [1, 2.5]}
+    assert reader.stats["disk_hits"] == 1
+    assert reader.get("a") == {"x": [1, 2.5]} and reader.stats["hits"] == 1
+    writer.close()
+    reader.close()
+
+def test_key_ignores_dictionary_order():
+    reordered = {key: PROFILE[key] for key in reversed(list(PROFILE))}
+    assert analysis_key(reordered) == analysis_key(PROFILE)
+    assert analysis_key(PROFILE, 60) != analysis_key(PROFILE)
+
+def test_key_changes_with_the_cache_version(monkeypatch):
+    key = analysis_key(PROFILE)
+    monkeypatch.setattr(FinanceCache, "CACHE_VERSION", FinanceCache.CACHE_VERSION + 1)
+    assert analysis_key(PROFILE) != key
+
+@pytest.mark.parametrize("name", FinanceCache.MODEL_PARAMETERS)
+def test_key_changes_with_model_parameters(monkeypatch, name):
+    key = analysis_key(PROFILE)
+    value = getattr(FinanceModule, name)
+    monkeypatch.setattr(FinanceModule, name, value + value if isinstance(value, list) else value * 2)
+    assert analysis_key(PROFILE) != key
+
+def test_cached_analysis_is_computed_once(path, clock):
+    cache = _cache(path, clock)
+    analysis = cached_financial_analysis(PROFILE, cache=cache)
+    assert analysis == compute_financial_analysis(PROFILE)
+    assert cached_financial_analysis(dict(PROFILE), cache=cache) is analysis
+    assert cache.stats["misses"] == 1 and cache.stats["hits"] == 1
+    # Another process reads it from the SQLite tier, JSON round trip and all.
+    other = _cache(path, clock)
+    assert cached_financial_analysis(PROFILE, cache=other) == analysis
+    assert other.stats["disk_hits"] == 1
+    cache.close()
+    other.close()
@@ -0,0 +1,42 @@
+import io
+import json
+
+import pytest
+
+from FinanceCLI import analyze_stream, main
+from FinanceModule import compute_financial_analysis, round_floats
+
+PROFILES = [
+    {"income": [{"title": "Salary", "amount": 5000 + 100 * i}],
+     "debt": [{"name": "Card", "total_amount": 1000 * (i + 1), "monthly_payment": 100, "apr": 0.18}]}
+    for i in range(7)
+]
+
+LINES = [json.dumps(p) + "\n" for p in PROFILES[:3]] + ["\n", "{not json\n"] + [
+    json.dumps(p) + "\n" for p in PROFILES[3:]
+]
+
+def _run(**options):
+    out = io.StringIO()
+    stats = analyze_stream(LINES, out, chunk_lines=2, **options)
+    return stats, [json.loads(line) for line in out.getvalue().splitlines()]
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_stream_keeps_input_order_and_reports_errors(workers):
+    stats, records = _run(workers=workers)
+    assert stats["profiles"] == len(PROFILES) + 1 and stats["errors"] == 1
+    assert records[3]["line"] == 5 and records[3]["error"].startswith("JSONDecodeError")
+    analyses = records[:3] + records[4:]
+    assert analyses == [json.loads(json.dumps(round_floats(compute_financial_analysis(p)))) for p in PROFILES]
+
+def test_stream_with_reports():
+    _, records = _run(workers=1, report=True)
+    assert records[0]["report"].startswith("## ") and "analysis" in records[0]
+
+def test_main_exit_code(tmp_path):
+    source, sink = tmp_path / "profiles.jsonl", tmp_path / "analyses.jsonl"
+    source.write_text("".join(json.dumps(p) + "\n" for p in PROFILES))
+    assert main([str(source), "-o", str(sink), "-w", "1"]) == 0
+    assert len(sink.read_text().splitlines()) == len(PROFILES)
+    source.write_text("".join(LINES))
+    assert main([str(source), "-o", str(sink), "-w", "1"]) == 1
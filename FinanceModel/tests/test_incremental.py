@@ -0,0 +1,55 @@
+import json
+
+from FinanceIncremental import merge_user_data, IncrementalAnalysis
+from FinanceModule import compute_financial_analysis, ANALYSIS_STAGES
+from FinanceProfile import parse_profile
+
+PROFILE = {
+    "income": [{"title": "Salary", "amount": 5000}],
+    "expenses": {"needs": [{"title": "Rent", "amount": 1500}], "wants": [{"title": "Dining", "amount": 200}]},
+    "debt": [
+        {"name": "Card", "total_amount": 5000, "monthly_payment": 100, "apr": 0.18},
+        {"name": "Car", "total_amount": 10000, "monthly_payment": 200, "apr": 0.05}
+    ],
+    "savings": 1000
+}
+
+def _same(a, b):
+    return json.dumps(a) == json.dumps(b)
+
+def test_first_run_computes_every_stage():
+    incremental = IncrementalAnalysis(PROFILE)
+    assert incremental.recomputed == [name for name, _, _ in ANALYSIS_STAGES]
+    assert _same(incremental.analysis, compute_financial_analysis(PROFILE))
+
+def test_updates_rerun_only_affected_stages():
+    incremental = IncrementalAnalysis(PROFILE)
+    analysis, recomputed = incremental.update({"savings": 2500})
+    assert recomputed == ["projection"]
+    assert _same(analysis, compute_financial_analysis(merge_user_data(PROFILE, {"savings": 2500})))
+
+    edit = {"expenses": {"wants": [{"title": "Dining", "amount": 400}]}}
+    analysis, recomputed = incremental.update(edit)
+    assert "consolidation" not in recomputed and recomputed[0] == "totals"
+    assert _same(analysis, compute_financial_analysis(incremental.user_data))
+    assert incremental.user_data["expenses"]["needs"] == PROFILE["expenses"]["needs"]
+
+def test_undoing_an_edit_hits_the_stage_cache():
+    incremental = IncrementalAnalysis(PROFILE)
+    incremental.update({"income": [{"title": "Salary", "amount": 6000}]})
+    analysis, recomputed = incremental.update({"income": PROFILE["income"]})
+    assert recomputed == []
+    assert _same(analysis, compute_financial_analysis(PROFILE))
+
+def test_merge_leaves_its_inputs_unchanged():
+    diff = {"expenses": {"needs": []}, "debt": []}
+    before = json.dumps(PROFILE)
+    merged = merge_user_data(PROFILE, diff)
+    assert json.dumps(PROFILE) == before and diff == {"expenses": {"needs": []}, "debt": []}
+    assert merged["expenses"] == {"needs": [], "wants": PROFILE["expenses"]["wants"]}
+    assert merged["debt"] == [] and merged["income"] is PROFILE["income"]
+
+def test_accepts_parsed_profiles():
+    incremental = IncrementalAnalysis(parse_profile(PROFILE))
+    analysis, _ = incremental.update({"savings": 0})
+    assert _same(analysis, compute_financial_analysis(merge_user_data(PROFILE, {"savings": 0})))
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from TuningInference import InferenceEngine, LocalModelClient
+
+PROMPTS = ["What is the best debt strategy?", "Save first?", "How big should an emergency fund be?"]
+
+# Tokens each prompt asks for: different limits drop rows from the batch at different steps.
+MAX_NEW_TOKENS = [6, 2, 4]
+
+class ByteTokenizer:
+    """Stands in for a Hugging Face tokenizer: one token per UTF-8 byte, EOS 256."""
+
+    eos_token_id = pad_token_id = 256
+    padding_side = truncation_side = "right"
+
+    def __call__(self, texts, return_tensors=None, padding=False, truncation=False, max_length=None):
+        ids = [list(text.encode())[-max_length:] if truncation else list(text.encode()) for text in texts]
+        width = max(map(len, ids))
+        return {
+            "input_ids": torch.tensor([[self.pad_token_id] * (width - len(i)) + i for i in ids]),
+            "attention_mask": torch.tensor([[0] * (width - len(i)) + [1] * len(i) for i in ids]),
+        }
+
+    def decode(self, tokens, skip_special_tokens=False):
+        return bytes(t for t in tokens if t < 256).decode("utf-8", errors="replace")
+
+@pytest.fixture(scope="module")
+def model():
+    torch.manual_seed(0)
+    config = transformers.GPT2Config(vocab_size=257, n_positions=128, n_embd=32, n_layer=2, n_head=2)
+    return transformers.GPT2LMHeadModel(config).eval()
+
+def _generate(model, max_batch):
+    engine = InferenceEngine(model, ByteTokenizer(), max_batch=max_batch, batch_wait=1.0, name="tiny")
+    requests = [engine.submit(prompt, n, 0) for prompt, n in zip(PROMPTS, MAX_NEW_TOKENS)]
+    engine.close()
+    return [request.tokens for request in requests], engine.metrics()["engine"]
+
+def test_batched_generation_matches_one_request_at_a_time(model):
+    batched, counters = _generate(model, max_batch=len(PROMPTS))
+    alone, alone_counters = _generate(model, max_batch=1)
+    assert counters["batches"] == 1 and alone_counters["batches"] == len(PROMPTS)
+    assert batched == alone
+    assert all(0 < len(tokens) <= n for tokens, n in zip(batched, MAX_NEW_TOKENS))
+    assert counters["generated_tokens"] == sum(map(len, batched))
+
+def test_client_streams_greedy_completions(model):
+    async def run():
+        client = LocalModelClient(InferenceEngine(model, ByteTokenizer(), name="tiny"))
+        options = {"num_predict": 5, "temperature": 0}
+        fragments = [fragment async for fragment in client.stream(PROMPTS[0], options)]
+        text = await client.generate(PROMPTS[0], options)
+        await client.close()
+        return fragments, text, client.metrics()
+
+    fragments, text, metrics = asyncio.run(run())
+    assert "".join(fragments) == text
+    assert metrics["engine"]["requests"] == 2 and metrics["latency"]["count"] == 2
@@ -0,0 +1,68 @@
+import json
+import time
+
+from FinanceMetrics import timed, LatencyHistogram, Metrics, Trace
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+def _record(seconds, stages, counts):
+    return {"trace": "analysis", "time": 0.0, "seconds": seconds, "stages": stages, "counts": counts}
+
+def test_histogram_quantiles():
+    histogram = LatencyHistogram([1, 10, 100])
+    assert histogram.quantile(0.5) is None and histogram.snapshot()["mean_ms"] is None
+    for ms in [0.5, 0.7, 5, 50, 1000]:
+        histogram.observe(ms / 1000)
+    assert histogram.counts == [2, 1, 1, 1]
+    assert [histogram.quantile(q) for q in (0.2, 0.4, 0.6, 0.8)] == [1, 1, 10, 100]
+    # The last bucket is open-ended.
+    assert histogram.quantile(1.0) is None
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 5 and abs(snapshot["mean_ms"] - 211.24) < 1e-9
+
+def test_trace_adds_up_stages_and_counters():
+    trace = Trace("analysis")
+    for _ in range(2):
+        with trace.stage("simulate"):
+            _busy(0.002)
+    trace.observe("encode", 0.5)
+    trace.add("months", 12)
+    trace.add("months", 3)
+    assert timed(trace, "parse", sum, [1, 2]) == 3 and timed(None, "parse", sum, [1, 2]) == 3
+    record = trace.finish()
+    assert record["trace"] == "analysis" and record["counts"] == {"months": 15}
+    assert sorted(record["stages"]) == ["encode", "parse", "simulate"]
+    assert record["stages"]["simulate"] >= 0.004 and record["stages"]["encode"] == 0.5
+    assert "profile" not in record
+
+def test_metrics_export(tmp_path):
+    log, prometheus = tmp_path / "traces.jsonl", tmp_path / "finance.prom"
+    metrics = Metrics(str(log), str(prometheus))
+    metrics.record(_record(0.002, {"parse": 0.00005}, {"months": 10}))
+    metrics.record(_record(0.02, {"parse": 0.0002}, {"months": 5}))
+    snapshot = metrics.snapshot()["analysis"]
+    assert snapshot["latency"]["count"] == 2 and snapshot["stages"]["parse"]["count"] == 2
+    assert snapshot["counts"] == {"months": 15} and snapshot["profiled"] == 0
+
+    metrics.close()
+    lines = prometheus.read_text().splitlines()
+    assert 'finance_trace_seconds_bucket{trace="analysis",le="+Inf"} 2' in lines
+    assert 'finance_trace_seconds_bucket{trace="analysis",le="0.0025"} 1' in lines
+    assert 'finance_stage_seconds_count{trace="analysis",stage="parse"} 2' in lines
+    assert 'finance_trace_count_total{trace="analysis",counter="months"} 15' in lines
+    assert [json.loads(line)["seconds"] for line in log.read_text().splitlines()] == [0.002, 0.02]
+    assert not list(tmp_path.glob("*.tmp"))
+
+def test_slow_traces_keep_their_stacks():
+    metrics = Metrics(slow_seconds=0.01, profile_interval=0.001)
+    fast, slow = metrics.trace("analysis"), metrics.trace("analysis")
+    fast.finish()
+    _busy(0.05)
+    record = slow.finish()
+    assert record["profile"]["scope"] == "thread"
+    assert any(stack.endswith("test_metrics.py:_busy") for stack in record["profile"]["stacks"])
+    metrics.record(record)
+    assert metrics.snapshot()["analysis"]["profiled"] == 1
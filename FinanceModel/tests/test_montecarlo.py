@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from FinanceMonteCarlo import _sketch, _sketch_quantiles, monte_carlo_projection, SKETCH_POINTS
+
+PROFILE = {
+    "income": [{"title": "Salary", "amount": 5000}],
+    "expenses": {"needs": [{"title": "Rent", "amount": 1500}], "wants": [{"title": "Dining", "amount": 300}]},
+    "debt": [
+        {"name": "Card", "total_amount": 5000, "monthly_payment": 100, "apr": 0.18},
+        {"name": "Car", "total_amount": 10000, "monthly_payment": 200, "apr": 0.05}
+    ],
+    "savings": 2000
+}
+
+PATHS = 2000
+
+def test_fixed_seed_is_reproducible():
+    first = monte_carlo_projection(PROFILE, PATHS, seed=11, chunk_size=500)
+    assert monte_carlo_projection(PROFILE, PATHS, seed=11, chunk_size=500) == first
+    assert monte_carlo_projection(PROFILE, PATHS, seed=11, chunk_size=500, workers=2) == first
+    assert monte_carlo_projection(PROFILE, PATHS, seed=12, chunk_size=500) != first
+
+@pytest.mark.parametrize("chunk_size", [1, 300, PATHS])
+def test_chunk_size_only_changes_the_random_streams(chunk_size):
+    # Each chunk has its own stream, so results agree across chunk sizes up to sampling noise.
+    reference = monte_carlo_projection(PROFILE, PATHS, seed=11, chunk_size=700)
+    result = monte_carlo_projection(PROFILE, PATHS, seed=11, chunk_size=chunk_size)
+    assert result == monte_carlo_projection(PROFILE, PATHS, seed=11, chunk_size=chunk_size)
+    for label in ("p10", "p50", "p90"):
+        assert result["savings"][label] == pytest.approx(reference["savings"][label], rel=0.05)
+        assert abs(result["debt_free_months"][label] - reference["debt_free_months"][label]) <= 2
+    assert result["debt_free_probability"] == pytest.approx(reference["debt_free_probability"], abs=0.02)
+
+def test_sketch_quantiles_match_exact_quantiles():
+    rng = np.random.default_rng(3)
+    values = rng.lognormal(10, 1, 20000)
+    sketches = [_sketch(chunk) for chunk in np.array_split(values, 7)]
+    quantiles = [0.01, 0.1, 0.5, 0.9, 0.99]
+    ranks = np.searchsorted(np.sort(values), _sketch_quantiles(sketches, quantiles)) / values.size
+    assert np.abs(ranks - quantiles).max() <= 2 / SKETCH_POINTS
+
+@pytest.mark.parametrize("options", [{"paths": 0}, {"paths": -5}, {"chunk_size": 0}])
+def test_invalid_sizes_are_rejected(options):
+    with pytest.raises(ValueError):
+        monte_carlo_projection(PROFILE, **{"paths": PATHS, **options})
@@ -0,0 +1,62 @@
+import itertools
+import math
+import random
+
+import pytest
+
+from FinanceModule import _simulate_repayment, DEFAULT_MAX_MONTHS
+from FinanceOptimize import optimize_repayment_order
+
+CASES = 40
+
+# The search costs orders with closed forms that round differently from the simulation.
+REL_TOLERANCE = 1e-9
+ABS_TOLERANCE = 1e-6
+
+def _portfolio(rng):
+    debts = []
+    for i in range(rng.randint(1, 6)):
+        amount = round(rng.uniform(500, 30000), 2)
+        apr = rng.choice([0, round(rng.uniform(0.02, 0.3), 4)])
+        payment = round(max(25, amount * rng.uniform(0.01, 0.04)), 2)
+        debts.append({"name": f"Debt {i}", "total_amount": amount, "monthly_payment": payment, "apr": apr})
+    return debts
+
+def _brute_force(debts, extra_payment, objective):
+    # Best paid-off (months, interest) over every order of the fixed-order simulation.
+    best = None
+    for order in itertools.permutations(debts):
+        state = [[d["total_amount"], d["apr"] / 12, d["monthly_payment"]] for d in order]
+        result = _simulate_repayment(state, extra_payment, False, DEFAULT_MAX_MONTHS)
+        if result["paid_off"]:
+            score = (result["months"], result["total_interest"])
+            if objective == "interest":
+                score = score[::-1]
+            best = score if best is None or score < best else best
+    return best
+
+@pytest.mark.parametrize("objective", ["interest", "months"])
+def test_optimizer_matches_brute_force(objective):
+    rng = random.Random(f"optimize/{objective}")
+    for _ in range(CASES):
+        debts = _portfolio(rng)
+        extra_payment = rng.choice([25, 150, 600])
+        result = optimize_repayment_order(debts, extra_payment, objective, time_budget=None)
+        assert result["optimal"]
+        best = _brute_force(debts, extra_payment, objective)
+        if best is None:
+            assert not result["paid_off"]
+            continue
+        score = (result["months"], result["total_interest"])
+        if objective == "interest":
+            score = score[::-1]
+        # Only the objective is compared: orders whose objectives tie up to rounding
+        # may break the tie either way.
+        assert score[0] == pytest.approx(best[0], rel=REL_TOLERANCE, abs=ABS_TOLERANCE)
+
+def test_state_cap_reports_an_unproven_order():
+    rng = random.Random("optimize/cap")
+    debts = [_portfolio(rng)[0] | {"name": f"Debt {i}"} for i in range(12)]
+    result = optimize_repayment_order(debts, 300, "months", time_budget=None, max_states=5)
+    assert not result["optimal"] and result["states_explored"] > 5
+    assert result["paid_off"] and sorted(result["order"]) == sorted(d["name"] for d in debts)
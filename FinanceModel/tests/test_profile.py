@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from FinanceModule import compute_financial_analysis
+from FinanceProfile import parse_profile, Debt, LineItem, ProfileError, UserProfile
+
+PROFILE = {
+    "income": [{"title": "Salary", "amount": 5000}, {"title": "Side", "amount": "1,000.50"}],
+    "expenses": {"needs": [{"title": "Rent", "amount": 1500}], "wants": []},
+    "debt": [
+        {"name": "Card", "total_amount": 5000, "monthly_payment": 100, "apr": "18%", "tenure": 60},
+        {"name": "Car", "total_amount": "10000", "monthly_payment": 200, "apr": 5}
+    ],
+    "savings": 1000,
+    "notes": "ignored"
+}
+
+def _debt(**fields):
+    return {"debt": [{"name": "Card", "total_amount": 1000, "monthly_payment": 50, **fields}]}
+
+@pytest.mark.parametrize("apr, expected", [
+    (0.18, 0.18), (1, 1), (1.5, 0.015), (18, 0.18), ("18", 0.18), ("0.18", 0.18),
+    ("18%", 0.18), ("150%", 1.5), (0, 0),
+])
+def test_apr_percent_boundary(apr, expected):
+    assert parse_profile(_debt(apr=apr)).debt[0].apr == pytest.approx(expected)
+
+def test_normalizes_and_fills_defaults():
+    profile = parse_profile(PROFILE)
+    assert profile.income == (LineItem("Salary", 5000), LineItem("Side", 1000.5))
+    assert profile.debt[0] == Debt("Card", 5000, 100, 0.18, 60)
+    assert profile.debt[1] == Debt("Car", 10000, 200, 0.05, 0)
+    assert type(profile.debt[1].total_amount) is int
+    assert parse_profile({}) == UserProfile()
+    assert parse_profile({"debt": [{"total_amount": 1, "monthly_payment": 1}]}).debt[0] == Debt("", 1, 1)
+
+def test_parsed_profile_analysis_matches_the_dictionary():
+    normalized = parse_profile(PROFILE).to_dict()
+    assert json.dumps(compute_financial_analysis(parse_profile(PROFILE))) == json.dumps(
+        compute_financial_analysis(normalized)
+    )
+
+@pytest.mark.parametrize("data, path", [
+    ([], "profile"),
+    ({"income": {}}, "income"),
+    ({"income": [5000]}, "income[0]"),
+    ({"income": [{"amount": -1}]}, "income[0].amount"),
+    ({"income": [{"amount": "lots"}]}, "income[0].amount"),
+    ({"income": [{"amount": float("nan")}]}, "income[0].amount"),
+    ({"income": [{"amount": True}]}, "income[0].amount"),
+    ({"income": [{"title": 3}]}, "income[0].title"),
+    ({"expenses": []}, "expenses"),
+    ({"expenses": {"wants": [{"amount": "inf"}]}}, "expenses.wants[0].amount"),
+    ({"debt": [{"monthly_payment": 10}]}, "debt[0].total_amount"),
+    ({"debt": [{"total_amount": 10}]}, "debt[0].monthly_payment"),
+    (_debt(apr=-0.1), "debt[0].apr"),
+    (_debt(apr="high"), "debt[0].apr"),
+    (_debt(tenure=12.5), "debt[0].tenure"),
+    ({"savings": None}, "savings"),
+])
+def test_invalid_values_name_their_path(data, path):
+    with pytest.raises(ProfileError) as error:
+        parse_profile(data)
+    assert str(error.value).startswith(f"{path}:")
+    assert isinstance(error.value, ValueError)
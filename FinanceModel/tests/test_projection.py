@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from FinanceBatch import project_savings_grid
+from FinanceModule import project_savings_growth, project_savings_scenarios, SCENARIO_RATES, SCENARIO_YEARS
+
+RATES = [0, 1e-9, 0.04, 0.1]
+YEARS = [0, 1, 5, 30]
+
+def _monthly(initial_savings, monthly_contribution, annual_rate, years):
+    # The month-by-month loop the closed form replaced.
+    balance = initial_savings
+    for _ in range(years * 12):
+        balance = balance * (1 + annual_rate / 12) + monthly_contribution
+    return balance
+
+@pytest.mark.parametrize("annual_rate", RATES)
+@pytest.mark.parametrize("years", YEARS)
+def test_closed_form_matches_monthly_compounding(annual_rate, years):
+    expected = _monthly(2500, 640, annual_rate, years)
+    assert project_savings_growth(2500, 640, annual_rate, years) == pytest.approx(expected, rel=1e-12)
+
+def test_grid_matches_scalar_projection():
+    initial = np.array([0, 2500, 1e6])
+    contribution = np.array([640, 0, 15])
+    grid = project_savings_grid(initial, contribution, RATES, YEARS)
+    assert grid.shape == (3, len(RATES), len(YEARS))
+    for p in range(3):
+        for i, rate in enumerate(RATES):
+            for j, years in enumerate(YEARS):
+                expected = project_savings_growth(initial[p], contribution[p], rate, years)
+                assert grid[p, i, j] == pytest.approx(expected, rel=1e-12)
+
+def test_scenarios_are_rate_major():
+    scenarios = project_savings_scenarios(1000, 100)
+    assert [(s["annual_rate"], s["years"]) for s in scenarios] == [
+        (rate, years) for rate in SCENARIO_RATES for years in SCENARIO_YEARS
+    ]
@@ -0,0 +1,160 @@
+import json
+import math
+import random
+
+import numpy as np
+import pytest
+
+from FinanceBatch import compute_financial_analysis_batch
+from FinanceModule import compute_financial_analysis, simulate_debt_repayment, _simulate_month, DEFAULT_MAX_MONTHS
+from FinanceSchedule import amortization_schedule
+
+# The event-driven simulation (closed-form jumps between events) must agree with stepping
+# _simulate_month every month: the same months to debt-free, and total interest and
+# remaining balance within these tolerances (the closed forms round differently).
+REL_TOLERANCE = 1e-8
+ABS_TOLERANCE = 1e-6
+
+# Stepping can leave a float residue (232.56 - 114 * 2.04 > 0) that takes one more month
+# to clear; months may then differ by one if the balance left was below this.
+RESIDUE = 1e-6
+
+# Long enough for every generated portfolio to be paid off.
+MAX_MONTHS = 20000
+
+CASES = 200
+
+def _step(debts, extra_payment, strategy, max_months):
+    """
+    Month-by-month reference: _simulate_month until paid off or max_months.
+    :return: (months or None, months simulated, total interest, remaining balance,
+             open balance after each month, months in which the snowball order changed).
+    """
+    if strategy == "avalanche":
+        ordered = sorted(debts, key=lambda d: d.get("apr", 0), reverse=True)
+    else:
+        ordered = sorted(debts, key=lambda d: d["total_amount"])
+    state = [[d["total_amount"], d["apr"] / 12, d["monthly_payment"]] for d in ordered]
+    months, total_interest, reorders = 0, 0, 0
+    balances = [sum(d[0] for d in state if d[0] > 0)]
+    while any(d[0] > 0 for d in state) and months < max_months:
+        months += 1
+        total_interest = _simulate_month(state, extra_payment, total_interest)
+        if strategy == "snowball":
+            order = [id(d) for d in state if d[0] > 0]
+            state.sort(key=lambda d: d[0])
+            reorders += order != [id(d) for d in state if d[0] > 0]
+        balances.append(sum(d[0] for d in state if d[0] > 0))
+    paid_off = not any(d[0] > 0 for d in state)
+    return months if paid_off else None, months, total_interest, balances[-1], balances, reorders
+
+def _portfolio(rng, kind):
+    """
+    Random debts of a kind: "typical", "zero_apr", "near_interest" (payments a hair above
+    the interest, paid off over hundreds to thousands of months) or "reorder" (payments
+    that let larger balances overtake smaller ones, so snowball changes its target).
+    """
+    debts = []
+    for i in range(rng.randint(1, 5)):
+        balance = round(rng.uniform(100, 50000), 2)
+        apr = 0.0 if kind == "zero_apr" else round(rng.uniform(0.05 if kind == "near_interest" else 0, 0.3), 4)
+        interest = balance * apr / 12
+        if kind == "near_interest":
+            payment = interest * rng.uniform(1.0001, 1.01)
+        elif kind == "reorder":
+            payment = round(interest + balance / rng.choice([2, 5, 400, 2000]), 2)
+        else:
+            payment = round(interest + balance / rng.uniform(6, 360), 2)
+        debts.append({"name": f"Debt {i}", "total_amount": balance, "monthly_payment": payment, "apr": apr})
+    extra_payment = rng.choice([0, 0, round(rng.uniform(1, 50), 2), round(rng.uniform(50, 3000), 2)])
+    return debts, extra_payment
+
+@pytest.mark.parametrize("strategy", ["avalanche", "snowball"])
+@pytest.mark.parametrize("kind", ["typical", "zero_apr", "near_interest", "reorder"])
+def test_event_driven_matches_monthly_steps(kind, strategy):
+    rng = random.Random(f"{kind}/{strategy}")
+    reordered = 0
+    for _ in range(CASES):
+        debts, extra_payment = _portfolio(rng, kind)
+        result = simulate_debt_repayment(debts, extra_payment, strategy, MAX_MONTHS)
+        months, months_simulated, total_interest, remaining, balances, reorders = _step(
+            debts, extra_payment, strategy, MAX_MONTHS)
+        reordered += reorders > 0
+        assert months is not None, (debts, extra_payment)
+        if result["months"] != months:
+            shorter = min(result["months"], months)
+            assert abs(result["months"] - months) == 1, (debts, extra_payment)
+            assert balances[shorter] < RESIDUE, (debts, extra_payment)
+            assert simulate_debt_repayment(debts, extra_payment, strategy, shorter)["remaining_balance"] < RESIDUE
+        else:
+            assert result["months_simulated"] == months_simulated
+        assert math.isclose(result["total_interest"], total_interest, rel_tol=REL_TOLERANCE, abs_tol=ABS_TOLERANCE), \
+            (debts, extra_payment)
+        assert math.isclose(result["remaining_balance"], remaining, rel_tol=REL_TOLERANCE, abs_tol=ABS_TOLERANCE)
+        assert result["balance_trajectory"][-1]["month"] == result["months_simulated"]
+    if strategy == "snowball":
+        # The comparison is only meaningful if the target actually changes mid-repayment.
+        assert reordered > CASES // 10
+
+def test_payments_barely_above_interest_without_extra_funds():
+    rng = random.Random("near_interest/no_extra")
+    longest = 0
+    for _ in range(CASES // 4):
+        debts, _ = _portfolio(rng, "near_interest")
+        result = simulate_debt_repayment(debts, 0, "avalanche", MAX_MONTHS)
+        months, _, total_interest, _, _, _ = _step(debts, 0, "avalanche", MAX_MONTHS)
+        assert result["months"] == months
+        assert math.isclose(result["total_interest"], total_interest, rel_tol=REL_TOLERANCE)
+        longest = max(longest, months)
+    assert longest > DEFAULT_MAX_MONTHS
+
+def test_amortizing_debts_are_followed_past_the_horizon():
+    rng = random.Random("near_interest/horizon")
+    beyond = 0
+    for _ in range(CASES // 4):
+        debts, _ = _portfolio(rng, "near_interest")
+        result = simulate_debt_repayment(debts, 0, "avalanche")
+        months, _, total_interest, _, _, _ = _step(debts, 0, "avalanche", MAX_MONTHS)
+        assert result["paid_off"] and result["months"] == months
+        assert math.isclose(result["total_interest"], total_interest, rel_tol=REL_TOLERANCE)
+        assert amortization_schedule(debts, 0, "avalanche")["months"] == months
+        beyond += months > DEFAULT_MAX_MONTHS
+    assert beyond > 0
+
+def test_debts_that_stop_amortizing_stop_at_once():
+    debts = [{"name": "Interest only", "total_amount": 10000, "monthly_payment": 100, "apr": 0.12}]
+    result = simulate_debt_repayment(debts, 0, "avalanche")
+    assert not result["paid_off"] and result["months"] is None
+    assert result["months_simulated"] == 0
+    assert result["remaining_balance"] == 10000
+    assert not amortization_schedule(debts, 0, "avalanche")["paid_off"]
+
+@pytest.mark.parametrize("apr", [18, 2, 0.5])
+def test_high_apr_debt_that_stops_amortizing(apr):
+    # A percentage passed as a fraction (18 for 18%) grows the balance without bound; the
+    # closed form used to overflow or return absurd balances before the horizon.
+    debts = [{"name": "Card", "total_amount": 5000, "monthly_payment": 100, "apr": apr}]
+    result = simulate_debt_repayment(debts, 0, "avalanche")
+    assert not result["paid_off"] and result["months_simulated"] == 0
+    assert result["remaining_balance"] == 5000 and result["total_interest"] == 0
+    schedule = amortization_schedule(debts, 0, "avalanche")
+    assert np.isfinite(schedule["balance"]).all() and schedule["month"][-1] == 0
+
+    profile = {"income": [{"title": "Salary", "amount": 3000}], "debt": debts}
+    scalar = compute_financial_analysis(profile)
+    assert json.dumps(compute_financial_analysis_batch([profile])[0]) == json.dumps(scalar)
+    assert "Infinity" not in json.dumps(scalar)
+
+def test_debt_that_stops_amortizing_past_the_horizon():
+    # The second debt grows until the first is paid off; its interest passes its payment
+    # plus the extra funds after about 1220 months, before the extra funds reach it.
+    debts = [
+        {"name": "Large", "total_amount": 1e6, "monthly_payment": 9980.01, "apr": 0.12},
+        {"name": "Growing", "total_amount": 1000, "monthly_payment": 9.9999, "apr": 0.12},
+    ]
+    result = simulate_debt_repayment(debts, 20, "avalanche")
+    assert not result["paid_off"]
+    assert DEFAULT_MAX_MONTHS < result["months_simulated"] < MAX_MONTHS
+    assert _step(debts, 20, "avalanche", MAX_MONTHS)[0] is None
+    schedule = amortization_schedule(debts, 20, "avalanche")
+    assert not schedule["paid_off"] and schedule["month"][-1] == result["months_simulated"]
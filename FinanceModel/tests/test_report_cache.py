@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from FinanceModule import compute_financial_analysis
+from FinanceReport import OllamaError, ReportCache
+
+TTL = 60
+
+ANALYSIS = compute_financial_analysis({
+    "income": [{"title": "Salary", "amount": 5000}],
+    "debt": [{"name": "Card", "total_amount": 5000, "monthly_payment": 100, "apr": 0.18}],
+})
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class GatedClient:
+    """Report client whose generations wait for release(); the n-th one returns "report n"."""
+
+    model = "stub"
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+        self.gate = asyncio.Event()
+
+    def release(self):
+        self.gate.set()
+
+    async def generate(self, prompt, options=None):
+        self.calls += 1
+        call = self.calls
+        await self.gate.wait()
+        if self.fail:
+            raise OllamaError("model unavailable")
+        return f"report {call}"
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    cache = ReportCache(str(tmp_path / "reports.sqlite"), ttl=TTL)
+    cache.results.clock = clock
+    yield cache
+    cache.close()
+
+async def _expired_report(cache, clock):
+    """A client and a cache holding its first report, now expired."""
+    client = GatedClient()
+    client.release()
+    assert await cache.report(ANALYSIS, client) == "report 1"
+    clock.now += TTL + 1
+    client.gate.clear()
+    return client
+
+def test_expired_report_is_served_while_one_refresh_runs(cache, clock):
+    async def run():
+        client = await _expired_report(cache, clock)
+        served = await asyncio.gather(*(cache.report(ANALYSIS, client) for _ in range(5)))
+        assert served == ["report 1"] * 5
+        assert client.calls == 2 and len(cache.pending) == 1
+        client.release()
+        await asyncio.gather(*cache.pending.values())
+        assert await cache.report(ANALYSIS, client) == "report 2"
+        assert client.calls == 2
+
+    asyncio.run(run())
+    metrics = cache.metrics()
+    assert metrics["refreshes"] == 1 and metrics["refresh_errors"] == 0
+    assert metrics["generated"] == 2 and metrics["stale_hits"] == 5
+
+def test_failed_refresh_keeps_the_stale_report(cache, clock):
+    async def run():
+        client = await _expired_report(cache, clock)
+        client.fail = True
+        assert await cache.report(ANALYSIS, client) == "report 1"
+        client.release()
+        await asyncio.gather(*cache.pending.values(), return_exceptions=True)
+        assert not cache.pending
+        # Still served, and the next request tries to refresh it again.
+        assert await cache.report(ANALYSIS, client) == "report 1"
+        client.fail = False
+        await asyncio.gather(*cache.pending.values())
+        assert await cache.report(ANALYSIS, client) == "report 3"
+
+    asyncio.run(run())
+    metrics = cache.metrics()
+    assert metrics["refreshes"] == 2 and metrics["refresh_errors"] == 1
+
+def test_without_serve_stale_an_expired_report_is_regenerated(tmp_path, clock):
+    cache = ReportCache(str(tmp_path / "reports.sqlite"), ttl=TTL, serve_stale=False)
+    cache.results.clock = clock
+
+    async def run():
+        client = await _expired_report(cache, clock)
+        client.release()
+        assert await cache.report(ANALYSIS, client) == "report 2"
+
+    asyncio.run(run())
+    cache.close()
@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+import pytest
+
+from FinanceModule import compute_financial_analysis
+from FinanceReport import generate_financial_reports, OllamaClient, OllamaError
+
+ANALYSES = [
+    compute_financial_analysis({
+        "income": [{"title": "Salary", "amount": 4000 + 500 * i}],
+        "debt": [{"name": "Card", "total_amount": 5000, "monthly_payment": 100, "apr": 0.18}],
+    })
+    for i in range(5)
+]
+
+class FakeOllama:
+    """
+    Keep-alive HTTP server streaming /api/generate answers in chunked NDJSON: the words
+    "report", the request number and "done". A prompt containing "FAIL" gets a 500, and
+    one containing "BROKEN" an error message in the stream.
+    """
+
+    def __init__(self):
+        self.connections = 0
+        self.requests = 0
+        self.active = 0
+        self.peak = 0
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").lower()
+                except asyncio.IncompleteReadError:
+                    return
+                length = int(head.split("content-length: ")[1].split("\r\n")[0])
+                prompt = json.loads(await reader.readexactly(length))["prompt"]
+                self.requests += 1
+                number = self.requests
+                if "FAIL" in prompt:
+                    body = b"model not found"
+                    writer.write(b"HTTP/1.1 500 Internal Server Error\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body))
+                    continue
+                self.active += 1
+                self.peak = max(self.peak, self.active)
+                writer.write(b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n")
+                messages = [{"response": "report "}, {"response": str(number)}, {"response": " done", "done": True}]
+                if "BROKEN" in prompt:
+                    messages[1] = {"error": "out of memory"}
+                for message in messages:
+                    line = json.dumps(message).encode() + b"\n"
+                    writer.write(b"%x\r\n%s\r\n" % (len(line), line))
+                    await writer.drain()
+                    await asyncio.sleep(0.001)
+                writer.write(b"0\r\n\r\n")
+                self.active -= 1
+        finally:
+            writer.close()
+
+async def _serve(fake):
+    listener = await asyncio.start_server(fake.handle, "127.0.0.1", 0)
+    return listener, f"http://127.0.0.1:{listener.sockets[0].getsockname()[1]}"
+
+def test_reports_stream_concurrently_over_reused_connections():
+    fake = FakeOllama()
+    fragments = []
+
+    async def run():
+        listener, url = await _serve(fake)
+        client = OllamaClient(url, max_concurrency=2)
+        reports = await generate_financial_reports(ANALYSES, client, lambda i, f: fragments.append(i))
+        again = await client.generate("once more")
+        await client.close()
+        listener.close()
+        return reports, again
+
+    reports, again = asyncio.run(run())
+    assert sorted(reports) == sorted(f"report {n} done" for n in range(1, 6))
+    assert again == "report 6 done"
+    assert fake.peak == 2 and fake.connections == 2
+    assert sorted(set(fragments)) == list(range(len(ANALYSES))) and len(fragments) == 3 * len(ANALYSES)
+
+@pytest.mark.parametrize("prompt, message", [("FAIL", "500: model not found"), ("BROKEN", "out of memory")])
+def test_errors_raise_and_keep_the_client_usable(prompt, message):
+    fake = FakeOllama()
+
+    async def run():
+        listener, url = await _serve(fake)
+        client = OllamaClient(url)
+        with pytest.raises(OllamaError, match=message):
+            await client.generate(prompt)
+        result = await client.generate("fine")
+        await client.close()
+        listener.close()
+        return result
+
+    assert asyncio.run(run()) == "report 2 done"
@@ -0,0 +1,53 @@
+import pytest
+
+from FinanceModule import compute_financial_analysis
+from FinanceReport import build_compact_report_prompt, build_report_prompt, count_tokens, REPORT_INSTRUCTIONS
+
+PROFILE = {
+    "income": [{"title": "Salary", "amount": 4200}],
+    "expenses": {"needs": [{"title": "Rent", "amount": 1600}], "wants": [{"title": "Dining", "amount": 300}]},
+    "debt": [
+        {"name": "Card", "total_amount": 8000, "monthly_payment": 120, "apr": 0.24},
+        {"name": "Store card", "total_amount": 3000, "monthly_payment": 45, "apr": 0.18},
+        {"name": "Car", "total_amount": 12000, "monthly_payment": 250, "apr": 0.06}
+    ],
+    "savings": 1500
+}
+
+SNIPPETS = ["Credit card debt: Pay more than the minimum.", "Emergency fund: Keep three months of expenses."]
+
+@pytest.fixture(scope="module")
+def analysis():
+    return compute_financial_analysis(PROFILE)
+
+def _budget_dropping(analysis, count):
+    """The largest budget at which the first count optional sections are dropped."""
+    _, stats = build_compact_report_prompt(analysis, None, snippets=SNIPPETS)
+    for budget in range(stats["tokens"], 0, -1):
+        _, stats = build_compact_report_prompt(analysis, budget, snippets=SNIPPETS)
+        if len(stats["dropped"]) == count:
+            return budget
+
+def test_compact_prompt_is_shorter_than_json(analysis):
+    prompt, stats = build_compact_report_prompt(analysis)
+    assert prompt.startswith(REPORT_INSTRUCTIONS) and stats["dropped"] == []
+    assert stats["tokens"] == count_tokens(prompt)
+    assert 2 * stats["tokens"] < count_tokens(build_report_prompt(analysis))
+    for text in ["Card|8000|120|24%", "Car|12000|250|6%", "income 4200", "current savings 1500"]:
+        assert text in prompt
+
+def test_over_budget_drops_optional_sections_least_important_first(analysis):
+    dropped = [build_compact_report_prompt(analysis, _budget_dropping(analysis, n), snippets=SNIPPETS)[1]["dropped"]
+               for n in range(1, 5)]
+    assert dropped[-1] == ["scenarios", "guidance2", "guidance1", "debts"]
+    assert dropped == [dropped[-1][:n] for n in range(1, 5)]
+
+def test_required_sections_are_kept_under_any_budget(analysis):
+    prompt, stats = build_compact_report_prompt(analysis, 1, snippets=SNIPPETS)
+    assert stats["budget"] == 1 and stats["tokens"] > 1
+    assert "Monthly: income" in prompt and "Repayment:" in prompt and "Savings in 5 years" in prompt
+    assert "Debts:" not in prompt and "Relevant guidance" not in prompt
+
+@pytest.mark.parametrize("text, tokens", [("", 0), ("debt", 1), ("consolidation", 4), ("12000", 2), ("$4,200.50", 6)])
+def test_token_estimate(text, tokens):
+    assert count_tokens(text) == tokens
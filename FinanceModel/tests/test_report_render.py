@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from FinanceModule import compute_financial_analysis
+from FinanceReport import (
+    render_financial_report,
+    rule_recommendations,
+    stream_templated_report,
+    build_narrative_prompt,
+    NARRATIVE_INSTRUCTIONS,
+)
+
+PROFILE = {
+    "income": [{"title": "Salary", "amount": 4200}],
+    "expenses": {"needs": [{"title": "Rent", "amount": 1600}], "wants": [{"title": "Dining", "amount": 1500}]},
+    "debt": [
+        {"name": "Card", "total_amount": 8000, "monthly_payment": 120, "apr": 0.24},
+        {"name": "Car", "total_amount": 12000, "monthly_payment": 250, "apr": 0.06}
+    ],
+    "savings": 1500
+}
+
+# A payment that only covers the interest (2% a month on 6000).
+STALLED = {
+    "income": [{"title": "Salary", "amount": 2000}],
+    "expenses": {"needs": [{"title": "Rent", "amount": 1880}], "wants": []},
+    "debt": [{"name": "Payday loan", "total_amount": 6000, "monthly_payment": 120, "apr": 0.24}],
+    "savings": 0
+}
+
+NO_DEBT = {"income": [{"title": "Salary", "amount": 3000}], "expenses": {"needs": [], "wants": []}, "savings": 20000}
+
+TITLES = ["Financial Overview", "Debt Repayment Plan", "Current Savings Status", "Savings Projections",
+          "Recommendations and Next Steps"]
+
+class StubClient:
+    model = "stub"
+
+    def __init__(self):
+        self.prompts = []
+
+    async def stream(self, prompt, options=None):
+        self.prompts.append(prompt)
+        for fragment in ["1. Pay ", "the card."]:
+            yield fragment
+
+def _titles(report):
+    return [line[3:] for line in report.splitlines() if line.startswith("## ")]
+
+@pytest.mark.parametrize("profile", [PROFILE, STALLED, NO_DEBT])
+def test_report_has_every_section_and_is_deterministic(profile):
+    analysis = compute_financial_analysis(profile)
+    report = render_financial_report(analysis)
+    assert _titles(report) == TITLES
+    assert report == render_financial_report(compute_financial_analysis(profile))
+    assert report.endswith(rule_recommendations(analysis) + "\n")
+
+def test_report_quotes_the_analysis():
+    report = render_financial_report(compute_financial_analysis(PROFILE), narrative="  Pay the card.\n")
+    for text in ["- Monthly income: $4,200.00", "| Card | $8,000.00 | $120.00 | 24.00% |", "Current savings are $1,500.00."]:
+        assert text in report
+    assert report.endswith("## Recommendations and Next Steps\n\nPay the card.\n")
+    assert "No outstanding debt." in render_financial_report(compute_financial_analysis(NO_DEBT))
+
+def test_rules_flag_stalled_debts_and_overspending():
+    stalled = rule_recommendations(compute_financial_analysis(STALLED))
+    assert "Raise the payment on Payday loan above its $120.00 monthly interest" in stalled
+    assert "Trim wants from $1,500.00 to $1,260.00" in rule_recommendations(compute_financial_analysis(PROFILE))
+    assert "the debt is never paid off" in render_financial_report(compute_financial_analysis(STALLED))
+
+def test_streamed_report_sends_only_the_narrative_prompt():
+    analysis = compute_financial_analysis(PROFILE)
+    client = StubClient()
+
+    async def run():
+        return [fragment async for fragment in stream_templated_report(analysis, client)]
+
+    fragments = asyncio.run(run())
+    assert "".join(fragments) == render_financial_report(analysis, narrative="1. Pay the card.")
+    assert client.prompts == [build_narrative_prompt(analysis)[0]]
+    assert client.prompts[0].startswith(NARRATIVE_INSTRUCTIONS) and "Debts:" not in client.prompts[0]
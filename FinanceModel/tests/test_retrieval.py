@@ -0,0 +1,92 @@
+import csv
+import json
+
+import pytest
+
+import FinanceRetrieval
+from FinanceModule import compute_financial_analysis
+from FinanceRetrieval import build_index, retrieve_snippets, tokenize, RetrievalIndex
+
+ARTICLES = [
+    ("Credit card debt", "High interest rate credit cards cost the most. Pay more than the minimum payment."),
+    ("Emergency fund", "Keep three to six months of expenses in an emergency fund. Start small."),
+    ("Debt avalanche", "The avalanche method pays the highest interest debt first. It saves the most interest."),
+    ("Index funds", "Index funds are a cheap way to invest for retirement. Fees matter over decades."),
+]
+
+# Written as a chat file: one article repeats the CSV, one is new.
+CHAT_ARTICLES = [ARTICLES[0], ("Debt consolidation", "A consolidation loan can refinance card debt at a lower rate.")]
+
+PROFILE = {
+    "income": [{"title": "Salary", "amount": 4000}],
+    "expenses": {"needs": [{"title": "Rent", "amount": 1500}], "wants": []},
+    "debt": [{"name": "Credit card", "total_amount": 6000, "monthly_payment": 150, "apr": 0.24}],
+    "savings": 500
+}
+
+def _write_csv(path, articles):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Title", "Content"])
+        writer.writerows(articles)
+    return str(path)
+
+def _write_chat(path, articles):
+    with open(path, "w", encoding="utf-8") as f:
+        for title, content in articles:
+            messages = [{"role": "user", "content": title}, {"role": "assistant", "content": content}]
+            f.write(json.dumps({"messages": messages}) + "\n")
+    return str(path)
+
+@pytest.fixture
+def corpus(tmp_path):
+    return _write_csv(tmp_path / "articles.csv", ARTICLES), _write_chat(tmp_path / "chat.jsonl", CHAT_ARTICLES)
+
+def _results(index, query):
+    return [(pytest.approx(score, rel=1e-6), document["title"]) for score, document in index.search(query, k=10)]
+
+def test_incremental_build_scores_like_a_full_build(tmp_path, corpus):
+    index_dir = str(tmp_path / "index")
+    assert build_index([corpus[0]], index_dir) == {"added": 4, "documents": 4, "segments": 1, "rebuilt": True}
+    assert build_index([corpus[0]], index_dir)["added"] == 0
+    assert build_index(corpus, index_dir) == {"added": 1, "documents": 5, "segments": 2, "rebuilt": False}
+
+    full_dir = str(tmp_path / "full")
+    build_index(corpus, full_dir)
+    incremental, full = RetrievalIndex(index_dir), RetrievalIndex(full_dir)
+    assert incremental.documents == full.documents == 5
+    for query in ["credit card interest", "debt", "refinance loan", [("emergency fund", 2.0), ("invest", 1.0)]]:
+        assert _results(incremental, query) == _results(full, query)
+
+def test_removed_articles_rebuild_and_segments_merge(tmp_path, corpus, monkeypatch):
+    index_dir = str(tmp_path / "index")
+    build_index(corpus, index_dir)
+    _write_csv(corpus[0], ARTICLES[:1] + ARTICLES[2:])
+    assert build_index(corpus, index_dir) == {"added": 4, "documents": 4, "segments": 1, "rebuilt": True}
+    assert "Emergency fund" not in [document["title"] for _, document in RetrievalIndex(index_dir).search("fund")]
+
+    monkeypatch.setattr(FinanceRetrieval, "MAX_SEGMENTS", 2)
+    _write_csv(corpus[0], ARTICLES + [("Budgeting", "Track spending for a month.")])
+    assert build_index(corpus, index_dir)["segments"] == 2
+    _write_csv(corpus[0], ARTICLES + [("Budgeting", "Track spending for a month."), ("Taxes", "File on time.")])
+    assert build_index(corpus, index_dir) == {"added": 7, "documents": 7, "segments": 1, "rebuilt": True}
+    assert len(list((tmp_path / "index").glob("segment-*"))) == 1
+
+def test_search(tmp_path, corpus):
+    build_index(corpus, str(tmp_path))
+    index = RetrievalIndex(str(tmp_path))
+    results = index.search("highest interest avalanche", k=2)
+    assert [document["title"] for _, document in results][0] == "Debt avalanche"
+    assert len(results) == 2 and results[0][0] >= results[1][0] > 0
+    assert index.search("zebra") == [] and index.idf("zebra") == 0.0
+    assert tokenize("Paying the payments") == ["pay", "payment"]
+
+def test_missing_index(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        RetrievalIndex(str(tmp_path))
+
+def test_snippets_for_an_analysis(tmp_path, corpus):
+    build_index(corpus, str(tmp_path))
+    snippets = retrieve_snippets(compute_financial_analysis(PROFILE), RetrievalIndex(str(tmp_path)), k=2)
+    assert len(snippets) == 2
+    assert snippets[0].startswith("Credit card debt: ")
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from FinanceSchedule import amortization_schedule, downsample_schedule, iter_schedule, schedule_json, STRATEGIES
+
+DEBTS = [
+    {"name": "Card", "total_amount": 5000, "monthly_payment": 100, "apr": 0.18},
+    {"name": "Car", "total_amount": 10000, "monthly_payment": 200, "apr": 0.05},
+    {"name": "Store", "total_amount": 700, "monthly_payment": 25, "apr": 0.24}
+]
+
+EXTRA = 150
+
+@pytest.fixture(params=STRATEGIES)
+def strategy(request):
+    return request.param
+
+@pytest.fixture
+def schedule(strategy):
+    return amortization_schedule(DEBTS, EXTRA, strategy)
+
+def _assert_same_totals(reduced, full):
+    np.testing.assert_allclose(reduced["interest"].sum(axis=0), full["interest"].sum(axis=0), rtol=1e-12)
+    np.testing.assert_allclose(reduced["payment"].sum(axis=0), full["payment"].sum(axis=0), rtol=1e-12)
+
+@pytest.mark.parametrize("points", [2, 3, 7, 50])
+def test_downsampling_keeps_totals_and_ends(schedule, points):
+    reduced = downsample_schedule(schedule, points)
+    assert 2 <= len(reduced["month"]) <= points
+    assert reduced["month"][0] == schedule["month"][0] and reduced["month"][-1] == schedule["month"][-1]
+    assert (np.diff(reduced["month"]) > 0).all()
+    np.testing.assert_array_equal(reduced["balance"][-1], schedule["balance"][-1])
+    _assert_same_totals(reduced, schedule)
+    assert reduced["total_interest"] == schedule["total_interest"]
+
+def test_downsampling_a_short_schedule_keeps_it(schedule):
+    assert downsample_schedule(schedule, len(schedule["month"])) is schedule
+    with pytest.raises(ValueError):
+        downsample_schedule(schedule, 1)
+
+@pytest.mark.parametrize("every", [1, 5, 12, 1000])
+def test_iter_schedule_every_keeps_totals_and_ends(schedule, strategy, every):
+    rows = list(iter_schedule(DEBTS, EXTRA, strategy, every=every))
+    months = [month for month, _, _, _ in rows]
+    assert months[0] == 0 and months[-1] == schedule["month"][-1]
+    assert all(m % every == 0 for m in months[:-1])
+    reduced = {"interest": np.array([r[2] for r in rows]), "payment": np.array([r[3] for r in rows])}
+    _assert_same_totals(reduced, schedule)
+    np.testing.assert_array_equal(rows[-1][1], schedule["balance"][-1])
+
+def test_points_option_matches_downsampling(schedule, strategy):
+    reduced = amortization_schedule(DEBTS, EXTRA, strategy, points=10)
+    expected = downsample_schedule(schedule, 10)
+    for column in ("month", "balance", "interest", "payment"):
+        np.testing.assert_array_equal(reduced[column], expected[column])
+    assert schedule_json(reduced)["month"][-1] == schedule["months"]
+
+def test_invalid_every_is_rejected():
+    with pytest.raises(ValueError):
+        next(iter_schedule(DEBTS, EXTRA, every=0))
@@ -0,0 +1,135 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from FinanceMetrics import Metrics
+from FinanceModule import compute_financial_analysis, round_floats
+from FinanceReport import count_tokens
+from FinanceSchedule import STRATEGIES
+from FinanceServer import AnalysisServer, AnalysisService
+
+PROFILE = {
+    "income": [{"title": "Salary", "amount": 5000}],
+    "expenses": {"needs": [{"title": "Rent", "amount": 1500}], "wants": []},
+    "debt": [{"name": "Card", "total_amount": 5000, "monthly_payment": 100, "apr": 0.18}],
+    "savings": 1000
+}
+
+class WordTokenizer:
+    def encode(self, text):
+        return text.split()
+
+class StubClient:
+    model = "stub"
+
+    def __init__(self):
+        self.prompts = []
+
+    async def generate(self, prompt, options=None):
+        self.prompts.append(prompt)
+        return "Pay the card first."
+
+    async def close(self):
+        pass
+
+def _dispatch(server, method, target, payload=None):
+    async def run():
+        # Threads stand in for the worker processes.
+        server.service.executor = ThreadPoolExecutor(max_workers=2)
+        try:
+            status, body, _ = await server._dispatch(method, target, json.dumps(payload).encode() if payload else b"")
+        finally:
+            server.service.close()
+        return status, json.loads(body)
+    return asyncio.run(run())
+
+@pytest.fixture
+def client():
+    return StubClient()
+
+def test_report_counts_prompt_tokens_with_the_tokenizer(client):
+    tokenizer = WordTokenizer()
+    server = AnalysisServer(AnalysisService(workers=1), client, tokenizer=tokenizer)
+    status, body = _dispatch(server, "POST", "/report", PROFILE)
+    assert status == 200 and body["report"] == "Pay the card first."
+    assert body["prompt"]["tokens"] == count_tokens(client.prompts[0], tokenizer)
+    assert body["prompt"]["tokens"] != count_tokens(client.prompts[0])
+
+def test_report_estimates_prompt_tokens_without_a_tokenizer(client):
+    server = AnalysisServer(AnalysisService(workers=1), client)
+    status, body = _dispatch(server, "POST", "/report", PROFILE)
+    assert status == 200 and body["prompt"]["tokens"] == count_tokens(client.prompts[0])
+
+def test_analyze_routes(client):
+    server = AnalysisServer(AnalysisService(workers=1), client)
+    expected = json.loads(json.dumps(round_floats(compute_financial_analysis(PROFILE))))
+    assert _dispatch(server, "POST", "/analyze", PROFILE) == (200, expected)
+    status, body = _dispatch(server, "POST", "/analyze/batch", [PROFILE, {"income": [{"amount": -1}]}, PROFILE])
+    assert status == 200 and body[0] == body[2] == expected
+    assert body[1]["error"].startswith("ProfileError: income[0].amount")
+    status, body = _dispatch(server, "POST", "/analyze?max_months=0", {"income": "none"})
+    assert status == 400 and "error" in body
+    assert server.service.counters["computed"] >= 3
+
+def test_schedule_route(client):
+    server = AnalysisServer(AnalysisService(workers=1), client)
+    status, body = _dispatch(server, "POST", "/schedule?points=5", PROFILE)
+    assert status == 200 and sorted(body) == sorted(STRATEGIES)
+    assert len(body["avalanche"]["month"]) <= 5 and body["avalanche"]["paid_off"]
+    status, body = _dispatch(server, "POST", "/schedule?strategy=fastest", PROFILE)
+    assert status == 400 and "fastest" in body["error"]
+
+def test_unknown_routes_and_bad_requests(client):
+    server = AnalysisServer(AnalysisService(workers=1), client)
+    assert _dispatch(server, "GET", "/missing")[0] == 404
+    assert _dispatch(server, "GET", "/analyze")[0] == 405
+    assert _dispatch(server, "POST", "/analyze/batch", {"not": "a list"})[0] == 400
+    assert _dispatch(server, "GET", "/health") == (200, {"status": "ok", "workers": 1})
+
+def test_keep_alive_connection(client):
+    async def run():
+        server = AnalysisServer(AnalysisService(workers=1), client)
+        server.service.executor = ThreadPoolExecutor(max_workers=2)
+        listener = await asyncio.start_server(server.handle_connection, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        body = json.dumps(PROFILE).encode()
+        responses = []
+        for connection in ("keep-alive", "close"):
+            writer.write(f"POST /analyze HTTP/1.1\r\nContent-Length: {len(body)}\r\n"
+                         f"Connection: {connection}\r\n\r\n".encode() + body)
+            head = (await reader.readuntil(b"\r\n\r\n")).decode()
+            length = int(head.lower().split("content-length: ")[1].split("\r\n")[0])
+            responses.append((head.split("\r\n")[0], json.loads(await reader.readexactly(length))))
+        assert await reader.read() == b""
+        writer.close()
+        listener.close()
+        await listener.wait_closed()
+        server.service.close()
+        return server, responses
+
+    server, responses = asyncio.run(run())
+    assert [status for status, _ in responses] == ["HTTP/1.1 200 OK"] * 2
+    assert responses[0][1] == responses[1][1]
+    # The second request was served from the response cache.
+    assert server.service.counters["computed"] == 1
+    assert server.histograms["POST /analyze"].snapshot()["count"] == 2
+
+def test_metrics_route_shows_report_traces(client):
+    async def run():
+        server = AnalysisServer(AnalysisService(workers=1), client, metrics=Metrics())
+        server.service.executor = ThreadPoolExecutor(max_workers=2)
+        try:
+            await server._dispatch("POST", "/report", json.dumps(PROFILE).encode())
+            status, body, _ = await server._dispatch("GET", "/metrics", b"")
+        finally:
+            server.service.close()
+        return status, json.loads(body)
+
+    status, body = asyncio.run(run())
+    assert status == 200 and body["service"]["computed"] == 1
+    report = body["traces"]["report"]
+    assert report["latency"]["count"] == 1 and "prompt" in report["stages"]
+    assert report["counts"]["response_tokens"] == count_tokens("Pay the card first.")
@@ -0,0 +1,77 @@
+import itertools
+
+import pytest
+
+import FinanceModule
+from FinanceModule import compute_financial_analysis
+from FinanceSweep import simulate_consolidation_grid, sweep_parameters
+
+PROFILE = {
+    "income": [{"title": "Salary", "amount": 4200}],
+    "expenses": {"needs": [{"title": "Rent", "amount": 1500}], "wants": [{"title": "Dining", "amount": 250}]},
+    "debt": [
+        {"name": "Card", "total_amount": 8000, "monthly_payment": 160, "apr": 0.22},
+        {"name": "Car", "total_amount": 14000, "monthly_payment": 300, "apr": 0.06},
+        {"name": "Store", "total_amount": 1200, "monthly_payment": 40, "apr": 0.15}
+    ],
+    "savings": 1500
+}
+
+SAVINGS_RATES = [0.1, 0.35, 0.8]
+CONSOLIDATION_RATES = [0, 0.065, 0.12]
+CONSOLIDATION_TERMS = [36, 72]
+ANNUAL_SAVINGS_RATES = [0.02, 0.07]
+
+# The grids use closed forms where the analysis loops month by month.
+REL_TOLERANCE = 1e-9
+
+@pytest.fixture(scope="module")
+def sweep():
+    return sweep_parameters(PROFILE, SAVINGS_RATES, CONSOLIDATION_RATES, CONSOLIDATION_TERMS, ANNUAL_SAVINGS_RATES)
+
+def _rows(table):
+    return [dict(zip(table["columns"], row)) for row in table["rows"]]
+
+def _analysis(monkeypatch, **constants):
+    for name, value in constants.items():
+        monkeypatch.setattr(FinanceModule, name, value)
+    return compute_financial_analysis(PROFILE)
+
+def test_savings_rows_match_the_analysis(sweep, monkeypatch):
+    for row in _rows(sweep["savings"]):
+        analysis = _analysis(monkeypatch, RECOMMENDED_SAVINGS_RATE=row["savings_rate"])
+        simulations = analysis["Debt Repayment Simulations"]
+        assert row["recommended_monthly_savings"] == analysis["Financial Summary"]["Recommended Monthly Savings"]
+        for strategy in ("avalanche", "snowball"):
+            result = simulations[f"{strategy.title()} Strategy"]
+            assert row["extra_funds"] == result["Extra Funds Used Monthly"]
+            assert row[f"{strategy}_months"] == result["Estimated Months to Debt-Free"]
+            assert row[f"{strategy}_interest"] == pytest.approx(result["Total Interest Paid"], rel=REL_TOLERANCE)
+
+def test_consolidation_rows_match_the_analysis(sweep, monkeypatch):
+    rows = _rows(sweep["consolidation"])
+    assert len(rows) == len(CONSOLIDATION_RATES) * len(CONSOLIDATION_TERMS)
+    # simulate_debt_consolidation divides by zero at a zero rate, which only the grid handles.
+    for row in rows[len(CONSOLIDATION_TERMS):]:
+        analysis = _analysis(monkeypatch, CONSOLIDATION_RATE=row["consolidation_rate"],
+                             CONSOLIDATION_TERM=row["consolidation_term"])
+        result = analysis["Debt Repayment Simulations"]["Consolidation Strategy"]
+        assert row["monthly_payment"] == pytest.approx(result["Monthly Consolidated Payment"], rel=REL_TOLERANCE)
+        assert row["total_interest"] == pytest.approx(result["Total Interest Over Term"], rel=REL_TOLERANCE)
+
+def test_projection_rows_match_the_analysis(sweep, monkeypatch):
+    rows = _rows(sweep["projection"])
+    assert [(r["savings_rate"], r["annual_savings_rate"]) for r in rows] == list(
+        itertools.product(SAVINGS_RATES, ANNUAL_SAVINGS_RATES)
+    )
+    for row in rows:
+        analysis = _analysis(monkeypatch, RECOMMENDED_SAVINGS_RATE=row["savings_rate"],
+                             ANNUAL_SAVINGS_RATE=row["annual_savings_rate"])
+        expected = analysis["Savings Projection"]["Projected Savings in 5 Years"]
+        assert row["projected_savings"] == pytest.approx(expected, rel=REL_TOLERANCE)
+
+def test_consolidation_grid_shape():
+    payment, interest = simulate_consolidation_grid(10000, CONSOLIDATION_RATES, CONSOLIDATION_TERMS)
+    assert payment.shape == interest.shape == (len(CONSOLIDATION_RATES), len(CONSOLIDATION_TERMS))
+    assert interest[0].tolist() == pytest.approx([0, 0])
+    assert payment[0].tolist() == pytest.approx([10000 / term for term in CONSOLIDATION_TERMS])
@@ -0,0 +1,34 @@
+from types import SimpleNamespace
+
+import pytest
+
+for module in ("torch", "transformers", "peft"):
+    pytest.importorskip(module)
+
+from TuningData import PaddingMeter
+from TuningTrain import available_cores, configure_cpu_threads, training_arguments, StepTimer
+
+def test_cpu_threads_are_split_between_processes(monkeypatch):
+    monkeypatch.setenv("WORLD_SIZE", "2")
+    monkeypatch.delenv("LOCAL_WORLD_SIZE", raising=False)
+    threads, _ = configure_cpu_threads()
+    assert threads == max(1, available_cores() // 2)
+    assert configure_cpu_threads(1)[0] == 1
+
+def test_cpu_training_arguments(tmp_path):
+    args = training_arguments(str(tmp_path), cpu=True, evaluate=False, max_steps=3)
+    assert args.use_cpu and not args.dataloader_pin_memory and args.ddp_backend == "gloo"
+    assert args.max_steps == 3 and args.eval_strategy == "no" and args.save_strategy == "no"
+    args = training_arguments(str(tmp_path), group_by_length=True)
+    assert not args.use_cpu and args.group_by_length and args.load_best_model_at_end
+
+def test_step_timer_times_steps_after_warmup():
+    meter = PaddingMeter(lambda features: {"attention_mask": features})
+    timer = StepTimer(meter, warmup=2)
+    for step in range(1, 6):
+        timer.on_step_begin(None, None, None)
+        meter.real_tokens += 10
+        timer.on_step_end(None, SimpleNamespace(global_step=step), None)
+    assert len(timer.step_times) == 3
+    # The meter was reset at the end of the last warmup step.
+    assert meter.real_tokens == 30
@@ -0,0 +1,133 @@
+import json
+
+import numpy as np
+import pytest
+
+from TuningData import (
+    _write_split,
+    build_token_store,
+    example_text,
+    load_token_store,
+    eval_windows,
+    CausalLMCollator,
+    IGNORE_INDEX,
+    PackedDataset,
+    PaddingMeter,
+    TokenDataset,
+)
+
+# GPT-2's EOS token, which it also pads with.
+EOS = 50256
+
+DOCUMENTS = [[11, 12, 13], [21, 22], [31, 32, 33, 34], [41]]
+
+@pytest.fixture
+def dataset(tmp_path):
+    _write_split(str(tmp_path), "train", DOCUMENTS, EOS + 1)
+    return TokenDataset(str(tmp_path), "train")
+
+class CharTokenizer:
+    """Stands in for a Hugging Face tokenizer: one token per character."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __len__(self):
+        return 256
+
+    def __call__(self, texts, truncation=False, max_length=None):
+        self.calls += 1
+        ids = [[ord(c) for c in text] for text in texts]
+        return {"input_ids": [i[:max_length] for i in ids] if truncation else ids}
+
+def _chat_file(path, examples):
+    with open(path, "w", encoding="utf-8") as f:
+        for title, content in examples:
+            messages = [{"role": "user", "content": title}, {"role": "assistant", "content": content}]
+            f.write(json.dumps({"messages": messages}) + "\n")
+    return str(path)
+
+def test_token_dataset_round_trip(dataset):
+    assert len(dataset) == len(DOCUMENTS)
+    assert [dataset[i]["input_ids"] for i in range(len(dataset))] == DOCUMENTS
+    assert dataset[-1] == {"input_ids": [41], "attention_mask": [1]}
+    assert dataset.lengths().tolist() == [3, 2, 4, 1]
+    assert dataset.tokens.dtype == np.uint16
+    with pytest.raises(IndexError):
+        dataset[len(DOCUMENTS)]
+
+def test_token_store_is_built_once(tmp_path):
+    train = _chat_file(tmp_path / "train.jsonl", [("What is APR?", "The yearly rate."), ("Budget", "50/30/20")])
+    validation = _chat_file(tmp_path / "validation.jsonl", [("Savings", "Pay yourself first.")])
+    tokenizer = CharTokenizer()
+    store_dir = str(tmp_path / "store")
+    path = build_token_store("chars", 8, train, validation, store_dir, tokenizer)
+    assert build_token_store("chars", 8, train, validation, store_dir, tokenizer) == path
+    assert tokenizer.calls == 2
+    splits = load_token_store("chars", 8, train, validation, store_dir, tokenizer)
+    expected = [[ord(c) for c in example_text("What is APR?", "The yearly rate.")][:8], [ord(c) for c in "Budget\n5"]]
+    assert [item["input_ids"] for item in splits["train"]] == expected
+    assert len(splits["validation"]) == 1
+    # Another max_length or other data is another store.
+    assert build_token_store("chars", None, train, validation, store_dir, tokenizer) != path
+    assert build_token_store("chars", 8, train, None, store_dir, tokenizer) != path
+
+def test_packed_dataset_separates_documents_with_eos(dataset):
+    packed = PackedDataset(dataset, block_size=4, eos_token_id=EOS)
+    blocks = [packed[i]["input_ids"] for i in range(len(packed))]
+    assert sum(blocks, []) == [t for document in DOCUMENTS for t in document + [EOS]]
+    assert all(len(b) == 4 for b in blocks[:-1]) and packed.lengths().tolist() == [len(b) for b in blocks]
+
+def _mask_collator(features):
+    """Just the attention mask of a right-padded batch, as numpy."""
+    width = max(len(f["input_ids"]) for f in features)
+    return {"attention_mask": np.array([[1] * len(f["input_ids"]) + [0] * (width - len(f["input_ids"])) for f in features])}
+
+def test_padding_meter_counts_real_tokens(dataset):
+    meter = PaddingMeter(_mask_collator)
+    meter([dataset[0], dataset[1]])
+    meter([dataset[2], dataset[3]])
+    # 3 + 2 + 4 + 1 real tokens in 3 + 3 + 4 + 4 positions.
+    assert meter.real_tokens == 10 and meter.total_tokens == 14
+    stats = meter.snapshot()
+    assert stats["padding_ratio"] == pytest.approx(4 / 14) and stats["tokens_per_second"] > 0
+    assert meter.total_tokens == 0 and meter.snapshot()["padding_ratio"] == 0.0
+
+    packed = PackedDataset(dataset, block_size=4, eos_token_id=EOS)
+    meter([packed[i] for i in range(len(packed) - 1)])
+    assert meter.snapshot()["padding_ratio"] == 0.0
+    with pytest.raises(IndexError):
+        packed[len(packed)]
+
+def test_packed_batch_keeps_eos_labels(dataset):
+    pytest.importorskip("torch")
+    packed = PackedDataset(dataset, block_size=4, eos_token_id=EOS)
+    batch = CausalLMCollator(pad_token_id=EOS)([packed[i] for i in range(len(packed))])
+    eos = batch["input_ids"] == EOS
+    real = batch["attention_mask"] == 1
+    assert (eos & real).sum() == len(dataset)
+    assert (batch["labels"][eos & real] == EOS).all()
+    # Only the last block is short; its padding, also EOS, is the only label masked.
+    assert (batch["labels"][~real] == IGNORE_INDEX).all()
+    assert (~real).sum() == len(packed) * 4 - len(packed.tokens)
+
+def test_unpacked_batch_masks_only_padding(dataset):
+    pytest.importorskip("torch")
+    batch = CausalLMCollator(pad_token_id=EOS)([dataset[0], dataset[1]])
+    assert batch["input_ids"].tolist() == [[11, 12, 13], [21, 22, EOS]]
+    assert batch["labels"].tolist() == [[11, 12, 13], [21, 22, IGNORE_INDEX]]
+
+@pytest.mark.parametrize("context_length, stride", [(2, 1), (3, 1), (3, 2), (5, None)])
+def test_eval_windows_score_each_token_once(dataset, context_length, stride):
+    scored = [[] for _ in DOCUMENTS]
+    for input_ids, first_scored in eval_windows(dataset, context_length, stride):
+        assert len(input_ids) <= context_length and first_scored >= 1
+        document = next(i for i, d in enumerate(DOCUMENTS) if input_ids[0] in d)
+        scored[document] += input_ids[first_scored:]
+    assert scored == [d[1:] for d in DOCUMENTS]
+
+def test_eval_shards_cover_every_window_once(dataset):
+    whole = list(eval_windows(dataset, context_length=3, stride=2))
+    shards = [list(eval_windows(dataset, context_length=3, stride=2, rank=r, world_size=3)) for r in range(3)]
+    assert sorted(map(repr, whole)) == sorted(repr(w) for shard in shards for w in shard)
+    assert all(shards)
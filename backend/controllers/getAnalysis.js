@@ -0,0 +1,52 @@
+const { GetCommand } = require('@aws-sdk/lib-dynamodb');
+
+// Python analysis service (FinanceModel/FinanceServer.py)
+const ANALYSIS_SERVICE_URL = process.env.ANALYSIS_SERVICE_URL || 'http://127.0.0.1:8000';
+
+// Convert a stored user item to the profile format FinanceModule expects
+function toProfile(item) {
+    const amounts = (entries) => (entries || []).map((e) => ({ title: e.title, amount: Number(e.amount) || 0 }));
+    return {
+        income: amounts(item.income),
+        expenses: {
+            needs: amounts(item.expenses && item.expenses.needs),
+            wants: amounts(item.expenses && item.expenses.wants)
+        },
+        debt: (item.debt || []).map((d) => ({
+            name: d.title,
+            total_amount: Number(d.remainingBalance) || 0,
+            monthly_payment: Number(d.monthlyPayment) || 0,
+            apr: (Number(d.apr) || 0) / 100, // entered as a percentage
+            tenure: Number(d.tenure) || 0
+        })),
+        savings: Number(item.userDetails && item.userDetails.savings) || 0
+    };
+}
+
+async function handleGetAnalysis(req, res, dynamoDB) {
+    try {
+        const username = req.query.username;
+
+        const getParams = {
+            TableName: 'abs-hacklytics', // Ensure this matches your table name
+            Key: { username }
+        };
+
+        const details = await dynamoDB.send(new GetCommand(getParams));
+        if (!details.Item) {
+            return res.status(404).json({ error: 'User not found' });
+        }
+
+        const response = await fetch(`${ANALYSIS_SERVICE_URL}/analyze`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(toProfile(details.Item))
+        });
+        res.status(response.status).json(await response.json());
+    } catch (error) {
+        console.log(error);
+        res.status(500).json({ error: 'An error occurred while computing the financial analysis' });
+    }
+}
+
+module.exports = handleGetAnalysis;
@@ -6,6 +6,7 @@ const { DynamoDBClient } = require('@aws-sdk/client-dynamodb');
 const { DynamoDBDocumentClient } = require('@aws-sdk/lib-dynamodb');
 const handleAddDetails = require('./controllers/addDetails');
 const handleGetDetails = require('./controllers/getDetails');
+const handleGetAnalysis = require('./controllers/getAnalysis');
 
 app.use(express.urlencoded({ extended: true }));
 app.use(express.json());
@@ -29,6 +30,7 @@ const dynamoDB = DynamoDBDocumentClient.from(dynamoDBClient);
 
 app.post('/addDetails', (req, res) => handleAddDetails(req, res, dynamoDB));
 app.get('/getDetails', (req, res) => handleGetDetails(req, res, dynamoDB));
+app.get('/getAnalysis', (req, res) => handleGetAnalysis(req, res, dynamoDB));
 
 app.listen(8080, () => {
     console.log('Server is running on port 8080');